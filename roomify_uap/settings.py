@@ -64,6 +64,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'roomify_uap_app.context_processors.navbar',
             ],
         },
     },
@@ -79,10 +80,47 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # booking updates queue on the busy timeout instead of failing
+            # with "database is locked" when a reader tries to upgrade.
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # Threaded tests need a real file; the in-memory test database
+        # reports lock conflicts between threads instead of waiting.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Point 'default' at a shared backend (Redis, Memcached) when running several
+# web nodes so catalogue invalidation reaches all of them.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'roomify-uap',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    }
+}
+
+CATALOGUE_CACHE_ALIAS = 'default'
+CATALOGUE_CACHE_TIMEOUT = 300
+CATALOGUE_LOCAL_MAX_ENTRIES = 256
+
+# Per-owner dashboard KPIs (roomify_uap_app/owner_stats.py), dropped by signals on change.
+OWNER_STATS_CACHE_ALIAS = 'default'
+OWNER_STATS_CACHE_TIMEOUT = 300
+
+# Navbar notifications (roomify_uap_app/notifications.py): badge count plus a preview.
+NAVBAR_CACHE_ALIAS = 'default'
+NAVBAR_CACHE_TIMEOUT = 300
+NAVBAR_NOTIFICATIONS_PREVIEW = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -128,4 +166,47 @@ STATICFILES_DIRS = [
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Media is served by roomify_uap_app/media.py. Behind Apache/lighttpd set this to
+# 'X-Sendfile', behind nginx to 'X-Accel-Redirect' (with an internal location
+# at MEDIA_ACCEL_REDIRECT_PREFIX aliased to MEDIA_ROOT) so the proxy sends the bytes.
+MEDIA_SENDFILE_HEADER = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Listing photo derivatives (roomify_uap_app/images.py) are rendered on a
+# background thread pool; set IMAGE_DERIVATIVES_ASYNC = False to render inline.
+IMAGE_DERIVATIVES_ASYNC = True
+IMAGE_DERIVATIVE_WORKERS = 2
+
+# Resumable photo uploads (roomify_uap_app/uploads.py).
+CHUNKED_UPLOAD_DIR = BASE_DIR / 'var' / 'uploads'
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+MAX_LISTING_PHOTO_SIZE = 25 * 1024 * 1024
+
+# Bulk CSV/ZIP listing import (roomify_uap_app/listing_import.py): rows per
+# bulk_create and transaction.
+LISTING_IMPORT_BATCH_SIZE = 200
+
+# Live booking/message updates (roomify_uap_app/push.py), streamed from /events/.
+# Serve with an ASGI server (e.g. `uvicorn roomify_uap.asgi:application`). The
+# in-process broker only reaches users connected to the same process; use
+# 'roomify_uap_app.push.RedisBroker' with PUSH_REDIS_URL across several.
+PUSH_BACKEND = 'roomify_uap_app.push.InProcessBroker'
+PUSH_REDIS_URL = 'redis://localhost:6379/0'
+PUSH_HEARTBEAT_SECONDS = 15
+
+# Listing page views are buffered in memory (roomify_uap_app/tracking.py) and
+# written in batches; repeat views by the same user within the window count once.
+LISTING_VIEW_BUFFER_SIZE = 100
+LISTING_VIEW_FLUSH_INTERVAL = 10
+LISTING_VIEW_DEDUPE_WINDOW = 30 * 60
+# Views are rolled up (roomify_uap_app/rollups.py) once their id has been
+# visible this long, so batches still committing below it aren't skipped.
+LISTING_VIEW_ROLLUP_LAG = 60
+
+# Default origin for "rooms near campus" (University of Asia Pacific, Farmgate).
+CAMPUS_LOCATION = (23.7544, 90.3896)
+
+# Precomputed "similar rooms" state, maintained by `manage.py rebuild_similar_listings`.
+SIMILARITY_STATE_PATH = BASE_DIR / 'var' / 'similar_listings.npz'
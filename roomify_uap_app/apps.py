@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from .message_search import install_message_index
+    from .search import install_search_index
+    install_search_index(connections[using])
+    install_message_index(connections[using])
 
 
 class RoomifyUapAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'roomify_uap_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(_ensure_search_index, sender=self)
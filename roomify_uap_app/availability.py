@@ -0,0 +1,137 @@
+"""
+Stay dates and room availability.
+
+A stay is the half-open range ``[start_date, end_date)`` of an accepted
+BookingRequest; requests without an end date run until ``STAY_OPEN_ENDED``
+(see models.py). Accepted stays are indexed by (listing, start_date,
+end_date), so every question below is a range scan over one listing's
+overlapping stays (``start_date < end AND end_date > start``), never a load
+of all bookings.
+
+* ``peak_occupancy`` - most beds taken on any night of a range: a sweep over
+  the sorted start/end points of the overlapping stays.
+* ``available_between`` - listings with a free bed on every night of a
+  range, as a ``NOT EXISTS`` subquery. Occupancy only rises when a stay
+  starts, so the peak over a range is reached at the range start or at the
+  start of one of the stays in it; only those points are counted.
+* ``availability_calendar`` - free beds per night for the listing page.
+
+``Listing.occupants``/``occupied`` mean "beds taken tonight". Accepting a
+booking recomputes them with ``sync_occupancy``; ``manage.py
+sync_occupancy`` does it for every listing and should run daily, as stays
+begin and end without anything being saved.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, Count, DateField, Exists, F, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import BookingRequest, Listing
+from .owner_stats import invalidate_owner_stats
+
+CALENDAR_WEEKS = 8
+
+
+def accepted_stays():
+    return BookingRequest.objects.filter(status='accepted')
+
+
+def overlapping(start, end):
+    """Q for stays sharing at least one night with ``[start, end)``."""
+    return Q(start_date__lt=end, end_date__gt=start)
+
+
+def stays_by_listing(listing_ids, start, end):
+    """``{listing_id: [(start_date, end_date), ...]}`` of accepted stays overlapping ``[start, end)``."""
+    rows = (
+        accepted_stays().filter(overlapping(start, end), listing_id__in=listing_ids)
+        .values_list('listing_id', 'start_date', 'end_date')
+    )
+    stays = {listing_id: [] for listing_id in listing_ids}
+    for listing_id, stay_start, stay_end in rows:
+        stays[listing_id].append((stay_start, stay_end))
+    return stays
+
+
+def peak_occupancy(stays, start, end):
+    """Most of ``stays`` covering any single night of ``[start, end)``."""
+    points = []
+    for stay_start, stay_end in stays:
+        if stay_start < end and stay_end > start:
+            points.append((max(stay_start, start), 1))
+            points.append((min(stay_end, end), -1))
+    # (day, -1) sorts before (day, 1): a bed freed on a day can be taken that day.
+    peak = taken = 0
+    for _day, change in sorted(points):
+        taken += change
+        peak = max(peak, taken)
+    return peak
+
+
+def has_room(listing, stays, start, end):
+    return peak_occupancy(stays, start, end) < listing.occupancy
+
+
+def available_between(queryset, start, end):
+    """Listings in ``queryset`` with at least one bed free on every night of ``[start, end)``."""
+    point = Greatest('start_date', Value(start, output_field=DateField()))
+    taken_at_point = (
+        accepted_stays()
+        .filter(listing=OuterRef('listing'), start_date__lte=OuterRef('point'), end_date__gt=OuterRef('point'))
+        .order_by().values('listing').annotate(n=Count('pk')).values('n')
+    )
+    full_night = (
+        accepted_stays()
+        .filter(overlapping(start, end), listing=OuterRef('pk'))
+        .annotate(point=point)
+        .annotate(taken=Subquery(taken_at_point))
+        .filter(taken__gte=OuterRef('occupancy'))
+    )
+    return queryset.filter(occupancy__gt=0).filter(~Exists(full_night))
+
+
+def sync_occupancy(listings=None):
+    """
+    Recompute ``occupants``/``occupied`` from tonight's stays for ``listings`` (a queryset; all if None)
+    and drop their owners' cached KPIs once the transaction commits.
+    """
+    if listings is None:
+        listings = Listing.objects.all()
+    owner_ids = set(listings.values_list('owner_id', flat=True))
+    today = timezone.localdate()
+    tonight = (
+        accepted_stays()
+        .filter(listing=OuterRef('pk'), start_date__lte=today, end_date__gt=today)
+        .order_by().values('listing').annotate(n=Count('pk')).values('n')
+    )
+    changed = listings.update(occupants=Coalesce(Subquery(tonight), 0))
+    listings.update(occupied=Case(When(occupancy__lte=F('occupants'), then=True), default=False))
+    # .update() sends no signals, so the occupied-listing counts are stale otherwise.
+    transaction.on_commit(lambda: invalidate_owner_stats(*owner_ids))
+    return changed
+
+
+def availability_calendar(listing, start=None, weeks=CALENDAR_WEEKS):
+    """
+    Weeks (Monday first) of ``{'date', 'free', 'past'}`` nights from ``start``'s week,
+    with the free bed count for each night.
+    """
+    today = timezone.localdate()
+    first = (start or today) - timedelta(days=(start or today).weekday())
+    last = first + timedelta(weeks=weeks)
+    days = (last - first).days
+
+    # Difference array over the window: +1 where a stay starts, -1 where it ends.
+    change = [0] * (days + 1)
+    for stay_start, stay_end in stays_by_listing([listing.pk], first, last)[listing.pk]:
+        change[max((stay_start - first).days, 0)] += 1
+        change[min((stay_end - first).days, days)] -= 1
+
+    nights, taken = [], 0
+    for offset in range(days):
+        taken += change[offset]
+        day = first + timedelta(days=offset)
+        nights.append({'date': day, 'free': max(listing.occupancy - taken, 0), 'past': day < today})
+    return [nights[i:i + 7] for i in range(0, days, 7)]
@@ -0,0 +1,257 @@
+"""
+Booking requests: creation, acceptance and rejection without races.
+
+* A renter's pending or accepted requests for a listing never overlap, so
+  they can book the same room again for a later stay. Requests for the same
+  move-in date are unique in the database (``one_active_booking_per_stay``),
+  and a request carrying an idempotency key is created at most once. A
+  retry or double click gets the existing request back instead of a
+  duplicate.
+* Status changes are conditional UPDATEs (``WHERE status = 'pending'``), so
+  two owners' clicks racing on the same request can only change it once.
+* Accepting locks the listing row and checks its calendar: if the stay
+  would need more beds than the room has on any night, the acceptance is
+  rolled back. The listing's "taken tonight" counters are then recomputed
+  from its stays (see availability.py), so concurrent accepts can't lose
+  an update.
+
+UPDATE skips model signals, so after a status change this module sends
+``post_save`` for the request itself; the receivers in signals.py then
+refresh notification counters, owner KPIs and push the update as usual.
+
+``respond_in_bulk`` answers many requests at once: it locks the owner's
+selected rows and their listings, checks every stay against the calendar
+in Python and writes the decisions back with ``bulk_update`` in one
+transaction, then refreshes counters and pushes updates once for the
+whole batch.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .availability import has_room, overlapping, peak_occupancy, stays_by_listing, sync_occupancy
+from .catalogue import bump_catalogue_version
+from .models import STAY_OPEN_ENDED, BookingRequest, Listing, NotificationCounter
+from .notifications import invalidate_navbar, refresh_counters
+from .owner_stats import invalidate_owner_stats
+from .push import push_to_user
+
+ACTIVE = ('pending', 'accepted')
+IDEMPOTENCY_KEY_LENGTH = 64
+
+# Listing columns derived from accepted stays by availability.sync_occupancy.
+OCCUPANCY_FIELDS = ('occupants', 'occupied')
+
+
+class BookingError(Exception):
+    pass
+
+
+def booking_event(booking, notification_count):
+    """Payload of the ``booking`` push event for ``booking``."""
+    return {
+        'id': booking.pk,
+        'status': booking.status,
+        'listing': booking.listing.room_title,
+        'renter': booking.renter.username,
+        'owner': booking.owner.username,
+        'notification_count': notification_count,
+    }
+
+
+def request_booking(renter, listing, idempotency_key=None, start=None, end=None):
+    """
+    Create a pending request from ``renter`` to stay in ``listing`` over ``[start, end)``:
+    ``(booking, created)``. The stay starts today and is open-ended by default.
+
+    If the key was already used, or the renter already has an active request
+    for the listing for the same dates, that request is returned with
+    ``created=False``; one for other, overlapping dates is a ``BookingError``.
+    """
+    if listing.owner_id == renter.pk:
+        raise BookingError("You can't book your own listing.")
+    key = (idempotency_key or '').strip()[:IDEMPOTENCY_KEY_LENGTH] or None
+    if key:
+        existing = BookingRequest.objects.filter(renter=renter, idempotency_key=key).first()
+        if existing is not None:
+            return _replayed(existing, listing)
+
+    start = start or timezone.localdate()
+    end = end or STAY_OPEN_ENDED
+    if start < timezone.localdate():
+        raise BookingError('Choose a move-in date from today onwards.')
+    if end <= start:
+        raise BookingError('The move-out date must be after the move-in date.')
+    clash = BookingRequest.objects.filter(
+        overlapping(start, end), renter=renter, listing=listing, status__in=ACTIVE
+    ).first()
+    if clash is not None:
+        if (clash.start_date, clash.end_date) == (start, end):
+            return clash, False
+        raise BookingError('You already have a request for this room on some of those dates.')
+    if listing.occupancy < 1:
+        raise BookingError("This room isn't taking bookings.")
+    if not has_room(listing, stays_by_listing([listing.pk], start, end)[listing.pk], start, end):
+        raise BookingError('This room is fully booked for those dates.')
+
+    try:
+        with transaction.atomic():
+            booking = BookingRequest.objects.create(
+                renter=renter, owner_id=listing.owner_id, listing=listing, idempotency_key=key,
+                start_date=start, end_date=end,
+            )
+    except IntegrityError:
+        existing = BookingRequest.objects.filter(renter=renter)
+        booking = (
+            (key and existing.filter(idempotency_key=key).first())
+            or existing.filter(listing=listing, start_date=start, status__in=ACTIVE).first()
+        )
+        if booking is None:
+            raise
+        return _replayed(booking, listing)
+    return booking, True
+
+
+def _replayed(booking, listing):
+    if booking.listing_id != listing.pk:
+        raise BookingError('This request was already used for another listing.')
+    return booking, False
+
+
+def _changed(booking, status, answered_at):
+    booking.status, booking.answered_at = status, answered_at
+    post_save.send(
+        sender=BookingRequest, instance=booking, created=False,
+        update_fields=frozenset(['status', 'answered_at']), raw=False, using=booking._state.db,
+    )
+
+
+def accept_booking(booking):
+    """
+    Accept a pending ``booking`` if its listing has a bed free for the whole stay.
+
+    Returns False if the request was no longer pending. Raises
+    ``BookingError`` (and changes nothing) if the room is full on any night.
+    """
+    with transaction.atomic():
+        # Serialises accepts for the listing (SQLite already holds the write lock).
+        listing = Listing.objects.select_for_update().get(pk=booking.listing_id)
+        now = timezone.now()
+        if not BookingRequest.objects.filter(pk=booking.pk, status='pending').update(status='accepted', answered_at=now):
+            return False
+        stays = stays_by_listing([listing.pk], booking.start_date, booking.end_date)[listing.pk]
+        if peak_occupancy(stays, booking.start_date, booking.end_date) > listing.occupancy:
+            raise BookingError('This room is fully booked for those dates.')
+        sync_occupancy(Listing.objects.filter(pk=listing.pk))
+        _changed(booking, 'accepted', now)
+    transaction.on_commit(bump_catalogue_version)
+    return True
+
+
+def reject_booking(booking):
+    """Reject a pending ``booking``. Returns False if it was no longer pending."""
+    with transaction.atomic():
+        now = timezone.now()
+        if not BookingRequest.objects.filter(pk=booking.pk, status='pending').update(status='rejected', answered_at=now):
+            return False
+        _changed(booking, 'rejected', now)
+    return True
+
+
+def respond_in_bulk(owner, booking_ids, action, reject_competing=False):
+    """
+    Accept or reject ``owner``'s pending requests among ``booking_ids`` in one transaction.
+
+    Requests that aren't the owner's or are no longer pending are ignored.
+    Accepting goes oldest request first; a stay that no longer fits the
+    listing's calendar stays pending, or is rejected with
+    ``reject_competing``, as are the listing's other pending requests whose
+    stays no longer fit.
+    Returns ``{'accepted': n, 'rejected': n, 'skipped': n}``.
+    """
+    if action not in ('accept', 'reject'):
+        raise ValueError(action)
+    result = {'accepted': 0, 'rejected': 0, 'skipped': 0}
+
+    with transaction.atomic():
+        pending = BookingRequest.objects.select_for_update(of=('self',)).select_related('listing', 'renter', 'owner')
+        bookings = list(pending.filter(owner=owner, pk__in=booking_ids, status='pending').order_by('created_at', 'id'))
+        if not bookings:
+            return result
+
+        decided, listing_ids = [], set()
+        if action == 'reject':
+            decided = bookings
+            for booking in bookings:
+                booking.status = 'rejected'
+        else:
+            listing_ids = {booking.listing_id for booking in bookings}
+            listings = Listing.objects.select_for_update().in_bulk(listing_ids)
+            window = (min(b.start_date for b in bookings), max(b.end_date for b in bookings))
+            if reject_competing:
+                # Other pending stays that may no longer fit once the batch is in.
+                others = list(pending.filter(listing_id__in=listing_ids, status='pending').exclude(
+                    pk__in=[booking.pk for booking in bookings]
+                ).order_by('created_at', 'id'))
+                window = (
+                    min([window[0]] + [b.start_date for b in others]),
+                    max([window[1]] + [b.end_date for b in others]),
+                )
+            stays = stays_by_listing(listing_ids, *window)
+
+            for booking in bookings:
+                listing, taken = listings[booking.listing_id], stays[booking.listing_id]
+                if has_room(listing, taken, booking.start_date, booking.end_date):
+                    booking.status = 'accepted'
+                    taken.append((booking.start_date, booking.end_date))
+                elif reject_competing:
+                    booking.status = 'rejected'
+                else:
+                    result['skipped'] += 1
+                    continue
+                decided.append(booking)
+
+            if reject_competing:
+                for booking in others:
+                    listing, taken = listings[booking.listing_id], stays[booking.listing_id]
+                    if not has_room(listing, taken, booking.start_date, booking.end_date):
+                        booking.status = 'rejected'
+                        decided.append(booking)
+
+        now = timezone.now()
+        for booking in decided:
+            booking.answered_at = now
+        BookingRequest.objects.bulk_update(decided, ['status', 'answered_at'])
+        if listing_ids:
+            sync_occupancy(Listing.objects.filter(pk__in=listing_ids))
+        for booking in decided:
+            result[booking.status] += 1
+
+        # bulk_update skips signals: recount badges, then notify each renter once per request.
+        renters = {booking.renter_id for booking in decided}
+        refresh_counters(renters | {owner.pk})
+        counts = dict(
+            NotificationCounter.objects.filter(user_id__in=renters).values_list('user_id', 'answered_requests')
+        )
+        for booking in decided:
+            booking._loaded_status = booking.status
+            push_to_user(booking.renter_id, 'booking', booking_event(booking, counts.get(booking.renter_id, 0)))
+
+    users = list(renters | {owner.pk})
+    transaction.on_commit(lambda: invalidate_navbar(users))
+    transaction.on_commit(lambda: invalidate_owner_stats(owner.pk))
+    if listing_ids:
+        transaction.on_commit(bump_catalogue_version)
+    return result
+
+
+def save_listing_details(listing):
+    """Save an owner's edit of ``listing`` without overwriting the booking-maintained columns."""
+    fields = [
+        field.name for field in Listing._meta.concrete_fields
+        if not field.primary_key and field.name not in OCCUPANCY_FIELDS
+    ]
+    with transaction.atomic():
+        listing.save(update_fields=fields)
+        # Capacity may have changed.
+        sync_occupancy(Listing.objects.filter(pk=listing.pk))
@@ -0,0 +1,109 @@
+"""
+Versioned two-level cache for the listing catalogue.
+
+Every key embeds a global catalogue version stored in the shared cache
+(``settings.CATALOGUE_CACHE_ALIAS``). Any listing change bumps that version,
+which invalidates everything at once in O(1): stale entries are simply never
+asked for again and age out. Lookups go through a small per-process LRU
+first, then the shared backend (LocMemCache locally, Redis/Memcached across
+web nodes), and only then hit the database.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+VERSION_KEY = 'catalogue:version'
+
+
+class LRUCache:
+    """Thread-safe, size-capped in-process cache with least-recently-used eviction."""
+
+    _missing = object()
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, self._missing)
+            if value is self._missing:
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_local = LRUCache(getattr(settings, 'CATALOGUE_LOCAL_MAX_ENTRIES', 256))
+_MISS = object()
+
+
+def _shared():
+    return caches[getattr(settings, 'CATALOGUE_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CATALOGUE_CACHE_TIMEOUT', 300)
+
+
+def catalogue_version():
+    cache = _shared()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so a version key lost to eviction never restarts
+        # at a number whose entries may still be cached.
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue entry on every node."""
+    cache = _shared()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def make_key(namespace, *parts):
+    digest = hashlib.md5(
+        json.dumps(parts, sort_keys=True, default=str).encode(), usedforsecurity=False
+    ).hexdigest()
+    return f'{namespace}:{digest}'
+
+
+def get_or_set(key, compute):
+    """Return the cached value for ``key`` under the current version, computing it on a miss."""
+    full_key = f'catalogue:{catalogue_version()}:{key}'
+
+    value = _local.get(full_key, _MISS)
+    if value is not _MISS:
+        return value
+
+    cache = _shared()
+    value = cache.get(full_key, _MISS)
+    if value is _MISS:
+        value = compute()
+        cache.set(full_key, value, _timeout())
+    _local.set(full_key, value)
+    return value
@@ -0,0 +1,21 @@
+from functools import cache
+
+from .notifications import navbar_notifications
+
+
+def navbar(request):
+    """
+    ``notifications`` and ``notification_count`` for the shared navbar.
+
+    Both are callables (which templates call on first use), so pages that
+    don't render a navbar never touch the cache or the database.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+
+    load = cache(lambda: navbar_notifications(request))
+    return {
+        'notifications': lambda: load()['items'],
+        'notification_count': lambda: load()['count'],
+    }
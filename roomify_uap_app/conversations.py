@@ -0,0 +1,79 @@
+"""
+Message threads.
+
+Every ``Message`` belongs to a ``Conversation`` between a listing's owner
+and one renter. Signals file new messages into their conversation and keep
+its ``last_message`` and per-side unread counts current, so the inbox is a
+single indexed query over conversations. History is keyset-paginated, and
+only the messages actually shown are marked read.
+"""
+from django.db.models import F, Q, Value
+from django.db.models.functions import Greatest
+
+from .models import Conversation, Message, Profile
+from .pagination import keyset_page
+
+HISTORY_PAGE_SIZE = 30
+INBOX_PAGE_SIZE = 20
+
+
+def participants(sender, receiver, listing=None):
+    """``(owner, renter)`` for a message between ``sender`` and ``receiver``."""
+    if listing is not None and listing.owner_id in (sender.pk, receiver.pk):
+        owner = listing.owner
+    elif Profile.objects.filter(user=sender, role='owner').exists():
+        owner = sender
+    else:
+        owner = receiver
+    return owner, (receiver if owner.pk == sender.pk else sender)
+
+
+def conversation_for(sender, receiver, listing=None):
+    owner, renter = participants(sender, receiver, listing)
+    conversation, _created = Conversation.objects.get_or_create(listing=listing, owner=owner, renter=renter)
+    return conversation
+
+
+def record_message(message):
+    """Make ``message`` the conversation's latest and count it as unread for the receiver."""
+    conversation = message.conversation
+    unread = 'owner_unread' if message.receiver_id == conversation.owner_id else 'renter_unread'
+    Conversation.objects.filter(pk=conversation.pk).update(
+        last_message=message,
+        last_message_at=message.timestamp,
+        **{unread: F(unread) + 1},
+    )
+
+
+def inbox(user, cursor=None, per_page=INBOX_PAGE_SIZE):
+    """One page of ``user``'s conversations, most recent first: ``(conversations, next_cursor)``."""
+    conversations = (
+        Conversation.objects.filter(Q(owner=user) | Q(renter=user), last_message__isnull=False)
+        .select_related('listing', 'owner', 'renter', 'last_message')
+    )
+    return keyset_page(conversations, cursor=cursor, per_page=per_page, keys=('-last_message_at', '-id'))
+
+
+def history(conversation, cursor=None, per_page=HISTORY_PAGE_SIZE):
+    """
+    One page of a thread going back in time: ``(messages oldest first, cursor for older)``.
+    """
+    messages, older = keyset_page(
+        conversation.messages.select_related('sender'),
+        cursor=cursor,
+        per_page=per_page,
+        keys=('-timestamp', '-id'),
+    )
+    return messages[::-1], older
+
+
+def mark_read(conversation, user, messages):
+    """Mark the given (displayed) messages read for ``user`` and lower the unread count to match."""
+    ids = [message.pk for message in messages if message.receiver_id == user.pk and not message.is_read]
+    if not ids:
+        return 0
+    marked = Message.objects.filter(pk__in=ids, is_read=False).update(is_read=True)
+    if marked:
+        unread = 'owner_unread' if user.pk == conversation.owner_id else 'renter_unread'
+        Conversation.objects.filter(pk=conversation.pk).update(**{unread: Greatest(F(unread) - marked, Value(0))})
+    return marked
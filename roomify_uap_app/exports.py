@@ -0,0 +1,151 @@
+"""
+Streaming spreadsheet exports for owners.
+
+Rows are read with ``QuerySet.iterator(chunk_size=...)`` and written out as
+they arrive, so memory stays flat however many bookings, messages or views
+an owner has. CSV is always available; Parquet is offered when pyarrow is
+installed and is written one row group per chunk.
+"""
+import csv
+
+from .models import BookingRequest, ListingView, Message
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # optional dependency
+    pyarrow = None
+
+CHUNK_SIZE = 2000
+
+# name -> (queryset for an owner, [(column header, field path, column type), ...])
+EXPORTS = {
+    'bookings': (
+        lambda owner: BookingRequest.objects.filter(owner=owner).order_by('id'),
+        [
+            ('booking_id', 'id', 'int'),
+            ('listing_id', 'listing_id', 'int'),
+            ('listing', 'listing__room_title', 'str'),
+            ('renter', 'renter__username', 'str'),
+            ('status', 'status', 'str'),
+            ('rent', 'listing__rent', 'decimal'),
+            ('created_at', 'created_at', 'datetime'),
+        ],
+    ),
+    'messages': (
+        lambda owner: Message.objects.filter(listing__owner=owner).order_by('id'),
+        [
+            ('message_id', 'id', 'int'),
+            ('listing_id', 'listing_id', 'int'),
+            ('listing', 'listing__room_title', 'str'),
+            ('sender', 'sender__username', 'str'),
+            ('receiver', 'receiver__username', 'str'),
+            ('content', 'content', 'str'),
+            ('is_read', 'is_read', 'bool'),
+            ('timestamp', 'timestamp', 'datetime'),
+        ],
+    ),
+    'views': (
+        lambda owner: ListingView.objects.filter(listing__owner=owner).order_by('id'),
+        [
+            ('view_id', 'id', 'int'),
+            ('listing_id', 'listing_id', 'int'),
+            ('listing', 'listing__room_title', 'str'),
+            ('viewer', 'viewer__username', 'str'),
+            ('timestamp', 'timestamp', 'datetime'),
+        ],
+    ),
+}
+
+
+def parquet_available():
+    return pyarrow is not None
+
+
+def export_rows(owner, name):
+    """``(columns, row iterator)`` for export ``name``, streamed from the database in chunks."""
+    queryset_for, columns = EXPORTS[name]
+    rows = queryset_for(owner).values_list(*(path for _header, path, _type in columns)).iterator(chunk_size=CHUNK_SIZE)
+    return columns, rows
+
+
+class _Buffer:
+    """Write-only file object whose contents are drained after every write."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data) if not isinstance(data, str) else data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _csv_cell(value):
+    # Keep spreadsheet apps from evaluating user text (e.g. message content) as a formula.
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@', '\t', '\r'):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, rows):
+    buffer = _Buffer()
+    writer = csv.writer(buffer)
+    writer.writerow(header for header, _path, _type in columns)
+    yield from buffer.drain()
+    for batch in _batches(rows, CHUNK_SIZE):
+        writer.writerows([_csv_cell(value) for value in row] for row in batch)
+        yield ''.join(buffer.drain())
+
+
+def _arrow_schema(columns):
+    types = {
+        'int': pyarrow.int64(),
+        'str': pyarrow.string(),
+        'bool': pyarrow.bool_(),
+        'decimal': pyarrow.decimal128(12, 2),
+        'datetime': pyarrow.timestamp('us', tz='UTC'),
+    }
+    return pyarrow.schema([(header, types[kind]) for header, _path, kind in columns])
+
+
+def stream_parquet(columns, rows):
+    buffer = _Buffer()
+    schema = _arrow_schema(columns)
+    writer = pyarrow.parquet.ParquetWriter(buffer, schema)
+    for batch in _batches(rows, CHUNK_SIZE):
+        writer.write_table(pyarrow.Table.from_pylist(
+            [dict(zip(schema.names, row)) for row in batch], schema=schema
+        ))
+        yield from buffer.drain()
+    writer.close()
+    yield from buffer.drain()
@@ -0,0 +1,192 @@
+"""
+Renter feed filters and facet counts.
+
+Facets are disjunctive: each facet's counts honour every active filter except
+its own, so picking a location still shows how many rooms the other locations
+have. All of them are rolled up in Python from a single GROUP BY query.
+Stay dates (``available_from``/``available_to``) are not a facet; they narrow
+the base queryset for everything, via availability.available_between.
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import BooleanField, Case, CharField, Count, Q, Value, When
+
+from .availability import available_between
+
+# (key, label, min inclusive, max exclusive)
+PRICE_BUCKETS = [
+    ('under-5k', 'Under ৳5,000', None, 5000),
+    ('5k-10k', '৳5,000 - 10,000', 5000, 10000),
+    ('10k-15k', '৳10,000 - 15,000', 10000, 15000),
+    ('15k-20k', '৳15,000 - 20,000', 15000, 20000),
+    ('20k-plus', '৳20,000+', 20000, None),
+]
+
+OCCUPANCY_LABELS = {1: 'Single', 2: 'Double'}
+
+MAX_LOCATION_FACETS = 15
+
+
+def _decimal(value):
+    try:
+        return Decimal(value) if value not in (None, '') else None
+    except InvalidOperation:
+        return None
+
+
+def _int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except ValueError:
+        return None
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def parse_listing_filters(params):
+    """Read the filter query parameters, ignoring anything malformed."""
+    price = params.get('price', '')
+    occupied = params.get('occupied', 'all')
+    available_from, available_to = _date(params.get('available_from')), _date(params.get('available_to'))
+    if not (available_from and available_to and available_from < available_to):
+        available_from = available_to = None
+    return {
+        'price': price if price in {key for key, *_ in PRICE_BUCKETS} else '',
+        'min_rent': _decimal(params.get('min_rent')),
+        'max_rent': _decimal(params.get('max_rent')),
+        'min_size': _int(params.get('min_size')),
+        'max_size': _int(params.get('max_size')),
+        'occupancy': _int(params.get('occupancy')),
+        'location': params.get('location', '').strip(),
+        'occupied': occupied if occupied in ('yes', 'no') else 'all',
+        'available_from': available_from,
+        'available_to': available_to,
+    }
+
+
+def _bucket_q(low, high):
+    q = Q()
+    if low is not None:
+        q &= Q(rent__gte=low)
+    if high is not None:
+        q &= Q(rent__lt=high)
+    return q
+
+
+def _rent_q(filters):
+    q = Q()
+    for key, _label, low, high in PRICE_BUCKETS:
+        if key == filters['price']:
+            q &= _bucket_q(low, high)
+    if filters['min_rent'] is not None:
+        q &= Q(rent__gte=filters['min_rent'])
+    if filters['max_rent'] is not None:
+        q &= Q(rent__lte=filters['max_rent'])
+    return q
+
+
+def _size_q(filters):
+    q = Q()
+    if filters['min_size'] is not None:
+        q &= Q(room_size__gte=filters['min_size'])
+    if filters['max_size'] is not None:
+        q &= Q(room_size__lte=filters['max_size'])
+    return q
+
+
+def _stay_dates(queryset, filters):
+    if filters['available_from']:
+        queryset = available_between(queryset, filters['available_from'], filters['available_to'])
+    return queryset
+
+
+def apply_listing_filters(queryset, filters):
+    queryset = _stay_dates(queryset, filters).filter(_rent_q(filters), _size_q(filters))
+    if filters['occupancy'] is not None:
+        queryset = queryset.filter(occupancy=filters['occupancy'])
+    if filters['location']:
+        queryset = queryset.filter(location=filters['location'])
+    if filters['occupied'] != 'all':
+        queryset = queryset.filter(occupied=filters['occupied'] == 'yes')
+    return queryset
+
+
+def _matches(row, filters, skip):
+    if skip != 'rent' and not row['rent_match']:
+        return False
+    if skip != 'location' and filters['location'] and row['location'] != filters['location']:
+        return False
+    if skip != 'occupancy' and filters['occupancy'] is not None and row['occupancy'] != filters['occupancy']:
+        return False
+    if skip != 'occupied' and filters['occupied'] != 'all' and row['occupied'] != (filters['occupied'] == 'yes'):
+        return False
+    return True
+
+
+def listing_facets(queryset, filters):
+    """
+    Return facet counts for ``queryset`` (unfiltered by the facet dimensions).
+
+    Issues one grouped query over (location, occupancy, occupied, price
+    bucket, rent filter match) and sums the groups per facet.
+    """
+    rent_q = _rent_q(filters)
+    rows = (
+        _stay_dates(queryset, filters).filter(_size_q(filters))
+        .order_by()
+        .annotate(
+            price_bucket=Case(
+                *[When(_bucket_q(low, high), then=Value(key)) for key, _label, low, high in PRICE_BUCKETS],
+                output_field=CharField(),
+            ),
+            rent_match=Case(
+                When(rent_q, then=Value(True)), default=Value(False), output_field=BooleanField()
+            ) if rent_q else Value(True, output_field=BooleanField()),
+        )
+        .values('location', 'occupancy', 'occupied', 'price_bucket', 'rent_match')
+        .annotate(count=Count('id'))
+    )
+
+    price, locations, occupancy, occupied = {}, {}, {}, {'yes': 0, 'no': 0}
+    total = 0
+    for row in rows:
+        count = row['count']
+        if _matches(row, filters, skip='rent'):
+            price[row['price_bucket']] = price.get(row['price_bucket'], 0) + count
+        if _matches(row, filters, skip='location'):
+            locations[row['location']] = locations.get(row['location'], 0) + count
+        if _matches(row, filters, skip='occupancy'):
+            occupancy[row['occupancy']] = occupancy.get(row['occupancy'], 0) + count
+        if _matches(row, filters, skip='occupied'):
+            occupied['yes' if row['occupied'] else 'no'] += count
+        if _matches(row, filters, skip=None):
+            total += count
+
+    top_locations = sorted(locations.items(), key=lambda item: (-item[1], item[0]))[:MAX_LOCATION_FACETS]
+    return {
+        'total': total,
+        'price': [
+            {'key': key, 'label': label, 'count': price.get(key, 0), 'selected': key == filters['price']}
+            for key, label, _low, _high in PRICE_BUCKETS
+        ],
+        'locations': [
+            {'value': value, 'count': count, 'selected': value == filters['location']}
+            for value, count in top_locations
+        ],
+        'occupancy': [
+            {
+                'value': value,
+                'label': OCCUPANCY_LABELS.get(value, f'{value} person'),
+                'count': count,
+                'selected': value == filters['occupancy'],
+            }
+            for value, count in sorted(occupancy.items())
+        ],
+        'occupied': occupied,
+    }
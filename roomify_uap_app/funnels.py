@@ -0,0 +1,177 @@
+"""
+Weekly conversion funnels: view -> message -> booking request -> accepted.
+
+Each stage is loaded once as flat NumPy columns (listing id, local time,
+actor id) and every group-by is done with array operations: listings are
+mapped to dense indexes with ``np.unique``, weeks are integer division of
+the time, and each stage is counted per (group, week) with one sort
+of a packed 64-bit (cell, actor) key plus ``np.bincount``. A stage counts
+distinct people, so ten views by one renter are one viewer; anonymous
+views count one each.
+
+Times are seconds since 1970-01-01 on the wall clock of the current
+timezone (a UNIX time shifted by the UTC offset in force), so weeks start
+at local midnight on Monday, like ``timezone.localdate``.
+
+``manage.py benchmark_funnels`` times the computation on synthetic data.
+"""
+import calendar
+from datetime import datetime, time, timezone as dt_timezone
+
+import numpy as np
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BookingRequest, Listing, ListingView, Message
+
+STAGES = ('views', 'messages', 'requests', 'accepted')
+WEEK = 7 * 24 * 3600
+# 1970-01-01 was a Thursday; shift so weeks start on Monday.
+WEEK_OFFSET = 3 * 24 * 3600
+LOAD_CHUNK_SIZE = 10000
+
+
+def _columns(rows):
+    listing, stamp, actor = [], [], []
+    for listing_id, when, actor_id in rows:
+        listing.append(listing_id)
+        stamp.append(local_seconds(when))
+        actor.append(-1 if actor_id is None else actor_id)
+    actor = np.array(actor, dtype=np.int64)
+    missing = actor < 0
+    actor[missing] = -np.arange(1, missing.sum() + 1)  # every anonymous event is its own person
+    return np.array(listing, dtype=np.int64), np.array(stamp, dtype=np.int64), actor
+
+
+def local_seconds(when):
+    """``when`` as seconds since 1970-01-01 on the current timezone's wall clock."""
+    local = timezone.localtime(when)
+    return int(local.timestamp() + local.utcoffset().total_seconds())
+
+
+def load_events(listings=None, since=None):
+    """
+    ``{stage: (listing_ids, local_times, actor_ids)}`` for ``listings`` (a
+    queryset; all if None), only events at or after ``since`` (a datetime) if given.
+    """
+    if listings is None:
+        listings = Listing.objects.all()
+    views = ListingView.objects.filter(listing__in=listings)
+    # Replies from the owner are not renter interest.
+    messages = Message.objects.filter(listing__in=listings).exclude(sender=F('listing__owner'))
+    requests = BookingRequest.objects.filter(listing__in=listings)
+    if since is not None:
+        views = views.filter(timestamp__gte=since)
+        messages = messages.filter(timestamp__gte=since)
+        requests = requests.filter(created_at__gte=since)
+
+    def load(queryset, *fields):
+        return _columns(queryset.values_list(*fields).iterator(chunk_size=LOAD_CHUNK_SIZE))
+
+    return {
+        'views': load(views, 'listing_id', 'timestamp', 'viewer_id'),
+        'messages': load(messages, 'listing_id', 'timestamp', 'sender_id'),
+        'requests': load(requests, 'listing_id', 'created_at', 'renter_id'),
+        'accepted': load(requests.filter(status='accepted'), 'listing_id', 'created_at', 'renter_id'),
+    }
+
+
+def week_index(local_times):
+    return (local_times + WEEK_OFFSET) // WEEK
+
+
+def current_week():
+    return int(week_index(calendar.timegm(timezone.localdate().timetuple())))
+
+
+def week_start(index):
+    return datetime.fromtimestamp(int(index) * WEEK - WEEK_OFFSET, tz=dt_timezone.utc).date()
+
+
+def _distinct_per_cell(cell, actors, cells):
+    """Number of distinct actors in each cell, via one sort of packed (cell, actor) keys."""
+    if not cell.size:
+        return np.zeros(cells, dtype=np.int64)
+    actors = actors - actors.min()
+    span = int(actors.max()) + 1
+    if cells * span >= 2 ** 62:
+        # Sparse ids: compact them first so the packed key can't overflow.
+        _, actors = np.unique(actors, return_inverse=True)
+        span = int(actors.max()) + 1
+    keys = np.sort(cell * span + actors)
+    first = np.empty(keys.size, dtype=bool)
+    first[0] = True
+    np.not_equal(keys[1:], keys[:-1], out=first[1:])
+    return np.bincount(keys[first] // span, minlength=cells)
+
+
+def funnel_table(events, group_ids=None, group_of=None):
+    """
+    Count distinct actors per stage for every (group, week) with any activity.
+
+    By default groups are listings. ``group_ids``/``group_of`` are parallel
+    arrays mapping listing id -> group id (e.g. owner id) to roll listings
+    up. Returns ``(groups, weeks, counts)``: group ids, week indexes and an
+    ``(n, len(STAGES))`` int array, sorted by group then week.
+    """
+    listings = [events[stage][0] for stage in STAGES]
+    weeks = [week_index(events[stage][1]) for stage in STAGES]
+    all_listings = np.concatenate(listings)
+    all_weeks = np.concatenate(weeks)
+    if not all_listings.size:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.zeros((0, len(STAGES)), np.int64)
+
+    if group_ids is not None:
+        order = np.argsort(group_ids)
+        keys, values = np.asarray(group_ids)[order], np.asarray(group_of)[order]
+        listings = [values[np.searchsorted(keys, ids)] for ids in listings]
+        all_listings = np.concatenate(listings)
+
+    groups, group_index = np.unique(all_listings, return_inverse=True)
+    first_week = all_weeks.min()
+    n_weeks = int(all_weeks.max() - first_week) + 1
+    cells = len(groups) * n_weeks
+
+    counts = np.zeros((cells, len(STAGES)), dtype=np.int64)
+    start = 0
+    for column, stage in enumerate(STAGES):
+        size = len(listings[column])
+        cell = group_index[start:start + size] * n_weeks + (weeks[column] - first_week)
+        start += size
+        counts[:, column] = _distinct_per_cell(cell, events[stage][2], cells)
+
+    active = np.flatnonzero(counts.any(axis=1))
+    return groups[active // n_weeks], active % n_weeks + first_week, counts[active]
+
+
+def conversion_rates(counts):
+    """Stage-to-stage rates (``len(STAGES) - 1`` columns), 0 where the previous stage is empty."""
+    counts = np.asarray(counts, dtype=np.float64)
+    previous = counts[..., :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(previous > 0, counts[..., 1:] / previous, 0.0)
+
+
+def owner_weekly_funnel(owner, weeks=8):
+    """
+    Rows of ``{'week', 'views', 'messages', 'requests', 'accepted', 'rates'}`` for the
+    owner's last ``weeks`` calendar weeks up to this one, newest first; quiet weeks are zeros.
+    """
+    first = current_week() - weeks + 1
+    since = timezone.make_aware(datetime.combine(week_start(first), time.min))
+    listings = Listing.objects.filter(owner=owner)
+    events = load_events(listings, since)
+    ids = np.fromiter(listings.values_list('id', flat=True), dtype=np.int64)
+    _groups, week_ids, counts = funnel_table(events, ids, np.zeros_like(ids))
+
+    window = np.zeros((weeks, len(STAGES)), dtype=np.int64)
+    recent = (week_ids >= first) & (week_ids < first + weeks)
+    window[week_ids[recent] - first] = counts[recent]
+
+    rows = []
+    for offset, (row, rates) in enumerate(zip(window, conversion_rates(window))):
+        entry = dict(zip(STAGES, row.tolist()))
+        entry['week'] = week_start(first + offset)
+        entry['rates'] = [round(rate * 100, 1) for rate in rates]
+        rows.append(entry)
+    return rows[::-1]
@@ -0,0 +1,238 @@
+"""
+Offline geocoding and geohash-indexed proximity search for listings.
+
+Listing locations are free text, so coordinates come from the bundled
+gazetteer in ``data/gazetteer.csv`` rather than an online service. Each
+geocoded listing also stores its geohash; a radius or bounding-box query is
+turned into a handful of geohash cells, each answered by a range scan on the
+indexed ``geohash`` column, and the database measures the distance of only
+those candidates. Boxes may cross the antimeridian (``west > east``); a
+radius reaching a pole covers every longitude. Boxes too large for
+``MAX_QUERY_CELLS`` cells of at least ``MIN_QUERY_PRECISION`` characters are
+refused with ``BoxTooLarge`` rather than scanning the whole table.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+GEOHASH_PRECISION = 12
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Upper bound on the number of geohash cells a query fans out to, and the
+# shortest prefix worth scanning: 64 two-character cells are a sixteenth of
+# the globe, and still enough for a ring of cells around a pole.
+MAX_QUERY_CELLS = 64
+MIN_QUERY_PRECISION = 2
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+
+
+class BoxTooLarge(ValueError):
+    pass
+
+
+def _normalize(text):
+    return ' '.join(_NON_WORD_RE.sub(' ', (text or '').lower()).split())
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """Return ``[(normalized name, lat, lng)]``, longest names first."""
+    entries = []
+    with open(GAZETTEER_PATH, newline='', encoding='utf-8') as handle:
+        for row in csv.DictReader(handle):
+            point = (float(row['latitude']), float(row['longitude']))
+            names = [row['name']] + [alias for alias in (row['aliases'] or '').split('|') if alias]
+            for name in names:
+                entries.append((_normalize(name), *point))
+    # The most specific (longest) place name mentioned in a location wins,
+    # so "Mirpur 10, Dhaka" resolves to Mirpur 10 rather than Mirpur or Dhaka.
+    entries.sort(key=lambda entry: len(entry[0]), reverse=True)
+    return entries
+
+
+def geocode(location):
+    """Return ``(lat, lng)`` for a free-text location, or ``None`` if unknown."""
+    text = f' {_normalize(location)} '
+    for name, lat, lng in load_gazetteer():
+        if f' {name} ' in text:
+            return lat, lng
+    return None
+
+
+def locate_listing(listing):
+    """Set ``listing``'s coordinates and geohash from its location (cleared if unknown). Doesn't save."""
+    point = geocode(listing.location)
+    if point:
+        listing.latitude, listing.longitude = point
+        listing.geohash = geohash_encode(*point)
+    else:
+        listing.latitude = listing.longitude = None
+        listing.geohash = ''
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def _cell_size(precision):
+    """Return (lat degrees, lng degrees) covered by one cell at ``precision``."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _check_finite(*values):
+    if not all(math.isfinite(value) for value in values):
+        raise ValueError('Coordinates must be finite numbers.')
+
+
+def covering_cells(south, west, north, east):
+    """
+    Return the smallest set of geohash prefixes (at most MAX_QUERY_CELLS) covering the box.
+
+    ``west > east`` means the box crosses the antimeridian. Raises
+    ``BoxTooLarge`` if no precision down to MIN_QUERY_PRECISION fits.
+    """
+    _check_finite(south, west, north, east)
+    south, north = max(south, -90.0), min(north, 90.0)
+    west, east = max(west, -180.0), min(east, 180.0)
+    if east < west:
+        east += 360.0
+    for precision in range(GEOHASH_PRECISION, MIN_QUERY_PRECISION - 1, -1):
+        lat_step, lng_step = _cell_size(precision)
+        last_row = round(180.0 / lat_step) - 1
+        lng_cells = round(360.0 / lng_step)
+        rows = range(int((south + 90) // lat_step), min(int((north + 90) // lat_step), last_row) + 1)
+        cols = range(int((west + 180) // lng_step), int((east + 180) // lng_step) + 1)
+        if len(rows) * min(len(cols), lng_cells) <= MAX_QUERY_CELLS:
+            return sorted({
+                geohash_encode((row + 0.5) * lat_step - 90, (col % lng_cells + 0.5) * lng_step - 180, precision)
+                for row in rows for col in cols
+            })
+    raise BoxTooLarge('The search area is too large.')
+
+
+PG_PATTERN_INDEX = 'listing_geohash_pattern_idx'
+
+
+def install_geohash_pattern_index(conn):
+    """PostgreSQL: index ``geohash`` for ``LIKE 'prefix%'`` whatever the database collation."""
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {PG_PATTERN_INDEX} ON roomify_uap_app_listing (geohash varchar_pattern_ops)'
+        )
+
+
+def drop_geohash_pattern_index(conn):
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP INDEX IF EXISTS {PG_PATTERN_INDEX}')
+
+
+def _cells_q(cells):
+    if connection.vendor == 'postgresql':
+        # Under a non-C collation '~' needn't sort after [0-9a-z]; LIKE 'prefix%'
+        # is exact and scans the varchar_pattern_ops index instead.
+        return Q.create([Q(geohash__startswith=cell) for cell in cells], connector=Q.OR)
+    # SQLite compares bytes, so '~' sorts after every geohash character and
+    # each prefix is one range scan of the plain index (its LIKE can't use it).
+    condition = Q()
+    for cell in cells:
+        condition |= Q(geohash__gte=cell, geohash__lt=cell + '~')
+    return condition
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def distance_km(lat, lng):
+    """Haversine distance from the point to each row's coordinates, as a database expression."""
+    half_d_lat = (Radians('latitude') - math.radians(lat)) / 2
+    half_d_lng = (Radians('longitude') - math.radians(lng)) / 2
+    a = Power(Sin(half_d_lat), 2) + math.cos(math.radians(lat)) * Cos(Radians('latitude')) * Power(Sin(half_d_lng), 2)
+    # Rounding can push sqrt(a) a hair above 1, outside asin's domain.
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField())
+
+
+def _wrap_lng(lng):
+    return (lng + 180.0) % 360.0 - 180.0
+
+
+def radius_box(lat, lng, radius_km):
+    """``(south, west, north, east)`` around the circle; ``west > east`` when it crosses the antimeridian."""
+    _check_finite(lat, lng, radius_km)
+    d_lat = radius_km / KM_PER_DEGREE
+    south, north = lat - d_lat, lat + d_lat
+    if south <= -90.0 or north >= 90.0:
+        # A circle around a pole spans every longitude.
+        return max(south, -90.0), -180.0, min(north, 90.0), 180.0
+    d_lng = radius_km / (KM_PER_DEGREE * math.cos(math.radians(lat)))
+    if d_lng >= 180.0:
+        return south, -180.0, north, 180.0
+    return south, _wrap_lng(lng - d_lng), north, _wrap_lng(lng + d_lng)
+
+
+def _box_q(south, west, north, east):
+    longitude = Q(longitude__gte=west, longitude__lte=east)
+    if west > east:
+        longitude = Q(longitude__gte=west) | Q(longitude__lte=east)
+    return _cells_q(covering_cells(south, west, north, east)) & Q(latitude__gte=south, latitude__lte=north) & longitude
+
+
+def listings_in_box(queryset, south, west, north, east, origin=None):
+    """
+    Return ``queryset`` narrowed to the box, nearest to ``origin`` first.
+
+    ``origin`` defaults to the centre of the box. Each listing gets a
+    ``distance_km`` annotation. Raises ``BoxTooLarge`` for oversized boxes.
+    """
+    if origin is None:
+        origin = ((south + north) / 2, _wrap_lng((west + east + (360.0 if west > east else 0.0)) / 2))
+    return (
+        queryset.filter(_box_q(south, west, north, east))
+        .annotate(distance_km=distance_km(*origin))
+        .order_by('distance_km', '-pk')
+    )
+
+
+def listings_within_radius(queryset, lat, lng, radius_km):
+    """Return ``queryset`` narrowed to ``radius_km`` of the point, nearest first."""
+    south, west, north, east = radius_box(lat, lng, radius_km)
+    return listings_in_box(queryset, south, west, north, east, origin=(lat, lng)).filter(distance_km__lte=radius_km)
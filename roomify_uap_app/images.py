@@ -0,0 +1,136 @@
+"""
+Responsive image derivatives for listing photos.
+
+When a listing cover or a ``ListingPhoto`` gets a new image,
+``schedule_derivatives`` queues a job on a small thread pool (after the
+transaction commits, so the request returns immediately). The job writes WebP
+(and AVIF where Pillow supports it) renditions at a few widths next to the
+original and records them in the row's ``image_variants``, which templates
+turn into ``srcset``.
+"""
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .catalogue import bump_catalogue_version
+from .models import Listing, ListingPhoto
+from .storage import listing_image_storage
+
+logger = logging.getLogger(__name__)
+
+# name -> max width in pixels
+DERIVATIVE_WIDTHS = {'thumb': 320, 'card': 640, 'full': 1600}
+
+# format -> (Pillow format, file extension, save options)
+DERIVATIVE_FORMATS = {
+    'avif': ('AVIF', 'avif', {'quality': 55}),
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+}
+
+DERIVATIVES_DIR = 'listing_images/derivatives'
+PHOTO_DERIVATIVES_DIR = f'{DERIVATIVES_DIR}/photos'
+
+_executor = None
+
+
+def _supported_formats():
+    Image.init()
+    return {key: spec for key, spec in DERIVATIVE_FORMATS.items() if spec[0] in Image.SAVE}
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+            thread_name_prefix='listing-images',
+        )
+    return _executor
+
+
+def needs_derivatives(instance):
+    """Whether ``instance`` (a ``Listing`` or ``ListingPhoto``) has an image without current derivatives."""
+    return bool(instance.image) and (instance.image_variants or {}).get('source') != instance.image.name
+
+
+def schedule_derivatives(instance):
+    """Queue derivative generation for ``instance``'s current image once the transaction commits."""
+    model, pk, source = type(instance), instance.pk, instance.image.name
+    if getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        transaction.on_commit(lambda: _pool().submit(_run_job, pk, source, model))
+    else:
+        transaction.on_commit(lambda: build_derivatives(pk, source, model))
+
+
+def _run_job(pk, source, model):
+    close_old_connections()
+    try:
+        build_derivatives(pk, source, model)
+    except Exception:
+        logger.exception('Building image derivatives failed for %s %s', model._meta.verbose_name, pk)
+    finally:
+        close_old_connections()
+
+
+def _render(image, width, pil_format, options):
+    rendition = image.copy()
+    if rendition.width > width:
+        rendition.thumbnail((width, width * rendition.height // rendition.width), Image.LANCZOS)
+    buffer = BytesIO()
+    rendition.save(buffer, pil_format, **options)
+    return rendition.width, buffer.getvalue()
+
+
+def build_derivatives(pk, source, model=Listing):
+    """Render every derivative of ``source`` and attach them to the ``model`` row. Returns the variants dict."""
+    with listing_image_storage().open(source, 'rb') as handle:
+        image = ImageOps.exif_transpose(Image.open(handle))
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    stem = posixpath.splitext(posixpath.basename(source))[0]
+    folder = f'{PHOTO_DERIVATIVES_DIR if model is ListingPhoto else DERIVATIVES_DIR}/{pk}'
+    formats = {}
+    for key, (pil_format, extension, options) in _supported_formats().items():
+        renditions, seen = [], set()
+        for size, width in DERIVATIVE_WIDTHS.items():
+            actual, data = _render(image, width, pil_format, options)
+            if actual in seen:
+                continue  # small originals collapse several sizes into one
+            seen.add(actual)
+            name = default_storage.save(f'{folder}/{stem}-{size}.{extension}', ContentFile(data))
+            renditions.append([actual, name])
+        formats[key] = renditions
+
+    variants = {'source': source, 'width': image.width, 'formats': formats}
+
+    # Only attach if the row still has this image; a newer upload wins.
+    current = model.objects.filter(pk=pk, image=source)
+    previous = current.values_list('image_variants', flat=True).first()
+    updated = current.update(image_variants=variants)
+    if not updated:
+        _delete_variants(variants)
+        return None
+    if previous:
+        _delete_variants(previous)
+    bump_catalogue_version()
+    return variants
+
+
+def _delete_variants(variants):
+    for renditions in (variants.get('formats') or {}).values():
+        for _width, name in renditions:
+            default_storage.delete(name)
+
+
+def srcset(instance, key):
+    renditions = ((instance.image_variants or {}).get('formats') or {}).get(key) or []
+    return ', '.join(f'{default_storage.url(name)} {width}w' for width, name in renditions)
@@ -0,0 +1,211 @@
+"""
+Bulk listing import from a CSV file, with photos from an optional ZIP.
+
+Columns: ``room_title``, ``location`` and ``rent`` are required;
+``room_size``, ``occupancy``, ``description`` and ``images`` are optional.
+``images`` names files in the ZIP separated by ``|``: the first becomes the
+cover, the rest extra photos, as with the listing form.
+
+The CSV is parsed as a stream and rows are validated as they are read,
+then inserted ``LISTING_IMPORT_BATCH_SIZE`` at a time with one
+``bulk_create`` for the listings and one for their photos, each batch in
+its own transaction. Memory stays bounded whatever the file size, and a
+failure only loses its own batch. Invalid rows are skipped and reported
+with their line number.
+
+``bulk_create`` doesn't send the ``Listing`` signals, so their work is done
+here: locations are geocoded before the insert, photos go through the same
+content-addressed storage as a form upload, image derivatives are
+scheduled, and the catalogue and owner KPIs are invalidated once per batch.
+"""
+import csv
+import io
+import posixpath
+import zipfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
+
+from .catalogue import bump_catalogue_version
+from .geo import locate_listing
+from .images import needs_derivatives, schedule_derivatives
+from .models import Listing, ListingPhoto
+from .owner_stats import invalidate_owner_stats
+from .storage import listing_image_storage
+from .uploads import ALLOWED_EXTENSIONS, _max_size
+
+REQUIRED_COLUMNS = ('room_title', 'location', 'rent')
+NON_NEGATIVE_FIELDS = ('rent', 'room_size', 'occupancy')
+IMAGE_SEPARATOR = '|'
+
+
+class ListingImportError(Exception):
+    pass
+
+
+def _batch_size():
+    return getattr(settings, 'LISTING_IMPORT_BATCH_SIZE', 200)
+
+
+def _open_archive(images_zip):
+    if not images_zip:
+        return None
+    try:
+        return zipfile.ZipFile(images_zip)
+    except zipfile.BadZipFile:
+        raise ListingImportError('The images file is not a valid ZIP archive.')
+
+
+def _open_csv(csv_file):
+    """A ``(text, reader)`` pair over the binary ``csv_file``, with lower-cased column names."""
+    text = io.TextIOWrapper(csv_file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    try:
+        columns = [(name or '').strip().lower() for name in reader.fieldnames or []]
+    except (UnicodeDecodeError, csv.Error):
+        text.detach()
+        raise ListingImportError('The file is not a UTF-8 encoded CSV file.')
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        text.detach()
+        raise ListingImportError(f"The CSV file is missing the column(s): {', '.join(missing)}.")
+    reader.fieldnames = columns
+    return text, reader
+
+
+def _rows(reader, errors):
+    """Yield ``(line_number, row)`` with stripped values; stop at a line that can't be parsed."""
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            errors.append((reader.line_num + 1, 'Not valid UTF-8 text; the rest of the file was skipped.'))
+            return
+        except csv.Error as e:
+            errors.append((reader.line_num, f'{e}; the rest of the file was skipped.'))
+            return
+        yield reader.line_num, {
+            key: (value or '').strip() for key, value in row.items() if key and isinstance(value, str)
+        }
+
+
+def _check_image(archive, name):
+    try:
+        info = archive.getinfo(name)
+    except KeyError:
+        raise ValidationError(f'{name} is not in the ZIP file.')
+    if posixpath.splitext(name)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise ValidationError(f'{name} is not a supported image type.')
+    if info.file_size > _max_size():
+        raise ValidationError(f'{name} is too large.')
+    try:
+        with archive.open(info) as member, Image.open(member) as image:
+            image.verify()
+    except Exception:
+        raise ValidationError(f'{name} is not a valid image.')
+
+
+def _build(owner, row, archive):
+    """An unsaved, validated, geocoded ``Listing`` for ``row`` and its image names. Raises ``ValidationError``."""
+    missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+    if missing:
+        raise ValidationError(f"Missing {', '.join(missing)}.")
+
+    listing = Listing(
+        owner=owner,
+        room_title=row['room_title'],
+        location=row['location'],
+        rent=row['rent'],
+        room_size=row.get('room_size') or 0,
+        occupancy=row.get('occupancy') or 1,
+        description=row.get('description', ''),
+    )
+    # The form allows an empty description, so the import does too.
+    listing.full_clean(exclude=['owner', 'image', 'description'], validate_unique=False)
+    negative = [field for field in NON_NEGATIVE_FIELDS if getattr(listing, field) < 0]
+    if negative:
+        raise ValidationError(f"{', '.join(negative)} can't be negative.")
+
+    images = [name.strip() for name in row.get('images', '').split(IMAGE_SEPARATOR) if name.strip()]
+    if images and archive is None:
+        raise ValidationError('Images are listed but no ZIP file was uploaded.')
+    for name in images:
+        _check_image(archive, name)
+
+    locate_listing(listing)
+    return listing, images
+
+
+def _message(error):
+    if hasattr(error, 'error_dict'):
+        return ' '.join(
+            f"{field.replace('_', ' ')}: {' '.join(messages)}" for field, messages in error.message_dict.items()
+        )
+    return ' '.join(error.messages)
+
+
+def _store(archive, name, storage):
+    with archive.open(name) as member:
+        return storage.save(f'listing_images/{posixpath.basename(name)}', File(member))
+
+
+def _insert(owner, batch, archive):
+    storage = listing_image_storage()
+    with transaction.atomic():
+        photos = []
+        for listing, images in batch:
+            stored = [_store(archive, name, storage) for name in images]
+            if stored:
+                listing.image = stored[0]
+                photos += [
+                    ListingPhoto(listing=listing, image=name, position=position)
+                    for position, name in enumerate(stored[1:])
+                ]
+        listings = Listing.objects.bulk_create([listing for listing, _ in batch])
+        photos = ListingPhoto.objects.bulk_create(photos)
+
+        for instance in [*listings, *photos]:
+            if needs_derivatives(instance):
+                schedule_derivatives(instance)
+        transaction.on_commit(bump_catalogue_version)
+        transaction.on_commit(lambda: invalidate_owner_stats(owner.pk))
+    return len(listings)
+
+
+def import_listings(owner, csv_file, images_zip=None, batch_size=None):
+    """
+    Create ``owner``'s listings from ``csv_file`` (binary), with photos from ``images_zip``.
+
+    Returns ``{'created': n, 'errors': [(line_number, message), ...]}``.
+    Raises ``ListingImportError`` (and imports nothing) if the files can't be read.
+    """
+    batch_size = batch_size or _batch_size()
+    archive = _open_archive(images_zip)
+    result = {'created': 0, 'errors': []}
+    batch = []
+    try:
+        text, reader = _open_csv(csv_file)
+        try:
+            for line, row in _rows(reader, result['errors']):
+                try:
+                    batch.append(_build(owner, row, archive))
+                except ValidationError as e:
+                    result['errors'].append((line, _message(e)))
+                    continue
+                if len(batch) == batch_size:
+                    result['created'] += _insert(owner, batch, archive)
+                    batch = []
+            if batch:
+                result['created'] += _insert(owner, batch, archive)
+        finally:
+            # Leave the upload open for its owner to close.
+            text.detach()
+    finally:
+        if archive is not None:
+            archive.close()
+    return result
@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Time the vectorised funnel computation on synthetic event logs of increasing size.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000],
+            help='Total events per run (split 85/10/4/1 across view/message/request/accepted).',
+        )
+        parser.add_argument('--listings', type=int, default=20_000)
+        parser.add_argument('--users', type=int, default=200_000)
+        parser.add_argument('--weeks', type=int, default=52)
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N timings.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy as np
+
+            from roomify_uap_app.funnels import STAGES, WEEK, funnel_table
+        except ImportError as exc:
+            raise CommandError(f'NumPy is required for funnel analytics: {exc}')
+
+        rng = np.random.default_rng(options['seed'])
+        shares = dict(zip(STAGES, (0.85, 0.10, 0.04, 0.01)))
+        now = int(time.time())
+        owners = rng.integers(0, max(options['listings'] // 5, 1), options['listings'])
+
+        self.stdout.write(f"{'events':>12} {'by listing':>12} {'by owner':>12} {'events/s':>14}")
+        for size in options['sizes']:
+            events = {}
+            for stage, share in shares.items():
+                n = max(int(size * share), 1)
+                events[stage] = (
+                    rng.integers(0, options['listings'], n),
+                    now - rng.integers(0, options['weeks'] * WEEK, n),
+                    rng.integers(0, options['users'], n),
+                )
+            listing_ids = np.arange(options['listings'])
+
+            timings = []
+            for group_args in ((), (listing_ids, owners)):
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    funnel_table(events, *group_args)
+                    best = min(best, time.perf_counter() - started)
+                timings.append(best)
+            self.stdout.write(
+                f'{size:>12,} {timings[0]:>11.3f}s {timings[1]:>11.3f}s {size / timings[0]:>14,.0f}'
+            )
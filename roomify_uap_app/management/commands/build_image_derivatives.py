@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from roomify_uap_app.images import build_derivatives, needs_derivatives
+from roomify_uap_app.models import Listing, ListingPhoto
+
+
+class Command(BaseCommand):
+    help = 'Render WebP/AVIF derivatives for listing images and photos that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-render every listing image.')
+
+    def handle(self, *args, **options):
+        built = failed = 0
+        for model in (Listing, ListingPhoto):
+            images = model.objects.exclude(image='').exclude(image__isnull=True).only('id', 'image', 'image_variants')
+            for instance in images.iterator(chunk_size=200):
+                if not options['force'] and not needs_derivatives(instance):
+                    continue
+                try:
+                    build_derivatives(instance.pk, instance.image.name, model)
+                    built += 1
+                except (OSError, ValueError) as exc:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {instance.pk} ({instance.image.name}): {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {built} image(s), {failed} failed.'))
@@ -0,0 +1,97 @@
+import os
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from roomify_uap_app.catalogue import bump_catalogue_version
+from roomify_uap_app.models import Listing, ListingPhoto, StoredBlob
+from roomify_uap_app.storage import CAS_PREFIX, blob_name, hash_file, listing_image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the flat media/listing_images/ tree into content-addressed storage, '
+        'merging byte-identical files, repointing listings and recounting references.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without touching anything.')
+        parser.add_argument('--prune', action='store_true', help='Delete stored files no listing or photo references.')
+
+    def handle(self, *args, **options):
+        storage = listing_image_storage()
+        dry_run = options['dry_run']
+        root = Path(storage.path('listing_images'))
+
+        groups = defaultdict(list)
+        for path in sorted(root.iterdir()) if root.exists() else []:
+            if path.is_file():
+                with open(path, 'rb') as handle:
+                    groups[hash_file(handle)].append(path)
+
+        renames, removed, saved_bytes = {}, 0, 0
+        for digest, paths in groups.items():
+            name = blob_name(digest, paths[0].suffix.lower())
+            target = Path(storage.path(name))
+            for path in paths:
+                renames[f'listing_images/{path.name}'] = name
+            duplicates = paths[1:] if not target.exists() else paths
+            saved_bytes += sum(path.stat().st_size for path in duplicates)
+            removed += len(duplicates)
+            if dry_run:
+                continue
+            if not target.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(paths[0], target)
+            for path in duplicates:
+                path.unlink()
+
+        self.stdout.write(
+            f'{sum(len(paths) for paths in groups.values())} file(s) in {len(groups)} distinct blob(s); '
+            f'{removed} duplicate(s), {saved_bytes / 1024 / 1024:.1f} MB reclaimable.'
+        )
+        if dry_run:
+            return
+
+        with transaction.atomic():
+            repointed = 0
+            for old, new in renames.items():
+                repointed += Listing.objects.filter(image=old).update(image=new)
+                ListingPhoto.objects.filter(image=old).update(image=new)
+            self._recount(storage, options['prune'])
+        bump_catalogue_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Repointed {repointed} listing(s). Run build_image_derivatives to refresh their renditions.'
+        ))
+
+    def _recount(self, storage, prune):
+        """Make StoredBlob.refs match the listing covers and photos that actually reference each blob."""
+        counts = Counter()
+        for model in (Listing, ListingPhoto):
+            counts.update(dict(
+                model.objects.filter(image__startswith=f'{CAS_PREFIX}/')
+                .values_list('image').annotate(n=Count('id')).order_by()
+            ))
+        blob_root = Path(storage.path(CAS_PREFIX))
+        on_disk = {
+            f'{CAS_PREFIX}/{path.parent.name}/{path.name}': path
+            for path in blob_root.glob('*/*') if path.is_file()
+        }
+        StoredBlob.objects.exclude(name__in=list(on_disk)).delete()
+        for name, path in on_disk.items():
+            refs = counts.get(name, 0)
+            if refs == 0 and prune:
+                StoredBlob.objects.filter(name=name).delete()
+                path.unlink()
+                continue
+            StoredBlob.objects.update_or_create(
+                name=name,
+                defaults={'sha256': path.stem, 'size': path.stat().st_size, 'refs': refs},
+            )
+        missing = set(counts) - set(on_disk)
+        for name in sorted(missing):
+            self.stderr.write(f'Missing blob referenced by listings or photos: {name}')
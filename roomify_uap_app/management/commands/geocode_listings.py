@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from roomify_uap_app.geo import geocode, geohash_encode
+from roomify_uap_app.models import Listing
+
+
+class Command(BaseCommand):
+    help = 'Re-geocode listing locations from the bundled gazetteer (run after editing data/gazetteer.csv).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='Only listings without coordinates.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.only('id', 'location', 'latitude', 'longitude', 'geohash').order_by('id')
+        if options['missing']:
+            listings = listings.filter(latitude__isnull=True)
+
+        changed, batch, resolved = [], options['batch_size'], 0
+        for listing in listings.iterator(chunk_size=batch):
+            point = geocode(listing.location)
+            geohash = geohash_encode(*point) if point else ''
+            if point:
+                resolved += 1
+            if (listing.latitude, listing.longitude, listing.geohash) != (*(point or (None, None)), geohash):
+                listing.latitude, listing.longitude = point or (None, None)
+                listing.geohash = geohash
+                changed.append(listing)
+
+        Listing.objects.bulk_update(changed, ['latitude', 'longitude', 'geohash'], batch_size=batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'{resolved} listing(s) resolved, {len(changed)} updated.'
+        ))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from roomify_uap_app.models import ChunkedUpload
+from roomify_uap_app.uploads import discard
+
+
+class Command(BaseCommand):
+    help = 'Delete chunked photo uploads that were abandoned or never attached to a listing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Age after which an unattached upload is stale.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for upload in stale.iterator():
+            discard(upload)
+            count += 1
+        stale.delete()
+        self.stdout.write(self.style.SUCCESS(f'Purged {count} stale uploads.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed "similar rooms" table (incremental unless --full).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Refit vocabularies and recompute everything.')
+        parser.add_argument('--top-k', type=int, default=None, help='Neighbours kept per listing.')
+
+    def handle(self, *args, **options):
+        try:
+            from roomify_uap_app.recommendations import TOP_K, rebuild_similar_listings
+        except ImportError as exc:
+            raise CommandError(f'NumPy is required to build recommendations: {exc}')
+
+        updated = rebuild_similar_listings(full=options['full'], k=options['top_k'] or TOP_K)
+        self.stdout.write(self.style.SUCCESS(f'Updated similar listings for {updated} listing(s).'))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from roomify_uap_app.rollups import BATCH_SIZE, rollup_listing_views
+
+
+class Command(BaseCommand):
+    help = 'Fold new listing views into the ListingViewDaily rollup (from the last high-water mark).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='View ids processed per transaction.')
+        parser.add_argument('--every', type=int, default=0, help='Keep running, rolling up every N seconds.')
+        parser.add_argument(
+            '--lag', type=int, default=None,
+            help='Seconds a view id must have been visible before it is rolled up (default LISTING_VIEW_ROLLUP_LAG).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed, written = rollup_listing_views(batch_size=options['batch_size'], lag=options['lag'])
+            self.stdout.write(self.style.SUCCESS(f'Rolled up {processed} view(s) into {written} day row(s).'))
+            if not options['every']:
+                return
+            close_old_connections()
+            time.sleep(options['every'])
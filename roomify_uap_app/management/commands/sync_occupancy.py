@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from roomify_uap_app.availability import sync_occupancy
+from roomify_uap_app.catalogue import bump_catalogue_version
+
+
+class Command(BaseCommand):
+    help = "Recompute every listing's beds taken tonight from accepted stays (run daily)."
+
+    def handle(self, *args, **options):
+        listings = sync_occupancy()
+        bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f'Synced occupancy of {listings} listing(s).'))
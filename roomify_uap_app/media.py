@@ -0,0 +1,155 @@
+"""
+Serving uploaded media in production.
+
+``media_response`` answers conditional requests (ETag / Last-Modified) with
+304, serves single byte ranges with 206 so browsers can resume and seek, and
+marks content-addressed files as immutable so they are cached for a year.
+With ``MEDIA_SENDFILE_HEADER`` set, the file body is handed to the front
+proxy (``X-Sendfile`` for Apache/lighttpd, ``X-Accel-Redirect`` for nginx)
+and never passes through Python.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, parse_etags
+
+from .images import DERIVATIVES_DIR
+from .storage import CAS_PREFIX
+
+mimetypes.add_type('image/avif', '.avif')
+mimetypes.add_type('image/webp', '.webp')
+
+READ_BLOCK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600, must-revalidate'
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+_SHA256_NAME_RE = re.compile(r'([0-9a-f]{64})\.\w+$')
+
+
+def _is_immutable(name):
+    # Content-addressed blobs and their derivatives never change in place.
+    return name.startswith((f'{CAS_PREFIX}/', f'{DERIVATIVES_DIR}/'))
+
+
+def _etag(name, stat):
+    match = _SHA256_NAME_RE.search(name)
+    if match and name.startswith(f'{CAS_PREFIX}/'):
+        return f'"{match.group(1)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        etags = parse_etags(if_none_match)
+        return '*' in etags or etag in etags
+    since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    return since is not None and int(mtime) <= since
+
+
+def parse_range(header, size):
+    """
+    Return ``(start, end)`` (inclusive) for a single-range ``Range`` header,
+    ``None`` to ignore it, or raise ``ValueError`` if it can't be satisfied.
+    """
+    match = _RANGE_RE.match((header or '').replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None  # multi-range and malformed headers get the whole file
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if if_range is None:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as handle:
+        handle.seek(start)
+        while length > 0:
+            block = handle.read(min(READ_BLOCK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def _sendfile(response, name, full_path):
+    header = getattr(settings, 'MEDIA_SENDFILE_HEADER', None)
+    if header == 'X-Accel-Redirect':
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response[header] = prefix.rstrip('/') + '/' + name
+    else:
+        response[header] = full_path
+    return response
+
+
+def media_response(request, name):
+    """Build the response for the media file ``name`` (relative to ``MEDIA_ROOT``)."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404('Media file not found.')
+    if not os.path.isfile(full_path):
+        raise Http404('Media file not found.')
+
+    size = stat.st_size
+    etag = _etag(name, stat)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if _is_immutable(name) else DEFAULT_CACHE_CONTROL,
+        'Accept-Ranges': 'bytes',
+    }
+    if _not_modified(request, etag, stat.st_mtime):
+        return HttpResponseNotModified(headers=headers)
+
+    content_type, encoding = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if getattr(settings, 'MEDIA_SENDFILE_HEADER', None):
+        # The proxy handles Range itself once it has the file.
+        response = HttpResponse(content_type=content_type, headers=headers)
+        return _sendfile(response, name, full_path)
+
+    start, end, status = 0, size - 1, 200
+    if 'Range' in request.headers and _range_applies(request, etag, stat.st_mtime):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            (start, end), status = byte_range, 206
+
+    length = end - start + 1 if size else 0
+    body = _read(full_path, start, length) if request.method != 'HEAD' else []
+    response = StreamingHttpResponse(body, status=status, content_type=content_type, headers=headers)
+    response['Content-Length'] = str(length)
+    if status == 206:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
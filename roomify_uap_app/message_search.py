@@ -0,0 +1,170 @@
+"""
+Full-text search over a user's messages.
+
+SQLite keeps an FTS5 index over ``Message.content`` in
+``roomify_uap_app_message_fts`` (external content table, synced by triggers
+created in migration 0014 and re-created after every ``migrate``, like the
+listing index). PostgreSQL uses a GIN expression index over the tsvector
+below. Results are restricted to messages the user sent or received, come
+newest first with keyset pagination on the message id, and carry a
+highlighted snippet.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Message
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .search import fts5_query
+
+SEARCH_PAGE_SIZE = 20
+SNIPPET_TOKENS = 24
+
+FTS_TABLE = 'roomify_uap_app_message_fts'
+
+# Must match the expression indexed by migration 0014 exactly, otherwise
+# PostgreSQL will not use the GIN index.
+PG_DOCUMENT = "to_tsvector('english', content)"
+
+# Markers put around matched terms by the database, swapped for <mark> tags
+# once the rest of the snippet has been HTML-escaped.
+MARK_OPEN, MARK_CLOSE = '\x02', '\x03'
+
+SQLITE_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content,
+        content='roomify_uap_app_message', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_insert AFTER INSERT ON roomify_uap_app_message BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_delete AFTER DELETE ON roomify_uap_app_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS message_fts_update
+    AFTER UPDATE OF content ON roomify_uap_app_message BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, new.content);
+    END""",
+]
+
+PG_INDEX_DDL = [
+    f"CREATE INDEX IF NOT EXISTS message_search_idx ON roomify_uap_app_message USING GIN (({PG_DOCUMENT}))",
+]
+
+
+def install_message_index(conn, rebuild=False):
+    """Create the message index and its sync triggers if they are missing. Safe to run repeatedly."""
+    if conn.vendor == 'sqlite':
+        statements = list(SQLITE_INDEX_DDL)
+        if rebuild:
+            statements.append(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif conn.vendor == 'postgresql':
+        statements = PG_INDEX_DDL
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_message_index(conn):
+    if conn.vendor == 'sqlite':
+        statements = [
+            'DROP TRIGGER IF EXISTS message_fts_insert',
+            'DROP TRIGGER IF EXISTS message_fts_delete',
+            'DROP TRIGGER IF EXISTS message_fts_update',
+            f'DROP TABLE IF EXISTS {FTS_TABLE}',
+        ]
+    elif conn.vendor == 'postgresql':
+        statements = ['DROP INDEX IF EXISTS message_search_idx']
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def _sqlite_hits(user, text, before, limit):
+    match = fts5_query(text)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT m.id, snippet({FTS_TABLE}, 0, %s, %s, '…', %s) "
+            f"FROM {FTS_TABLE} JOIN roomify_uap_app_message m ON m.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND (m.sender_id = %s OR m.receiver_id = %s) "
+            f"AND {FTS_TABLE}.rowid < %s "
+            f"ORDER BY {FTS_TABLE}.rowid DESC LIMIT %s",
+            [MARK_OPEN, MARK_CLOSE, SNIPPET_TOKENS, match, user.pk, user.pk, before, limit],
+        )
+        return cursor.fetchall()
+
+
+def _postgres_hits(user, text, before, limit):
+    options = f'StartSel={MARK_OPEN}, StopSel={MARK_CLOSE}, MaxWords={SNIPPET_TOKENS}, MinWords=8'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id, ts_headline('english', content, websearch_to_tsquery('english', %s), %s) "
+            f"FROM roomify_uap_app_message "
+            f"WHERE {PG_DOCUMENT} @@ websearch_to_tsquery('english', %s) "
+            f"AND (sender_id = %s OR receiver_id = %s) AND id < %s "
+            f"ORDER BY id DESC LIMIT %s",
+            [text, options, text, user.pk, user.pk, before, limit],
+        )
+        return cursor.fetchall()
+
+
+def _scan_hits(user, text, before, limit):
+    # No inverted index available on this backend; fall back to a scan.
+    messages = Message.objects.filter(
+        Q(sender=user) | Q(receiver=user), content__icontains=text, id__lt=before
+    ).order_by('-id')
+    return list(messages.values_list('id', 'content')[:limit])
+
+
+def _highlight(snippet):
+    return mark_safe(escape(snippet).replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>'))
+
+
+def search_messages(user, text, cursor=None, per_page=SEARCH_PAGE_SIZE):
+    """
+    One page of ``user``'s messages matching ``text``, newest first: ``(messages, next_cursor)``.
+
+    Each message has a ``snippet`` attribute: safe HTML with matches in ``<mark>``.
+    Raises ``InvalidCursor`` for a malformed cursor.
+    """
+    text = (text or '').strip()
+    if not text:
+        return [], None
+
+    before = 2 ** 63 - 1
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise InvalidCursor(cursor)
+        before = values[0]
+
+    if connection.vendor == 'sqlite':
+        hits = _sqlite_hits(user, text, before, per_page + 1)
+    elif connection.vendor == 'postgresql':
+        hits = _postgres_hits(user, text, before, per_page + 1)
+    else:
+        hits = _scan_hits(user, text, before, per_page + 1)
+
+    has_more = len(hits) > per_page
+    hits = hits[:per_page]
+
+    found = Message.objects.select_related('sender', 'receiver', 'listing').in_bulk([pk for pk, _ in hits])
+    results = []
+    for pk, snippet in hits:
+        message = found.get(pk)
+        if message is None:
+            continue
+        message.snippet = _highlight(snippet)
+        results.append(message)
+
+    next_cursor = encode_cursor([hits[-1][0]]) if has_more else None
+    return results, next_cursor
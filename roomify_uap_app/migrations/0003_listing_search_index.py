@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from roomify_uap_app.search import install_search_index
+    install_search_index(schema_editor.connection, rebuild=True)
+
+
+def drop_index(apps, schema_editor):
+    from roomify_uap_app.search import drop_search_index
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0002_listing_feed_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
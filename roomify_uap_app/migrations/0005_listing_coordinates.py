@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:33
+
+from django.db import migrations, models
+
+
+def geocode_existing(apps, schema_editor):
+    from roomify_uap_app.geo import geocode, geohash_encode
+    Listing = apps.get_model('roomify_uap_app', 'Listing')
+    for pk, location in list(Listing.objects.values_list('id', 'location')):
+        point = geocode(location)
+        if point:
+            Listing.objects.filter(pk=pk).update(
+                latitude=point[0], longitude=point[1], geohash=geohash_encode(*point)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0004_listing_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, max_length=12),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(geocode_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:44
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0009_listing_photos_chunked_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listingview',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='listingview',
+            index=models.Index(fields=['listing', 'timestamp'], name='listing_view_time_idx'),
+        ),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def thread_existing_messages(apps, schema_editor):
+    Conversation = apps.get_model('roomify_uap_app', 'Conversation')
+    Message = apps.get_model('roomify_uap_app', 'Message')
+    Profile = apps.get_model('roomify_uap_app', 'Profile')
+    owners = set(Profile.objects.filter(role='owner').values_list('user_id', flat=True))
+
+    threads = {}
+    messages = list(Message.objects.select_related('listing').order_by('timestamp', 'id'))
+    for message in messages:
+        pair = (message.sender_id, message.receiver_id)
+        if message.listing_id and message.listing.owner_id in pair:
+            owner_id = message.listing.owner_id
+        elif message.sender_id in owners:
+            owner_id = message.sender_id
+        else:
+            owner_id = message.receiver_id
+        renter_id = message.receiver_id if owner_id == message.sender_id else message.sender_id
+        key = (message.listing_id, owner_id, renter_id)
+        if key not in threads:
+            threads[key] = Conversation.objects.create(listing_id=message.listing_id, owner_id=owner_id, renter_id=renter_id)
+        conversation = threads[key]
+        message.conversation = conversation
+        conversation.last_message, conversation.last_message_at = message, message.timestamp
+        if not message.is_read:
+            if message.receiver_id == owner_id:
+                conversation.owner_unread += 1
+            else:
+                conversation.renter_unread += 1
+
+    Message.objects.bulk_update(messages, ['conversation'], batch_size=500)
+    Conversation.objects.bulk_update(
+        threads.values(), ['last_message', 'last_message_at', 'owner_unread', 'renter_unread'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0012_notification_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('owner_unread', models.PositiveIntegerField(default=0)),
+                ('renter_unread', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='roomify_uap_app.message')),
+                ('listing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='roomify_uap_app.listing')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='owner_conversations', to=settings.AUTH_USER_MODEL)),
+                ('renter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renter_conversations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='roomify_uap_app.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', '-timestamp', '-id'], name='message_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['owner', '-last_message_at', '-id'], name='conversation_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['renter', '-last_message_at', '-id'], name='conversation_renter_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(fields=('listing', 'owner', 'renter'), name='unique_conversation'),
+        ),
+        migrations.RunPython(thread_existing_messages, migrations.RunPython.noop),
+    ]
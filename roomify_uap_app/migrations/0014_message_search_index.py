@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from roomify_uap_app.message_search import install_message_index
+    install_message_index(schema_editor.connection, rebuild=True)
+
+
+def drop_index(apps, schema_editor):
+    from roomify_uap_app.message_search import drop_message_index
+    drop_message_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0013_conversations'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def dedupe_and_count_bookings(apps, schema_editor):
+    BookingRequest = apps.get_model('roomify_uap_app', 'BookingRequest')
+    Listing = apps.get_model('roomify_uap_app', 'Listing')
+
+    # Keep one active request per renter and listing (an accepted one if any,
+    # else the oldest); the rest are double submissions.
+    seen, duplicates = set(), []
+    active = BookingRequest.objects.filter(status__in=['pending', 'accepted']).order_by('status', 'created_at', 'id')
+    for booking_id, renter_id, listing_id in active.values_list('id', 'renter_id', 'listing_id'):
+        if (renter_id, listing_id) in seen:
+            duplicates.append(booking_id)
+        seen.add((renter_id, listing_id))
+    BookingRequest.objects.filter(id__in=duplicates).delete()
+
+    accepted = {}
+    for listing_id in BookingRequest.objects.filter(status='accepted').values_list('listing_id', flat=True):
+        accepted[listing_id] = accepted.get(listing_id, 0) + 1
+    listings = list(Listing.objects.filter(id__in=accepted))
+    for listing in listings:
+        listing.occupants = min(accepted[listing.id], max(listing.occupancy, 0))
+        listing.occupied = listing.occupied or listing.occupants >= listing.occupancy
+    Listing.objects.bulk_update(listings, ['occupants', 'occupied'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0014_message_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingrequest',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='occupants',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(dedupe_and_count_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='bookingrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'accepted'])), fields=('renter', 'listing'), name='one_active_booking_per_listing'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingrequest',
+            constraint=models.UniqueConstraint(fields=('renter', 'idempotency_key'), name='unique_booking_idempotency_key'),
+        ),
+    ]
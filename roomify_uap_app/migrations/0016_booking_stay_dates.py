@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:02
+
+import datetime
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_stays_on_request_date(apps, schema_editor):
+    # Existing requests had no dates: treat them as open-ended stays from the day they were made.
+    BookingRequest = apps.get_model('roomify_uap_app', 'BookingRequest')
+    bookings = list(BookingRequest.objects.only('id', 'created_at'))
+    for booking in bookings:
+        booking.start_date = timezone.localdate(booking.created_at)
+    BookingRequest.objects.bulk_update(bookings, ['start_date'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0015_booking_engine'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingrequest',
+            name='end_date',
+            field=models.DateField(default=datetime.date(9999, 12, 31)),
+        ),
+        migrations.AddField(
+            model_name='bookingrequest',
+            name='start_date',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(start_stays_on_request_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bookingrequest',
+            index=models.Index(condition=models.Q(('status', 'accepted')), fields=['listing', 'start_date', 'end_date'], name='booking_stay_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingrequest',
+            constraint=models.CheckConstraint(condition=models.Q(('end_date__gt', models.F('start_date'))), name='booking_stay_dates_ordered'),
+        ),
+    ]
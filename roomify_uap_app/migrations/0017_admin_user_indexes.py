@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_indexes(apps, schema_editor):
+    from roomify_uap_app.user_admin import install_user_indexes
+    install_user_indexes(schema_editor.connection)
+
+
+def drop_indexes(apps, schema_editor):
+    from roomify_uap_app.user_admin import drop_user_indexes
+    drop_user_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0016_booking_stay_dates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='owner',
+            index=models.Index(fields=['is_verified', 'id'], name='owner_verified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renter',
+            index=models.Index(fields=['is_verified', 'id'], name='renter_verified_idx'),
+        ),
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def answer_on_request_date(apps, schema_editor):
+    # When old requests were answered wasn't recorded; the request date keeps them on the badge.
+    BookingRequest = apps.get_model('roomify_uap_app', 'BookingRequest')
+    BookingRequest.objects.filter(status__in=['accepted', 'rejected']).update(answered_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0017_admin_user_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bookingrequest',
+            name='answered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificationcounter',
+            name='answered_seen_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(answer_on_request_date, migrations.RunPython.noop),
+    ]
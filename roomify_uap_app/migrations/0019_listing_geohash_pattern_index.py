@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from roomify_uap_app.geo import install_geohash_pattern_index
+    install_geohash_pattern_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from roomify_uap_app.geo import drop_geohash_pattern_index
+    drop_geohash_pattern_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0018_notification_seen_marker'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_indexes(apps, schema_editor):
+    from roomify_uap_app.user_admin import install_user_pattern_indexes
+    install_user_pattern_indexes(schema_editor.connection)
+
+
+def drop_indexes(apps, schema_editor):
+    from roomify_uap_app.user_admin import drop_user_pattern_indexes
+    drop_user_pattern_indexes(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0019_listing_geohash_pattern_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
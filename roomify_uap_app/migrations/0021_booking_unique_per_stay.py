@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0020_user_search_pattern_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='bookingrequest',
+            name='one_active_booking_per_listing',
+        ),
+        migrations.AddConstraint(
+            model_name='bookingrequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'accepted'])), fields=('renter', 'listing', 'start_date'), name='one_active_booking_per_stay'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:37
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0021_booking_unique_per_stay'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listing',
+            name='occupancy',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('roomify_uap_app', '0022_listing_occupancy_min'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingphoto',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
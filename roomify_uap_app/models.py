@@ -1,5 +1,12 @@
+import uuid
+from datetime import date
+
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .storage import listing_image_storage
 
 class Profile(models.Model):
     USER_ROLES = (('owner','Owner'),('renter','Renter'))
@@ -11,10 +18,19 @@ class Owner(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Admin lists filtered by verification status, newest first.
+            models.Index(fields=['is_verified', 'id'], name='owner_verified_idx'),
+        ]
+
 class Renter(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     is_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [models.Index(fields=['is_verified', 'id'], name='renter_verified_idx')]
+
 
 class Listing(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='listings')
@@ -22,25 +38,190 @@ class Listing(models.Model):
     location = models.CharField(max_length=200)
     rent = models.DecimalField(max_digits=10, decimal_places=2)
     room_size = models.IntegerField()
-    occupancy = models.IntegerField()
+    occupancy = models.IntegerField(validators=[MinValueValidator(1)])  # beds; a room sleeps at least one
     description = models.TextField()
-    image = models.ImageField(upload_to='listing_images/', blank=True, null=True)
+    image = models.ImageField(upload_to='listing_images/', storage=listing_image_storage, blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # WebP/AVIF renditions, see images.py
     created_at = models.DateTimeField(auto_now_add=True)
     occupied = models.BooleanField(default=False)  # Added for analytics
+    # Beds taken tonight; recomputed from accepted stays by availability.sync_occupancy, never saved from a stale copy.
+    occupants = models.PositiveIntegerField(default=0)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the renter feed walks this index.
+            models.Index(fields=['-created_at', '-id'], name='listing_feed_idx'),
+            # Feed filters: availability keeps the feed order, the rest are range scans on rent.
+            models.Index(fields=['occupied', '-created_at', '-id'], name='listing_avail_feed_idx'),
+            models.Index(fields=['location', 'rent'], name='listing_location_rent_idx'),
+            models.Index(fields=['occupancy', 'rent'], name='listing_occupancy_rent_idx'),
+            models.Index(fields=['rent', 'room_size'], name='listing_rent_size_idx'),
+        ]
 
     def __str__(self):
         return self.room_title
 
 
+class ListingPhoto(models.Model):
+    """Additional photos of a listing; ``Listing.image`` remains the cover."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='photos')
+    image = models.ImageField(upload_to='listing_images/', storage=listing_image_storage)
+    image_variants = models.JSONField(default=dict, blank=True)  # WebP/AVIF renditions, see images.py
+    position = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['listing', 'position', 'id']
+
+    def __str__(self):
+        return f"Photo {self.position} of {self.listing_id}"
+
+
+class ChunkedUpload(models.Model):
+    """A resumable photo upload being assembled chunk by chunk (see uploads.py)."""
+    STATUS_CHOICES = [('uploading', 'Uploading'), ('complete', 'Complete'), ('attached', 'Attached')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    received_chunks = models.PositiveIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='uploading')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_chunks}/{self.total_chunks})"
+
+
+class StoredBlob(models.Model):
+    """A content-addressed media file and how many listings reference it (see storage.py)."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refs = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refs} refs)"
+
+
+class SimilarListing(models.Model):
+    """Precomputed nearest neighbours of a listing (see ``rebuild_similar_listings``)."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='similar_listings')
+    similar = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['listing', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'rank'], name='unique_similar_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} ~ {self.similar_id} ({self.score:.3f})"
+
+
 class ListingView(models.Model):
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='views')
     viewer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set by the recorder when the view happened, not when its batch was flushed.
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['listing', 'timestamp'], name='listing_view_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.listing.room_title} viewed at {self.timestamp}"
 
+class ListingViewDaily(models.Model):
+    """Per-listing, per-day view totals rolled up from ListingView (see rollups.py)."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='daily_views')
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    unique_viewers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['listing', 'day']
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'day'], name='unique_listing_view_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.listing_id} on {self.day}: {self.count}"
+
+
+class RollupCheckpoint(models.Model):
+    """High-water mark (last source row id) an incremental rollup has processed."""
+    name = models.CharField(max_length=50, primary_key=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.position}"
+
+
+class NotificationCounter(models.Model):
+    """Per-user navbar badge counts, kept current by signals (see notifications.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    # Owner: incoming requests awaiting an answer.
+    pending_requests = models.PositiveIntegerField(default=0)
+    # Renter: own requests answered since they last cleared their notifications.
+    answered_requests = models.PositiveIntegerField(default=0)
+    answered_seen_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.pending_requests} pending, {self.answered_requests} answered"
+
+
+class Conversation(models.Model):
+    """A renter/owner thread about one listing, with its latest message and unread counts denormalised."""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, null=True, blank=True, related_name='conversations')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owner_conversations')
+    renter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='renter_conversations')
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    owner_unread = models.PositiveIntegerField(default=0)
+    renter_unread = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['listing', 'owner', 'renter'], name='unique_conversation'),
+        ]
+        indexes = [
+            # Inbox order for each side.
+            models.Index(fields=['owner', '-last_message_at', '-id'], name='conversation_owner_idx'),
+            models.Index(fields=['renter', '-last_message_at', '-id'], name='conversation_renter_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.renter_id} <-> {self.owner_id} about {self.listing_id}"
+
+    def other_party(self, user):
+        return self.renter if user.pk == self.owner_id else self.owner
+
+    def unread_for(self, user):
+        return self.owner_unread if user.pk == self.owner_id else self.renter_unread
+
+
 class Message(models.Model):
+    conversation = models.ForeignKey(
+        Conversation, on_delete=models.CASCADE, null=True, blank=True, related_name='messages'
+    )
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, null=True, blank=True)
@@ -48,9 +229,19 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of a thread's history.
+            models.Index(fields=['conversation', '-timestamp', '-id'], name='message_history_idx'),
+        ]
+
     def __str__(self):
         return f"From {self.sender.username} to {self.receiver.username}"
     
+# End date of a stay booked without one ("until further notice").
+STAY_OPEN_ENDED = date.max
+
+
 class BookingRequest(models.Model):
     renter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_requests')
     owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_requests')
@@ -61,6 +252,41 @@ class BookingRequest(models.Model):
         default='pending'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # When the owner accepted or rejected it; the renter's badge counts answers newer than they've seen.
+    answered_at = models.DateTimeField(null=True, blank=True)
+    # Client-supplied token so a retried or double-submitted request is only created once.
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True)
+    # The stay is the half-open range [start_date, end_date): moving out frees the bed that night.
+    start_date = models.DateField(default=timezone.localdate)
+    end_date = models.DateField(default=STAY_OPEN_ENDED)
+
+    class Meta:
+        indexes = [
+            # Navbar previews: an owner's pending requests / a renter's answered ones, newest first.
+            models.Index(fields=['owner', 'status', '-created_at'], name='booking_owner_status_idx'),
+            models.Index(fields=['renter', 'status', '-created_at'], name='booking_renter_status_idx'),
+            # Availability: a listing's accepted stays sorted by start, for overlap range scans.
+            models.Index(
+                fields=['listing', 'start_date', 'end_date'],
+                condition=models.Q(status='accepted'),
+                name='booking_stay_idx',
+            ),
+        ]
+        constraints = [
+            # At most one pending or accepted request per renter, listing and move-in
+            # date; bookings.request_booking also turns away overlapping stays.
+            models.UniqueConstraint(
+                fields=['renter', 'listing', 'start_date'],
+                condition=models.Q(status__in=['pending', 'accepted']),
+                name='one_active_booking_per_stay',
+            ),
+            models.UniqueConstraint(fields=['renter', 'idempotency_key'], name='unique_booking_idempotency_key'),
+            models.CheckConstraint(condition=models.Q(end_date__gt=models.F('start_date')), name='booking_stay_dates_ordered'),
+        ]
+
+    @property
+    def open_ended(self):
+        return self.end_date >= STAY_OPEN_ENDED
 
     def __str__(self):
         return f"{self.renter.username} -> {self.owner.username} ({self.status})"
@@ -0,0 +1,113 @@
+"""
+Navbar notifications: denormalised counts plus a short cached preview.
+
+``NotificationCounter`` holds each user's badge counts, refreshed by the
+BookingRequest signals (and by ``refresh_counters`` after bulk updates,
+which skip signals). A renter's badge counts answers newer than
+``answered_seen_at``, which ``mark_answers_seen`` moves forward when they
+clear their notifications. The navbar payload (badge count plus the latest few
+requests, fetched with ``select_related``) is cached per user and dropped
+whenever one of their requests changes, so most pages render the navbar
+from a single cache hit.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import BookingRequest, NotificationCounter, Profile
+
+ANSWERED = ('accepted', 'rejected')
+SEEN_AT = 'renter__notification_counter__answered_seen_at'
+
+
+def unseen_answers():
+    """Q for answered requests newer than their renter last cleared notifications."""
+    return Q(status__in=ANSWERED) & (Q(**{f'{SEEN_AT}__isnull': True}) | Q(answered_at__gt=F(SEEN_AT)))
+
+
+def _cache():
+    return caches[getattr(settings, 'NAVBAR_CACHE_ALIAS', 'default')]
+
+
+def cache_key(user_id):
+    return f'navbar:{user_id}'
+
+
+def refresh_counters(user_ids):
+    """Recount the badge numbers of ``user_ids`` from BookingRequest and drop their cached navbars."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    pending = dict(
+        BookingRequest.objects.filter(owner_id__in=user_ids, status='pending')
+        .values('owner_id').annotate(n=Count('id')).values_list('owner_id', 'n')
+    )
+    answered = dict(
+        BookingRequest.objects.filter(unseen_answers(), renter_id__in=user_ids)
+        .values('renter_id').annotate(n=Count('id')).values_list('renter_id', 'n')
+    )
+    NotificationCounter.objects.bulk_create(
+        [
+            NotificationCounter(
+                user_id=user_id,
+                pending_requests=pending.get(user_id, 0),
+                answered_requests=answered.get(user_id, 0),
+            )
+            for user_id in user_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['pending_requests', 'answered_requests', 'updated_at'],
+    )
+    invalidate_navbar(user_ids)
+
+
+def mark_answers_seen(user):
+    """Clear ``user``'s answered-request badge; only answers after now count again."""
+    NotificationCounter.objects.update_or_create(
+        user=user, defaults={'answered_requests': 0, 'answered_seen_at': timezone.now()},
+    )
+    invalidate_navbar([user.pk])
+
+
+def invalidate_navbar(user_ids):
+    _cache().delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+def _counter(user):
+    counter = NotificationCounter.objects.filter(user=user).first()
+    if counter is None:
+        refresh_counters([user.pk])
+        counter = NotificationCounter.objects.get(user=user)
+    return counter
+
+
+def _role(request):
+    profile = getattr(request, 'profile', None)
+    if profile is None:
+        profile = Profile.objects.filter(user=request.user).only('role').first()
+    return profile.role if profile else None
+
+
+def navbar_notifications(request):
+    """``{'count': badge number, 'items': latest requests}`` for the user's navbar, cached."""
+    user = request.user
+    key = cache_key(user.pk)
+    payload = _cache().get(key)
+    if payload is not None:
+        return payload
+
+    limit = getattr(settings, 'NAVBAR_NOTIFICATIONS_PREVIEW', 10)
+    requests = BookingRequest.objects.select_related('owner', 'renter', 'listing').order_by('-created_at')
+    counter = _counter(user)
+    if _role(request) == 'owner':
+        count = counter.pending_requests
+        items = list(requests.filter(owner=user, status='pending')[:limit]) if count else []
+    else:
+        count = counter.answered_requests
+        items = list(requests.filter(unseen_answers(), renter=user)[:limit]) if count else []
+
+    payload = {'count': count, 'items': items}
+    _cache().set(key, payload, getattr(settings, 'NAVBAR_CACHE_TIMEOUT', 300))
+    return payload
@@ -0,0 +1,104 @@
+"""
+Owner dashboard KPIs.
+
+``owner_stats`` computes every headline number for an owner in a single
+query (one correlated subquery per source table, each using conditional
+aggregation) and caches the result per owner. Signals drop the cached
+entry when the owner's listings, booking requests or messages change, and
+``availability.sync_occupancy`` drops it when beds taken tonight are
+recomputed without a save; view counts arrive in batches without signals
+and refresh on the timeout.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BookingRequest, Listing, ListingView, ListingViewDaily, Message, RollupCheckpoint
+from .rollups import CHECKPOINT
+
+
+def _cache():
+    return caches[getattr(settings, 'OWNER_STATS_CACHE_ALIAS', 'default')]
+
+
+def _month_start():
+    return timezone.localdate().replace(day=1)
+
+
+def cache_key(owner_id, month=None):
+    return f'owner_stats:{owner_id}:{(month or _month_start()).isoformat()}'
+
+
+MONEY = DecimalField(max_digits=14, decimal_places=2)
+
+
+def _scalar(queryset, group_by, aggregate, output_field=IntegerField()):
+    """Correlated subquery returning ``aggregate`` over ``queryset`` for the outer owner (0 if empty)."""
+    subquery = queryset.order_by().values(group_by).annotate(value=aggregate).values('value')
+    return Coalesce(Subquery(subquery, output_field=output_field), Value(0), output_field=output_field)
+
+
+def compute_owner_stats(owner_id):
+    month_start = timezone.make_aware(datetime.combine(_month_start(), time.min))
+    high_water = Coalesce(
+        Subquery(RollupCheckpoint.objects.filter(name=CHECKPOINT).values('position')[:1]), Value(0)
+    )
+    listings = Listing.objects.filter(owner=OuterRef('pk'))
+    bookings = BookingRequest.objects.filter(owner=OuterRef('pk'))
+    accepted = Q(status='accepted')
+
+    row = User.objects.filter(pk=owner_id).annotate(
+        total_listings=_scalar(listings, 'owner', Count('id')),
+        occupied_listings=_scalar(listings, 'owner', Count('id', filter=Q(occupied=True))),
+        pending_requests=_scalar(bookings, 'owner', Count('id', filter=Q(status='pending'))),
+        monthly_revenue=_scalar(
+            bookings, 'owner', Sum('listing__rent', filter=accepted & Q(created_at__gte=month_start)), MONEY
+        ),
+        total_revenue=_scalar(bookings, 'owner', Sum('listing__rent', filter=accepted), MONEY),
+        rolled_views=_scalar(
+            ListingViewDaily.objects.filter(listing__owner=OuterRef('pk')), 'listing__owner', Sum('count')
+        ),
+        recent_views=_scalar(
+            ListingView.objects.filter(listing__owner=OuterRef('pk'), id__gt=high_water), 'listing__owner', Count('id')
+        ),
+        total_messages=_scalar(
+            Message.objects.filter(listing__owner=OuterRef('pk')), 'listing__owner', Count('id')
+        ),
+    ).values(
+        'total_listings', 'occupied_listings', 'pending_requests', 'monthly_revenue',
+        'total_revenue', 'rolled_views', 'recent_views', 'total_messages',
+    ).first() or {}
+
+    total = row.get('total_listings', 0)
+    return {
+        'total_listings': total,
+        'occupied_listings': row.get('occupied_listings', 0),
+        'occupancy_rate': round(row['occupied_listings'] / total * 100, 2) if total else 0,
+        'monthly_revenue': row.get('monthly_revenue', 0),
+        'total_revenue': row.get('total_revenue', 0),
+        'total_views': row.get('rolled_views', 0) + row.get('recent_views', 0),
+        'total_messages': row.get('total_messages', 0),
+        'pending_requests': row.get('pending_requests', 0),
+    }
+
+
+def owner_stats(owner):
+    """Cached KPIs for ``owner`` (a User or user id)."""
+    owner_id = getattr(owner, 'pk', owner)
+    key = cache_key(owner_id)
+    stats = _cache().get(key)
+    if stats is None:
+        stats = compute_owner_stats(owner_id)
+        _cache().set(key, stats, getattr(settings, 'OWNER_STATS_CACHE_TIMEOUT', 300))
+    return stats
+
+
+def invalidate_owner_stats(*owner_ids):
+    keys = [cache_key(owner_id) for owner_id in owner_ids if owner_id]
+    if keys:
+        _cache().delete_many(keys)
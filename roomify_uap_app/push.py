@@ -0,0 +1,142 @@
+"""
+Server push for booking updates and new messages.
+
+Events are published to a per-user channel through a pluggable broker
+(``settings.PUSH_BACKEND``) and delivered by the ``event_stream`` SSE view,
+which must run under ASGI (``roomify_uap.asgi``) so an open stream holds no
+worker thread.
+
+* ``InProcessBroker`` fans out to subscribers in the same process: enough
+  for a single ASGI server and for tests.
+* ``RedisBroker`` uses Redis pub/sub so any web node can publish to users
+  connected to any other node (needs the ``redis`` package).
+
+Publishing is synchronous and safe to call from any thread; subscribing is
+an async context manager whose value has an ``async get()``.
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class InProcessBroker:
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)  # channel -> {(loop, queue)}
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self._lock:
+            targets = list(self._subscribers.get(channel, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                pass  # the subscriber's event loop has shut down
+
+    @staticmethod
+    def _offer(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            logger.warning('Dropping push event for a subscriber that is not keeping up')
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[channel].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(entry)
+                if not self._subscribers[channel]:
+                    del self._subscribers[channel]
+
+
+class RedisBroker:
+
+    def __init__(self, url=None):
+        import redis
+
+        self.url = url or getattr(settings, 'PUSH_REDIS_URL', 'redis://localhost:6379/0')
+        self._client = redis.Redis.from_url(self.url)
+
+    def _name(self, channel):
+        return f'roomify:push:{channel}'
+
+    def publish(self, channel, message):
+        self._client.publish(self._name(channel), json.dumps(message))
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self._name(channel))
+        try:
+            yield _RedisSubscription(pubsub)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+            await client.aclose()
+
+
+class _RedisSubscription:
+
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    async def get(self):
+        while True:
+            message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=None)
+            if message is not None:
+                return json.loads(message['data'])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'PUSH_BACKEND', 'roomify_uap_app.push.InProcessBroker')
+                _broker = import_string(backend)()
+    return _broker
+
+
+def push_to_user(user_id, event, data):
+    """Send ``event`` to every open stream of ``user_id`` once the current transaction commits."""
+    message = {'event': event, 'data': data}
+
+    def send():
+        try:
+            get_broker().publish(user_channel(user_id), message)
+        except Exception:
+            logger.exception('Publishing %s to user %s failed', event, user_id)
+
+    transaction.on_commit(send)
+
+
+def format_sse(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
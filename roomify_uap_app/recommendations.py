@@ -0,0 +1,281 @@
+"""
+Content-based "similar rooms", precomputed offline with NumPy.
+
+Each listing becomes one L2-normalised row built from three weighted blocks:
+
+* numeric: rent (log scale), room size and occupancy, each mapped onto a
+  quarter circle so the dot product of two rooms decays with their distance;
+* location: binary bag of location tokens;
+* description: TF-IDF over the most common description terms.
+
+Cosine similarity is then a plain matrix product, evaluated in row batches
+with ``argpartition`` for the top-k. Results land in ``SimilarListing``;
+requests only ever read that table.
+
+Rebuilds are incremental: the fitted vocabulary, the feature matrix and the
+current neighbour lists are kept in ``settings.SIMILARITY_STATE_PATH``.
+Only new or edited listings are re-vectorised; their neighbours are
+recomputed in full, everyone else just merges in scores against the changed
+rows. A full refit happens when too much of the catalogue has changed for the
+old vocabulary to stay representative.
+"""
+import hashlib
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import Listing, SimilarListing
+
+TOP_K = 6
+BATCH_SIZE = 1024
+MAX_DESCRIPTION_TERMS = 256
+MAX_LOCATION_TOKENS = 128
+MIN_DOCUMENT_FREQUENCY = 2
+FULL_REBUILD_RATIO = 0.2
+
+NUMERIC_WEIGHT = 1.0
+LOCATION_WEIGHT = 0.8
+DESCRIPTION_WEIGHT = 1.0
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has have in is it its near of on or room rooms '
+    'the this to with very'.split()
+)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+_FIELDS = ('id', 'rent', 'room_size', 'occupancy', 'location', 'description')
+
+
+def _tokens(text):
+    return [token for token in _TOKEN_RE.findall((text or '').lower()) if token not in STOP_WORDS]
+
+
+def _fingerprint(row):
+    digest = hashlib.blake2b(repr(row[1:]).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def _numeric(rows):
+    values = np.array([[float(row[1]), row[2], row[3]] for row in rows], dtype=np.float64).reshape(-1, 3)
+    values[:, 0] = np.log1p(np.clip(values[:, 0], 0, None))
+    return values
+
+
+def _top_terms(documents, limit):
+    df = Counter()
+    for tokens in documents:
+        df.update(set(tokens))
+    terms = [term for term, count in df.most_common() if count >= MIN_DOCUMENT_FREQUENCY][:limit]
+    return terms, np.array([df[term] for term in terms], dtype=np.float64)
+
+
+def fit(rows):
+    """Fit the vocabularies and numeric ranges on the whole catalogue."""
+    numeric = _numeric(rows)
+    descriptions = [_tokens(row[5]) for row in rows]
+    desc_terms, df = _top_terms(descriptions, MAX_DESCRIPTION_TERMS)
+    loc_terms, _ = _top_terms([_tokens(row[4]) for row in rows], MAX_LOCATION_TOKENS)
+    if len(rows):
+        low, high = np.percentile(numeric, 5, axis=0), np.percentile(numeric, 95, axis=0)
+    else:
+        low, high = np.zeros(3), np.ones(3)
+    return {
+        'desc_vocab': np.array(desc_terms, dtype=str),
+        'idf': np.log((1 + len(rows)) / (1 + df)) + 1,
+        'loc_vocab': np.array(loc_terms, dtype=str),
+        'num_low': low,
+        'num_high': np.where(high > low, high, low + 1),
+    }
+
+
+def _bag(documents, vocab):
+    index = {term: i for i, term in enumerate(vocab.tolist())}
+    matrix = np.zeros((len(documents), len(index)), dtype=np.float32)
+    for row, tokens in enumerate(documents):
+        for token in tokens:
+            column = index.get(token)
+            if column is not None:
+                matrix[row, column] += 1
+    return matrix
+
+
+def _unit_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def vectorize(rows, state):
+    """Return the (len(rows), d) float32 feature matrix with unit-length rows."""
+    scaled = (_numeric(rows) - state['num_low']) / (state['num_high'] - state['num_low'])
+    theta = np.clip(scaled, 0, 1) * (np.pi / 2)
+    numeric = np.concatenate([np.cos(theta), np.sin(theta)], axis=1).astype(np.float32) / np.sqrt(3)
+
+    location = _unit_rows(np.minimum(_bag([_tokens(row[4]) for row in rows], state['loc_vocab']), 1))
+    description = _bag([_tokens(row[5]) for row in rows], state['desc_vocab'])
+    description = _unit_rows(description * state['idf'].astype(np.float32))
+
+    features = np.concatenate([
+        numeric * NUMERIC_WEIGHT,
+        location * LOCATION_WEIGHT,
+        description * DESCRIPTION_WEIGHT,
+    ], axis=1)
+    return _unit_rows(features)
+
+
+def _select_top(candidate_ids, scores, k):
+    """Row-wise top-k of ``scores``; returns (ids, scores) padded with -1 / -inf."""
+    width = scores.shape[1]
+    if width > k:
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(scores, part, axis=1)
+        candidate_ids = np.take_along_axis(candidate_ids, part, axis=1)
+    elif width < k:
+        pad = k - width
+        scores = np.pad(scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+        candidate_ids = np.pad(candidate_ids, ((0, 0), (0, pad)), constant_values=-1)
+    order = np.argsort(-scores, axis=1, kind='stable')
+    scores = np.take_along_axis(scores, order, axis=1)
+    candidate_ids = np.take_along_axis(candidate_ids, order, axis=1)
+    candidate_ids[~np.isfinite(scores)] = -1
+    return candidate_ids, scores
+
+
+def top_k_neighbours(features, ids, rows, k=TOP_K, batch_size=BATCH_SIZE):
+    """Exact top-k cosine neighbours of ``features[rows]`` against all rows, in batches."""
+    out_ids = np.full((len(rows), k), -1, dtype=np.int64)
+    out_scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = features[batch] @ features.T
+        scores[np.arange(len(batch)), batch] = -np.inf  # never your own neighbour
+        candidates = np.broadcast_to(ids, scores.shape)
+        out_ids[start:start + len(batch)], out_scores[start:start + len(batch)] = _select_top(candidates, scores, k)
+    return out_ids, out_scores
+
+
+def _merge_neighbours(features, ids, rows, changed, prev_ids, prev_scores, k, batch_size=BATCH_SIZE):
+    """Fold scores against the ``changed`` rows into existing neighbour lists."""
+    out_ids, out_scores = prev_ids.copy(), prev_scores.copy()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        scores = features[batch] @ features[changed].T
+        candidates = np.concatenate([prev_ids[start:start + len(batch)], np.broadcast_to(ids[changed], scores.shape)], axis=1)
+        scores = np.concatenate([prev_scores[start:start + len(batch)], scores], axis=1)
+        out_ids[start:start + len(batch)], out_scores[start:start + len(batch)] = _select_top(candidates, scores, k)
+    return out_ids, out_scores
+
+
+def load_state(path=None):
+    path = path or settings.SIMILARITY_STATE_PATH
+    try:
+        with np.load(path) as data:
+            return {key: data[key] for key in data.files}
+    except (FileNotFoundError, OSError, ValueError):
+        return None
+
+
+def save_state(state, path=None):
+    path = Path(path or settings.SIMILARITY_STATE_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.tmp')
+    with open(partial, 'wb') as handle:
+        np.savez(handle, **state)
+    os.replace(partial, path)
+
+
+def _write_neighbours(listing_ids, neighbour_ids, neighbour_scores, replace_all=False):
+    # One transaction, so readers see either the old neighbours or the new ones.
+    with transaction.atomic():
+        existing = SimilarListing.objects.all()
+        if not replace_all:
+            existing = existing.filter(listing_id__in=listing_ids.tolist())
+        existing.delete()
+        SimilarListing.objects.bulk_create(
+            [
+                SimilarListing(listing_id=int(listing_id), similar_id=int(similar_id), rank=rank, score=float(score))
+                for listing_id, row_ids, row_scores in zip(listing_ids, neighbour_ids, neighbour_scores)
+                for rank, (similar_id, score) in enumerate(zip(row_ids, row_scores))
+                if similar_id >= 0
+            ],
+            batch_size=1000,
+        )
+
+
+def rebuild_similar_listings(full=False, k=TOP_K, path=None):
+    """
+    Bring ``SimilarListing`` up to date and return the number of listings whose
+    neighbour lists were rewritten.
+    """
+    rows = list(Listing.objects.order_by('id').values_list(*_FIELDS))
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    fingerprints = np.array([_fingerprint(row) for row in rows], dtype=np.uint64)
+
+    state = None if full else load_state(path)
+    if state is not None and state['nbr_ids'].shape[1] != k:
+        state = None
+
+    if state is not None:
+        previous = {int(pk): i for i, pk in enumerate(state['ids'])}
+        prev_pos = np.array([previous.get(int(pk), -1) for pk in ids], dtype=np.int64)
+        known = prev_pos >= 0
+        changed = ~known
+        changed[known] = state['fps'][prev_pos[known]] != fingerprints[known]
+        removed = np.setdiff1d(state['ids'], ids)
+        if changed.sum() + len(removed) > FULL_REBUILD_RATIO * max(len(ids), 1):
+            state = None
+
+    if state is None:
+        fitted = fit(rows)
+        features = vectorize(rows, fitted) if rows else np.zeros((0, 1), dtype=np.float32)
+        nbr_ids, nbr_scores = top_k_neighbours(features, ids, np.arange(len(ids)), k)
+        _write_neighbours(ids, nbr_ids, nbr_scores, replace_all=True)
+        save_state({**fitted, 'ids': ids, 'fps': fingerprints, 'X': features,
+                    'nbr_ids': nbr_ids, 'nbr_scores': nbr_scores}, path)
+        return len(ids)
+
+    if not changed.any() and not len(removed):
+        return 0
+
+    fitted = {key: state[key] for key in ('desc_vocab', 'idf', 'loc_vocab', 'num_low', 'num_high')}
+    features = np.empty((len(ids), state['X'].shape[1]), dtype=np.float32)
+    features[known & ~changed] = state['X'][prev_pos[known & ~changed]]
+    changed_rows = np.flatnonzero(changed)
+    if len(changed_rows):
+        features[changed_rows] = vectorize([rows[i] for i in changed_rows], fitted)
+
+    nbr_ids = np.full((len(ids), k), -1, dtype=np.int64)
+    nbr_scores = np.full((len(ids), k), -np.inf, dtype=np.float32)
+    kept = np.flatnonzero(~changed)
+    nbr_ids[kept] = state['nbr_ids'][prev_pos[kept]]
+    nbr_scores[kept] = state['nbr_scores'][prev_pos[kept]]
+
+    # A kept listing whose neighbour was edited or deleted may have lost a
+    # slot to something we never scored, so it needs a full recompute too.
+    stale_ids = np.concatenate([ids[changed_rows], removed])
+    stale = changed | np.isin(nbr_ids, stale_ids).any(axis=1)
+    recompute = np.flatnonzero(stale)
+    merge = np.flatnonzero(~stale)
+
+    if len(recompute):
+        nbr_ids[recompute], nbr_scores[recompute] = top_k_neighbours(features, ids, recompute, k)
+    if len(merge) and len(changed_rows):
+        nbr_ids[merge], nbr_scores[merge] = _merge_neighbours(
+            features, ids, merge, changed_rows, nbr_ids[merge], nbr_scores[merge], k
+        )
+
+    was_ids = np.full((len(ids), k), -2, dtype=np.int64)
+    was_ids[kept] = state['nbr_ids'][prev_pos[kept]]
+    was_scores = np.full((len(ids), k), -np.inf, dtype=np.float32)
+    was_scores[kept] = state['nbr_scores'][prev_pos[kept]]
+    dirty = np.flatnonzero(
+        (nbr_ids != was_ids).any(axis=1) | ~np.isclose(nbr_scores, was_scores, equal_nan=True).all(axis=1)
+    )
+    _write_neighbours(ids[dirty], nbr_ids[dirty], nbr_scores[dirty])
+    save_state({**fitted, 'ids': ids, 'fps': fingerprints, 'X': features,
+                'nbr_ids': nbr_ids, 'nbr_scores': nbr_scores}, path)
+    return len(dirty)
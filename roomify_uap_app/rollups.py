@@ -0,0 +1,143 @@
+"""
+Daily rollups of listing views.
+
+``rollup_listing_views`` folds new ``ListingView`` rows into
+``ListingViewDaily`` from a high-water mark (the last view id processed,
+kept in ``RollupCheckpoint``). Every (listing, day) a new row touches is
+recounted from the raw table up to the new mark, so re-running it is
+always safe. Readers combine the rollup with the few raw rows above the
+mark, which keeps analytics exact without scanning the whole view log.
+
+View ids are handed out before their batch commits, so a slow batch can
+commit below an id that is already visible. The mark therefore trails the
+newest id by ``LISTING_VIEW_ROLLUP_LAG`` seconds: each run only rolls up to
+the newest id the previous run observed, at least that long ago, by which
+time every lower id has committed. Until then those rows count as raw rows
+above the mark.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import ListingView, ListingViewDaily, RollupCheckpoint
+
+CHECKPOINT = 'listing_views_daily'
+# Newest view id seen by the last run; the mark may move up to it once it is old enough.
+OBSERVED = 'listing_views_daily:observed'
+BATCH_SIZE = 5000
+
+
+def high_water_mark():
+    return RollupCheckpoint.objects.filter(name=CHECKPOINT).values_list('position', flat=True).first() or 0
+
+
+def _day_bounds(first_day, last_day):
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(first_day, time.min), tz)
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min), tz)
+    return start, end
+
+
+def _rollup_batch(low, high):
+    touched = (
+        ListingView.objects.filter(id__gt=low, id__lte=high)
+        .annotate(day=TruncDate('timestamp'))
+        .values_list('listing_id', 'day')
+        .distinct()
+    )
+    touched = set(touched)
+    if not touched:
+        return 0
+
+    listing_ids = {listing_id for listing_id, _day in touched}
+    start, end = _day_bounds(min(day for _id, day in touched), max(day for _id, day in touched))
+    totals = (
+        ListingView.objects.filter(listing_id__in=listing_ids, id__lte=high, timestamp__gte=start, timestamp__lt=end)
+        .annotate(day=TruncDate('timestamp'))
+        .values('listing_id', 'day')
+        .annotate(count=Count('id'), unique_viewers=Count('viewer', distinct=True))
+    )
+    rows = [
+        ListingViewDaily(
+            listing_id=row['listing_id'], day=row['day'], count=row['count'], unique_viewers=row['unique_viewers']
+        )
+        for row in totals
+        if (row['listing_id'], row['day']) in touched
+    ]
+    ListingViewDaily.objects.bulk_create(
+        rows,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['listing', 'day'],
+        update_fields=['count', 'unique_viewers'],
+    )
+    return len(rows)
+
+
+def _lag():
+    return getattr(settings, 'LISTING_VIEW_ROLLUP_LAG', 60)
+
+
+def _settled_position(lag):
+    """The highest view id below which every batch has committed."""
+    latest = ListingView.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    if lag <= 0:
+        return latest
+    observed = RollupCheckpoint.objects.filter(name=OBSERVED).first()
+    if observed is not None and observed.updated_at > timezone.now() - timedelta(seconds=lag):
+        return high_water_mark()
+    RollupCheckpoint.objects.update_or_create(name=OBSERVED, defaults={'position': latest})
+    return observed.position if observed is not None else high_water_mark()
+
+
+def rollup_listing_views(batch_size=BATCH_SIZE, lag=None):
+    """
+    Roll up the settled views above the high-water mark. Returns (views processed, day rows written).
+
+    ``lag`` (seconds) defaults to ``LISTING_VIEW_ROLLUP_LAG``; 0 rolls up to the newest view.
+    """
+    latest = _settled_position(_lag() if lag is None else lag)
+    low = high_water_mark()
+    processed = written = 0
+    while low < latest:
+        high = min(low + batch_size, latest)
+        with transaction.atomic():
+            written += _rollup_batch(low, high)
+            RollupCheckpoint.objects.update_or_create(name=CHECKPOINT, defaults={'position': high})
+        processed += ListingView.objects.filter(id__gt=low, id__lte=high).count()
+        low = high
+    return processed, written
+
+
+def _pending(listings):
+    return ListingView.objects.filter(listing__in=listings, id__gt=high_water_mark())
+
+
+def total_view_count(listings):
+    rolled = ListingViewDaily.objects.filter(listing__in=listings).aggregate(total=Sum('count'))['total'] or 0
+    return rolled + _pending(listings).count()
+
+
+def daily_view_counts(listings, since):
+    """``{date: views}`` for ``listings`` from ``since`` (a date) until today, oldest first."""
+    counts = Counter(dict(
+        ListingViewDaily.objects.filter(listing__in=listings, day__gte=since)
+        .values('day')
+        .annotate(total=Sum('count'))
+        .values_list('day', 'total')
+    ))
+    start, _end = _day_bounds(since, since)
+    delta = (
+        _pending(listings).filter(timestamp__gte=start)
+        .annotate(day=TruncDate('timestamp'))
+        .values('day')
+        .annotate(total=Count('id'))
+        .values_list('day', 'total')
+    )
+    counts.update(dict(delta))
+    return dict(sorted(counts.items()))
@@ -0,0 +1,149 @@
+"""
+Full-text search over listings.
+
+SQLite keeps an FTS5 index in ``roomify_uap_app_listing_fts`` (external
+content table, synced by triggers created in migration 0003). PostgreSQL uses
+a GIN expression index over the weighted tsvector below. Both rank by
+relevance, weighting the title above the location above the description.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Listing
+
+SEARCH_RESULTS_LIMIT = 60
+
+FTS_TABLE = 'roomify_uap_app_listing_fts'
+
+# Must match the expression indexed by migration 0003 exactly, otherwise
+# PostgreSQL will not use the GIN index.
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(room_title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(location, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'C')"
+)
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+SQLITE_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        room_title, location, description,
+        content='roomify_uap_app_listing', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_fts_insert AFTER INSERT ON roomify_uap_app_listing BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, room_title, location, description)
+        VALUES (new.id, new.room_title, new.location, new.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_fts_delete AFTER DELETE ON roomify_uap_app_listing BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, room_title, location, description)
+        VALUES ('delete', old.id, old.room_title, old.location, old.description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_fts_update
+    AFTER UPDATE OF room_title, location, description ON roomify_uap_app_listing BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, room_title, location, description)
+        VALUES ('delete', old.id, old.room_title, old.location, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, room_title, location, description)
+        VALUES (new.id, new.room_title, new.location, new.description);
+    END""",
+]
+
+PG_INDEX_DDL = [
+    f"CREATE INDEX IF NOT EXISTS listing_search_idx ON roomify_uap_app_listing USING GIN (({PG_DOCUMENT}))",
+]
+
+
+def install_search_index(conn, rebuild=False):
+    """
+    Create the full-text index and its sync triggers if they are missing.
+
+    Safe to run repeatedly. SQLite drops triggers whenever a migration remakes
+    the listing table, so this also runs after every ``migrate``.
+    """
+    if conn.vendor == 'sqlite':
+        statements = list(SQLITE_INDEX_DDL)
+        if rebuild:
+            statements.append(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    elif conn.vendor == 'postgresql':
+        statements = PG_INDEX_DDL
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def drop_search_index(conn):
+    if conn.vendor == 'sqlite':
+        statements = [
+            'DROP TRIGGER IF EXISTS listing_fts_insert',
+            'DROP TRIGGER IF EXISTS listing_fts_delete',
+            'DROP TRIGGER IF EXISTS listing_fts_update',
+            f'DROP TABLE IF EXISTS {FTS_TABLE}',
+        ]
+    elif conn.vendor == 'postgresql':
+        statements = ['DROP INDEX IF EXISTS listing_search_idx']
+    else:
+        return
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def fts5_query(text):
+    """Turn free text into a safe FTS5 query: every term required, last one as a prefix."""
+    terms = _TERM_RE.findall(text)
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _sqlite_ids(text, limit):
+    match = fts5_query(text)
+    if not match:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0) LIMIT %s',
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_ids(text, limit):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM roomify_uap_app_listing "
+            f"WHERE ({PG_DOCUMENT}) @@ websearch_to_tsquery('english', %s) "
+            f"ORDER BY ts_rank_cd({PG_DOCUMENT}, websearch_to_tsquery('english', %s)) DESC, id DESC "
+            f"LIMIT %s",
+            [text, text, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_listings(text, limit=SEARCH_RESULTS_LIMIT):
+    """Return up to ``limit`` listings matching ``text``, most relevant first."""
+    text = (text or '').strip()
+    if not text:
+        return []
+
+    if connection.vendor == 'sqlite':
+        ids = _sqlite_ids(text, limit)
+    elif connection.vendor == 'postgresql':
+        ids = _postgres_ids(text, limit)
+    else:
+        # No inverted index available on this backend; fall back to a scan.
+        return list(
+            Listing.objects.filter(
+                Q(room_title__icontains=text) | Q(location__icontains=text) | Q(description__icontains=text)
+            ).order_by('-created_at', '-id')[:limit]
+        )
+
+    listings = Listing.objects.in_bulk(ids)
+    return [listings[pk] for pk in ids if pk in listings]
@@ -0,0 +1,132 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, post_init
+from django.dispatch import receiver
+
+from .bookings import booking_event
+from .catalogue import bump_catalogue_version
+from .geo import locate_listing
+from .images import needs_derivatives, schedule_derivatives
+from .models import BookingRequest, Listing, ListingPhoto, Message, NotificationCounter
+from .owner_stats import invalidate_owner_stats
+from .notifications import invalidate_navbar, refresh_counters
+from .push import push_to_user
+from .conversations import conversation_for, record_message
+
+
+@receiver(pre_save, sender=Listing)
+def geocode_listing(sender, instance, **kwargs):
+    """Resolve the listing's free-text location to coordinates from the local gazetteer."""
+    locate_listing(instance)
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def invalidate_catalogue(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_save, sender=ListingPhoto)
+def build_image_derivatives(sender, instance, **kwargs):
+    if needs_derivatives(instance):
+        schedule_derivatives(instance)
+
+
+@receiver(post_init, sender=Listing)
+def remember_loaded_image(sender, instance, **kwargs):
+    # Read the raw attribute so deferred loads don't trigger a query.
+    loaded = instance.__dict__.get('image')
+    instance._loaded_image = getattr(loaded, 'name', loaded) or ''
+
+
+@receiver(post_save, sender=Listing)
+def release_replaced_image(sender, instance, **kwargs):
+    previous, current = instance._loaded_image, instance.image.name or ''
+    if previous and previous != current:
+        storage = instance.image.storage
+        transaction.on_commit(lambda: storage.delete(previous))
+    instance._loaded_image = current
+
+
+@receiver(post_delete, sender=Listing)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image:
+        name, storage = instance.image.name, instance.image.storage
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=ListingPhoto)
+def release_deleted_photo(sender, instance, **kwargs):
+    name, storage = instance.image.name, instance.image.storage
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+@receiver(post_save, sender=BookingRequest)
+@receiver(post_delete, sender=BookingRequest)
+def invalidate_owner_kpis(sender, instance, **kwargs):
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: invalidate_owner_stats(owner_id))
+
+
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+def invalidate_owner_message_kpis(sender, instance, **kwargs):
+    if instance.listing_id:
+        owner_id = Listing.objects.filter(pk=instance.listing_id).values_list('owner_id', flat=True).first()
+        transaction.on_commit(lambda: invalidate_owner_stats(owner_id))
+
+
+@receiver(post_save, sender=BookingRequest)
+@receiver(post_delete, sender=BookingRequest)
+def update_notification_counters(sender, instance, **kwargs):
+    users = [instance.owner_id, instance.renter_id]
+    refresh_counters(users)
+    # Drop again after commit so a navbar cached mid-transaction doesn't linger.
+    transaction.on_commit(lambda: invalidate_navbar(users))
+
+
+@receiver(post_init, sender=BookingRequest)
+def remember_loaded_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=BookingRequest)
+def push_booking_update(sender, instance, created, **kwargs):
+    # Runs after update_notification_counters, so the badge numbers are current.
+    if created:
+        recipient, field = instance.owner_id, 'pending_requests'
+    elif instance.status != instance._loaded_status:
+        recipient, field = instance.renter_id, 'answered_requests'
+    else:
+        return
+    instance._loaded_status = instance.status
+    count = NotificationCounter.objects.filter(user_id=recipient).values_list(field, flat=True).first() or 0
+    push_to_user(recipient, 'booking', booking_event(instance, count))
+
+
+@receiver(pre_save, sender=Message)
+def file_message_in_conversation(sender, instance, **kwargs):
+    if instance.conversation_id is None:
+        instance.conversation = conversation_for(instance.sender, instance.receiver, instance.listing)
+
+
+@receiver(post_save, sender=Message)
+def update_conversation(sender, instance, created, **kwargs):
+    if created:
+        record_message(instance)
+
+
+@receiver(post_save, sender=Message)
+def push_new_message(sender, instance, created, **kwargs):
+    if not created:
+        return
+    push_to_user(instance.receiver_id, 'message', {
+        'id': instance.pk,
+        'sender': instance.sender.username,
+        'listing': instance.listing.room_title if instance.listing_id else None,
+        'conversation': instance.conversation_id,
+        'preview': instance.content[:140],
+        'timestamp': instance.timestamp.isoformat(),
+    })
@@ -0,0 +1,113 @@
+// Resumable chunked uploads for listing photos.
+//
+// Any <input type="file" data-chunked-upload="<start url>"> uploads its files
+// chunk by chunk as soon as they are picked, then adds the finished upload ids
+// to the form as hidden "upload_ids" fields. If the connection drops, picking
+// the same file again resumes from the last chunk the server has.
+;(() => {
+  const MAX_RETRIES = 4
+
+  const csrfToken = () => document.querySelector('[name=csrfmiddlewaretoken]').value
+
+  const toHex = (buffer) => Array.from(new Uint8Array(buffer), (byte) => byte.toString(16).padStart(2, '0')).join('')
+
+  const sha256 = async (blob) => toHex(await crypto.subtle.digest('SHA-256', await blob.arrayBuffer()))
+
+  const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms))
+
+  const send = (url, options = {}) =>
+    fetch(url, {
+      credentials: 'same-origin',
+      ...options,
+      headers: { 'X-CSRFToken': csrfToken(), ...(options.headers || {}) },
+    })
+
+  async function resumeOrStart(file, startUrl) {
+    const key = `roomify-upload:${file.name}:${file.size}:${file.lastModified}`
+    const savedId = localStorage.getItem(key)
+    if (savedId) {
+      const response = await send(`${startUrl}${savedId}/`)
+      if (response.ok) {
+        const state = await response.json()
+        if (state.status !== 'attached') return state
+      }
+    }
+    const body = new FormData()
+    body.append('filename', file.name)
+    body.append('size', file.size)
+    const response = await send(startUrl, { method: 'POST', body })
+    const state = await response.json()
+    if (!response.ok) throw new Error(state.error)
+    localStorage.setItem(key, state.upload_id)
+    return state
+  }
+
+  async function uploadFile(file, startUrl, onProgress) {
+    let state = await resumeOrStart(file, startUrl)
+    let retries = 0
+
+    while (state.status === 'uploading') {
+      const index = state.next_chunk
+      const chunk = file.slice(index * state.chunk_size, (index + 1) * state.chunk_size)
+      try {
+        const response = await send(`${startUrl}${state.upload_id}/chunks/${index}/`, {
+          method: 'PUT',
+          body: chunk,
+          headers: { 'X-Chunk-SHA256': await sha256(chunk) },
+        })
+        const result = await response.json()
+        if (response.ok || response.status === 409) {
+          // 409 means the server is ahead of or behind us; trust its next_chunk.
+          if (!response.ok && result.next_chunk === undefined) throw new Error(result.error)
+          state = { ...state, ...result }
+          retries = 0
+        } else if (response.status !== 422) {
+          throw new Error(result.error)
+        } else if (++retries > MAX_RETRIES) {
+          throw new Error(result.error)
+        }
+      } catch (error) {
+        if (error instanceof TypeError && ++retries <= MAX_RETRIES) {
+          await sleep(1000 * 2 ** retries) // network error: back off and resume
+          continue
+        }
+        throw error
+      }
+      onProgress(state.next_chunk / state.total_chunks)
+    }
+    return state.upload_id
+  }
+
+  document.querySelectorAll('input[type=file][data-chunked-upload]').forEach((input) => {
+    const form = input.form
+    const submit = form.querySelector('[type=submit]')
+    const status = document.createElement('p')
+    status.className = 'upload-status'
+    input.after(status)
+
+    input.addEventListener('change', async () => {
+      const files = Array.from(input.files)
+      if (!files.length || !window.crypto?.subtle) return // fall back to a plain multipart POST
+
+      submit.disabled = true
+      try {
+        for (const [n, file] of files.entries()) {
+          const uploadId = await uploadFile(file, input.dataset.chunkedUpload, (fraction) => {
+            status.textContent = `Uploading ${file.name} (${n + 1}/${files.length}): ${Math.round(fraction * 100)}%`
+          })
+          const hidden = document.createElement('input')
+          hidden.type = 'hidden'
+          hidden.name = 'upload_ids'
+          hidden.value = uploadId
+          form.appendChild(hidden)
+        }
+        input.value = '' // the photos are already on the server
+        status.textContent = `${files.length} photo${files.length > 1 ? 's' : ''} uploaded.`
+      } catch (error) {
+        status.textContent = `Upload paused: ${error.message}. Pick the same photo again to resume.`
+      } finally {
+        submit.disabled = false
+      }
+    })
+  })
+})()
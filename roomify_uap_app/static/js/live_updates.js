@@ -0,0 +1,60 @@
+// Live booking and message updates over server-sent events.
+//
+// Keeps the navbar badge current and shows a short toast, so users see
+// responses and new messages without reloading the page.
+;(() => {
+  const script = document.currentScript
+  if (!window.EventSource || !script) return
+
+  const icon = document.querySelector('.notification-icon')
+
+  function setBadge(count) {
+    if (!icon) return
+    let badge = icon.querySelector('.notification-badge')
+    if (!count) {
+      badge?.remove()
+      return
+    }
+    if (!badge) {
+      badge = document.createElement('span')
+      badge.className = 'notification-badge'
+      icon.querySelector('.bx-bell').after(badge)
+    }
+    badge.textContent = count
+  }
+
+  function toast(text) {
+    const note = document.createElement('div')
+    note.textContent = text
+    Object.assign(note.style, {
+      position: 'fixed',
+      right: '20px',
+      bottom: '20px',
+      zIndex: 1000,
+      padding: '12px 18px',
+      borderRadius: '8px',
+      background: '#4c0685',
+      color: '#fff',
+      boxShadow: '0 4px 12px rgba(0, 0, 0, 0.2)',
+    })
+    document.body.appendChild(note)
+    setTimeout(() => note.remove(), 5000)
+  }
+
+  const source = new EventSource(script.dataset.eventsUrl)
+
+  source.addEventListener('booking', (event) => {
+    const data = JSON.parse(event.data)
+    setBadge(data.notification_count)
+    toast(
+      data.status === 'pending'
+        ? `${data.renter} wants to book "${data.listing}".`
+        : `${data.owner} ${data.status} your request for "${data.listing}".`
+    )
+  })
+
+  source.addEventListener('message', (event) => {
+    const data = JSON.parse(event.data)
+    toast(`New message from ${data.sender}: ${data.preview}`)
+  })
+})()
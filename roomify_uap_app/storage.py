@@ -0,0 +1,113 @@
+"""
+Content-addressed, reference-counted storage for listing images.
+
+Uploads are stored under the SHA-256 of their bytes, so the same photo
+uploaded twice (or re-uploaded on every edit) is kept once. ``StoredBlob``
+rows count how many listings point at each file. ``save`` adds a reference,
+``delete`` drops one, and the file is only removed when nobody uses it.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+CAS_PREFIX = 'listing_images/sha256'
+
+
+def blob_name(digest, extension):
+    return f'{CAS_PREFIX}/{digest[:2]}/{digest}{extension}'
+
+
+def hash_file(handle, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: handle.read(chunk_size), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _blobs(self):
+        return apps.get_model('roomify_uap_app', 'StoredBlob').objects
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, so never add random suffixes.
+        return name
+
+    def _save(self, name, content):
+        extension = posixpath.splitext(name)[1].lower()
+        staging = self.path(CAS_PREFIX)
+        os.makedirs(staging, exist_ok=True)
+
+        # Hash while streaming to a temp file so the upload is read once.
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=staging, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as handle:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    handle.write(chunk)
+            name = blob_name(digest.hexdigest(), extension)
+            # Take the reference and place the file under the same row lock
+            # that delete() uses, so a concurrent release can't remove it.
+            with transaction.atomic():
+                self.add_reference(name, digest.hexdigest(), size)
+                full_path = self.path(name)
+                if os.path.exists(full_path):
+                    os.remove(temp_path)
+                else:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(temp_path, self.file_permissions_mode)
+                    os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return name
+
+    def add_reference(self, name, digest=None, size=0):
+        blobs = self._blobs()
+        with transaction.atomic():
+            blob, created = blobs.select_for_update().get_or_create(
+                name=name, defaults={'sha256': digest or '', 'size': size, 'refs': 1}
+            )
+            if not created:
+                blobs.filter(pk=blob.pk).update(refs=F('refs') + 1)
+
+    def delete(self, name):
+        """Drop one reference to ``name``; remove the file once no listing uses it."""
+        if not name:
+            return
+        blobs = self._blobs()
+        with transaction.atomic():
+            blob = blobs.select_for_update().filter(name=name).first()
+            if blob is None:
+                # Not a tracked blob (e.g. a pre-dedup upload): leave it to dedupe_media.
+                return
+            if blob.refs > 1:
+                blobs.filter(pk=blob.pk).update(refs=F('refs') - 1)
+                return
+            blob.delete()
+            super().delete(name)
+
+
+_listing_image_storage = None
+
+
+def listing_image_storage():
+    global _listing_image_storage
+    if _listing_image_storage is None:
+        _listing_image_storage = ContentAddressedStorage()
+    return _listing_image_storage
@@ -0,0 +1,28 @@
+from django import template
+
+from roomify_uap_app.images import srcset
+
+register = template.Library()
+
+
+def _picture(instance, alt, sizes, loading):
+    return {
+        'image': instance.image,
+        'alt': alt,
+        'sizes': sizes,
+        'loading': loading,
+        'avif_srcset': srcset(instance, 'avif') if instance.image else '',
+        'webp_srcset': srcset(instance, 'webp') if instance.image else '',
+    }
+
+
+@register.inclusion_tag('listing_picture.html')
+def listing_picture(listing, sizes='100vw', loading='lazy'):
+    """Render a listing photo as <picture> with AVIF/WebP srcsets, falling back to the original."""
+    return _picture(listing, listing.room_title, sizes, loading)
+
+
+@register.inclusion_tag('listing_picture.html')
+def photo_picture(photo, alt='', sizes='100vw', loading='lazy'):
+    """Like ``listing_picture``, for one of a listing's extra ``ListingPhoto``s."""
+    return _picture(photo, alt, sizes, loading)
@@ -1,3 +1,1185 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from importlib.util import find_spec
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+
+from . import catalogue
+from .availability import available_between, peak_occupancy
+from .bookings import BookingError, accept_booking, reject_booking, request_booking, respond_in_bulk
+from .context_processors import navbar
+from .conversations import history, inbox, mark_read
+from .filters import PRICE_BUCKETS, apply_listing_filters, listing_facets, parse_listing_filters
+from .funnels import (
+    STAGES, WEEK, conversion_rates, funnel_table, load_events, owner_weekly_funnel, week_index, week_start,
+)
+from .exports import export_rows, stream_csv
+from .geo import (
+    BoxTooLarge, covering_cells, geohash_encode, haversine_km, listings_in_box, listings_within_radius,
+)
+from .images import PHOTO_DERIVATIVES_DIR, needs_derivatives
+from .listing_import import import_listings
+from .message_search import search_messages
+from .models import (
+    BookingRequest, Conversation, Listing, ListingPhoto, ListingView, ListingViewDaily, Message, NotificationCounter,
+    Owner, Profile, RollupCheckpoint, SimilarListing, StoredBlob,
+)
+from .owner_stats import compute_owner_stats, owner_stats
+from .pagination import InvalidCursor, encode_cursor, keyset_page
+from .push import InProcessBroker, RedisBroker, _RedisSubscription, format_sse, push_to_user, user_channel
+from .recommendations import rebuild_similar_listings
+from .rollups import high_water_mark, rollup_listing_views, total_view_count
+from .search import search_listings
+from .storage import listing_image_storage
+from .templatetags.listing_images import photo_picture
+from .tracking import ViewRecorder
+from .uploads import attach_uploads
+from .user_admin import set_verified, user_page, user_search_q
+from .views import event_stream
+
+
+def _listing(owner, occupancy):
+    return Listing.objects.create(
+        owner=owner, room_title='Room', location='Dhaka', rent=5000,
+        room_size=120, occupancy=occupancy, description='',
+    )
+
+
+def _run_concurrently(calls):
+    """Run every call at once from a thread pool; return results (or raised exceptions) in order."""
+    barrier = threading.Barrier(len(calls))
+
+    def run(call):
+        try:
+            barrier.wait()
+            return call()
+        except Exception as e:
+            return e
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        return list(pool.map(run, calls))
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        self.listings = [_listing(owner, occupancy=1) for _ in range(7)]
+        # Ties on the leading key must neither skip nor repeat rows.
+        Listing.objects.filter(pk__in=[listing.pk for listing in self.listings[2:5]]).update(
+            created_at=self.listings[2].created_at
+        )
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(Listing.objects.all(), cursor, per_page=2)
+            seen += rows
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(Listing.objects.order_by('-created_at', '-id')))
+
+    def test_bad_cursors_raise_invalid_cursor(self):
+        for cursor in ['not base64!', encode_cursor([1]), encode_cursor(['x', 1]), encode_cursor([None, 1]),
+                       encode_cursor([self.listings[0].created_at, [1]]), encode_cursor({'a': 1})]:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursor):
+                keyset_page(Listing.objects.all(), cursor)
+
+
+class BookingEngineTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.renter = User.objects.create_user('renter')
+        self.listing = _listing(self.owner, occupancy=1)
+
+    def test_retry_with_same_key_returns_existing_request(self):
+        first, created = request_booking(self.renter, self.listing, 'abc')
+        again, created_again = request_booking(self.renter, self.listing, 'abc')
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(first.pk, again.pk)
+
+    def test_one_active_request_per_stay(self):
+        first, _ = request_booking(self.renter, self.listing)
+        second, created = request_booking(self.renter, self.listing)
+        self.assertFalse(created)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(BookingRequest.objects.count(), 1)
+
+    def test_repeat_stays_may_not_overlap(self):
+        today = timezone.localdate()
+        first, _ = request_booking(self.renter, self.listing, start=today, end=today + timedelta(days=30))
+        accept_booking(first)
+
+        later, created = request_booking(
+            self.renter, self.listing, start=today + timedelta(days=30), end=today + timedelta(days=60)
+        )
+        self.assertTrue(created)
+        with self.assertRaises(BookingError):
+            request_booking(self.renter, self.listing, start=today + timedelta(days=50), end=today + timedelta(days=70))
+        self.assertEqual(BookingRequest.objects.count(), 2)
+
+    def test_listing_without_beds_is_not_bookable(self):
+        Listing.objects.filter(pk=self.listing.pk).update(occupancy=0)
+        self.listing.refresh_from_db()
+        with self.assertRaisesMessage(BookingError, "isn't taking bookings"):
+            request_booking(self.renter, self.listing)
+
+    def test_listing_forms_require_a_bed(self):
+        Profile.objects.create(user=self.owner, role='owner')
+        self.client.force_login(self.owner)
+        form = {'room_title': 'Room', 'location': 'Mirpur', 'rent': '5000', 'occupancy': '0'}
+        self.client.post(reverse('post_new_listing'), form)
+        self.assertEqual(Listing.objects.count(), 1)
+
+        self.client.post(reverse('edit_listing', args=[self.listing.pk]), form)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.occupancy, 1)
+
+    def test_accept_takes_a_bed_once(self):
+        booking, _ = request_booking(self.renter, self.listing)
+        self.assertTrue(accept_booking(booking))
+        self.assertFalse(accept_booking(booking))
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.occupants, 1)
+        self.assertTrue(self.listing.occupied)
+
+    def test_accept_on_full_listing_changes_nothing(self):
+        other = User.objects.create_user('other')
+        first, _ = request_booking(self.renter, self.listing)
+        second, _ = request_booking(other, self.listing)
+        accept_booking(first)
+        with self.assertRaises(BookingError):
+            accept_booking(second)
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+
+    def test_bulk_accept_fills_listing_and_rejects_the_rest(self):
+        others = [User.objects.create_user(f'other{i}') for i in range(3)]
+        first, _ = request_booking(self.renter, self.listing)
+        competing = [request_booking(user, self.listing)[0] for user in others]
+        stranger = User.objects.create_user('stranger')
+        foreign, _ = request_booking(self.renter, _listing(stranger, occupancy=1))
+
+        result = respond_in_bulk(self.owner, [first.pk, competing[0].pk, foreign.pk], 'accept', reject_competing=True)
+
+        self.assertEqual(result, {'accepted': 1, 'rejected': 3, 'skipped': 0})
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.occupants, 1)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, 'pending')
+
+
+class ClearNotificationsTests(TestCase):
+
+    def test_clearing_resets_the_badge_without_touching_bookings(self):
+        owner = User.objects.create_user('owner')
+        renter = User.objects.create_user('renter')
+        listing = _listing(owner, occupancy=1)
+        first, _ = request_booking(renter, listing)
+        reject_booking(first)
+        second, _ = request_booking(renter, listing)
+
+        self.client.force_login(renter)
+        self.client.get(reverse('clear_notifications'))
+
+        statuses = dict(BookingRequest.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses, {first.pk: 'rejected', second.pk: 'pending'})
+        self.assertEqual(NotificationCounter.objects.get(user=renter).answered_requests, 0)
+
+        accept_booking(second)
+        self.assertEqual(NotificationCounter.objects.get(user=renter).answered_requests, 1)
+
+
+class NotificationCounterTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.owner = User.objects.create_user('owner')
+        self.renter = User.objects.create_user('renter')
+        Profile.objects.create(user=self.owner, role='owner')
+        Profile.objects.create(user=self.renter, role='renter')
+        self.listing = _listing(self.owner, occupancy=1)
+
+    def badges(self):
+        counters = NotificationCounter.objects.in_bulk([self.owner.pk, self.renter.pk])
+        return counters[self.owner.pk].pending_requests, counters[self.renter.pk].answered_requests
+
+    def test_counters_follow_requests_and_answers(self):
+        first, _ = request_booking(self.renter, self.listing)
+        self.assertEqual(self.badges(), (1, 0))
+        reject_booking(first)
+        self.assertEqual(self.badges(), (0, 1))
+        second, _ = request_booking(self.renter, self.listing)
+        self.assertEqual(self.badges(), (1, 1))
+        accept_booking(second)
+        self.assertEqual(self.badges(), (0, 2))
+
+    def test_navbar_is_one_cache_hit_once_warm(self):
+        booking, _ = request_booking(self.renter, self.listing)
+        reject_booking(booking)
+        request = RequestFactory().get('/')
+        request.user = self.renter
+
+        # Counter, role and the preview rows.
+        with self.assertNumQueries(3):
+            context = navbar(request)
+            self.assertEqual(context['notification_count'](), 1)
+            self.assertEqual(context['notifications'](), [booking])
+        with self.assertNumQueries(0):
+            context = navbar(request)
+            self.assertEqual(context['notification_count'](), 1)
+            self.assertEqual(len(context['notifications']()), 1)
+
+
+class ConversationTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.renter = User.objects.create_user('renter')
+        Profile.objects.create(user=self.owner, role='owner')
+        Profile.objects.create(user=self.renter, role='renter')
+        self.listing = _listing(self.owner, occupancy=1)
+
+    def _send(self, sender, receiver, content, listing=None):
+        return Message.objects.create(
+            sender=sender, receiver=receiver, listing=listing or self.listing, content=content
+        )
+
+    def test_messages_are_threaded_per_listing_and_renter(self):
+        first = self._send(self.renter, self.owner, 'Is it free?')
+        reply = self._send(self.owner, self.renter, 'Yes')
+        other = self._send(User.objects.create_user('other'), self.owner, 'Hello')
+        elsewhere = self._send(self.renter, self.owner, 'And this one?', _listing(self.owner, occupancy=1))
+
+        self.assertEqual(first.conversation_id, reply.conversation_id)
+        self.assertEqual(len({first.conversation_id, other.conversation_id, elsewhere.conversation_id}), 3)
+        conversation = Conversation.objects.get(pk=first.conversation_id)
+        self.assertEqual((conversation.owner, conversation.renter), (self.owner, self.renter))
+        self.assertEqual(conversation.last_message, reply)
+        self.assertEqual((conversation.owner_unread, conversation.renter_unread), (1, 1))
+
+        conversations, _cursor = inbox(self.owner)
+        self.assertEqual(conversations[0].pk, elsewhere.conversation_id)
+        self.assertEqual(len(conversations), 3)
+
+    def test_history_pages_back_in_time(self):
+        sent = [self._send(self.renter, self.owner, f'message {i}') for i in range(5)]
+        conversation = Conversation.objects.get()
+
+        page, cursor = history(conversation, per_page=2)
+        self.assertEqual(page, sent[3:])
+        page, cursor = history(conversation, cursor=cursor, per_page=2)
+        self.assertEqual(page, sent[1:3])
+        page, cursor = history(conversation, cursor=cursor, per_page=2)
+        self.assertEqual((page, cursor), (sent[:1], None))
+
+    def test_only_shown_messages_are_marked_read(self):
+        sent = [self._send(self.renter, self.owner, f'message {i}') for i in range(3)]
+        conversation = Conversation.objects.get()
+        page, _cursor = history(conversation, per_page=2)
+
+        self.assertEqual(mark_read(conversation, self.renter, page), 0)
+        self.assertEqual(mark_read(conversation, self.owner, page), 2)
+        conversation.refresh_from_db()
+        self.assertEqual(conversation.owner_unread, 1)
+        self.assertFalse(Message.objects.get(pk=sent[0].pk).is_read)
+
+
+class MessageSearchTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.renter = User.objects.create_user('renter')
+        Profile.objects.create(user=self.owner, role='owner')
+        self.listing = _listing(self.owner, occupancy=1)
+
+    def _send(self, content, sender=None, receiver=None):
+        return Message.objects.create(
+            sender=sender or self.renter, receiver=receiver or self.owner, listing=self.listing, content=content
+        )
+
+    def test_only_the_users_own_messages_are_found(self):
+        mine = self._send('Is the <wifi> fast?')
+        stranger, other_owner = User.objects.create_user('stranger'), User.objects.create_user('other')
+        self._send('The wifi is broken', sender=stranger, receiver=other_owner)
+
+        for user in (self.owner, self.renter):
+            results, _cursor = search_messages(user, 'wifi')
+            self.assertEqual(results, [mine])
+        self.assertEqual(results[0].snippet, 'Is the &lt;<mark>wifi</mark>&gt; fast?')
+        self.assertEqual(search_messages(stranger, 'fast'), ([], None))
+
+    def test_index_follows_edits_and_deletes(self):
+        message = self._send('Is parking included?')
+
+        message.content = 'Is laundry included?'
+        message.save(update_fields=['content'])
+        self.assertEqual(search_messages(self.owner, 'parking')[0], [])
+        self.assertEqual(search_messages(self.owner, 'laundry')[0], [message])
+
+        message.delete()
+        self.assertEqual(search_messages(self.owner, 'laundry')[0], [])
+
+    def test_results_page_newest_first(self):
+        sent = [self._send(f'Question {i} about the deposit') for i in range(3)]
+
+        page, cursor = search_messages(self.owner, 'deposit', per_page=2)
+        self.assertEqual(page, sent[:0:-1])
+        page, cursor = search_messages(self.owner, 'deposit', cursor=cursor, per_page=2)
+        self.assertEqual((page, cursor), (sent[:1], None))
+        with self.assertRaises(InvalidCursor):
+            search_messages(self.owner, 'deposit', cursor=encode_cursor(['abc']))
+
+
+class PushTests(TestCase):
+
+    def setUp(self):
+        self.broker = InProcessBroker()
+        self.enterContext(mock.patch('roomify_uap_app.push._broker', self.broker))
+
+    def test_in_process_broker_fans_out_to_the_channel_only(self):
+        async def scenario():
+            async with self.broker.subscribe('user:1') as first, self.broker.subscribe('user:1') as second, \
+                    self.broker.subscribe('user:2') as other:
+                # Publishers run on request threads, not the subscribers' loop.
+                await asyncio.to_thread(self.broker.publish, 'user:1', {'event': 'booking', 'data': 1})
+                received = [await asyncio.wait_for(queue.get(), 1) for queue in (first, second)]
+                return received, other.qsize()
+
+        received, other_pending = asyncio.run(scenario())
+
+        self.assertEqual(received, [{'event': 'booking', 'data': 1}] * 2)
+        self.assertEqual(other_pending, 0)
+        self.assertEqual(dict(self.broker._subscribers), {})
+
+    def test_push_waits_for_commit(self):
+        with mock.patch.object(self.broker, 'publish') as publish:
+            with self.captureOnCommitCallbacks() as callbacks:
+                push_to_user(7, 'message', {'id': 1})
+            publish.assert_not_called()
+            for callback in callbacks:
+                callback()
+        publish.assert_called_once_with('user:7', {'event': 'message', 'data': {'id': 1}})
+
+    def test_format_sse_frames_one_event(self):
+        self.assertEqual(
+            format_sse({'event': 'booking', 'data': {'status': 'accepted', 'note': 'a\nb'}}),
+            'event: booking\ndata: {"status": "accepted", "note": "a\\nb"}\n\n',
+        )
+
+    @override_settings(PUSH_HEARTBEAT_SECONDS=0.05)
+    def test_event_stream_relays_published_events(self):
+        user = User.objects.create_user('renter')
+        request = RequestFactory().get(reverse('event_stream'))
+        request.user = user
+
+        async def auser():
+            return user
+        request.auser = auser
+
+        async def read():
+            response = await event_stream(request)
+            chunks = aiter(response.streaming_content)
+            frames = [await anext(chunks)]  # subscribed once the first frame is out
+            self.broker.publish(user_channel(user.pk), {'event': 'booking', 'data': {'id': 3}})
+            frames += [await anext(chunks), await anext(chunks)]
+            # A disconnecting client closes the view's generator, which must unsubscribe.
+            await chunks.aclose()
+            await response._iterator.aclose()
+            return response, frames
+
+        response, frames = asyncio.run(read())
+
+        self.assertEqual(dict(self.broker._subscribers), {})
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(frames, [b'retry: 5000\n\n', b'event: booking\ndata: {"id": 3}\n\n', b': keep-alive\n\n'])
+
+    @skipUnless(find_spec('redis'), 'needs the redis package')
+    def test_redis_broker_publishes_json_on_a_namespaced_channel(self):
+        with mock.patch('redis.Redis.from_url') as from_url:
+            RedisBroker('redis://example:6379/0').publish('user:7', {'event': 'message', 'data': 1})
+        from_url.return_value.publish.assert_called_once_with(
+            'roomify:push:user:7', '{"event": "message", "data": 1}'
+        )
+
+    def test_redis_subscription_skips_empty_polls(self):
+        pubsub = mock.Mock(get_message=mock.AsyncMock(side_effect=[None, {'data': b'{"event": "x", "data": 2}'}]))
+
+        self.assertEqual(asyncio.run(_RedisSubscription(pubsub).get()), {'event': 'x', 'data': 2})
+
+
+class AvailabilityTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        self.today = timezone.localdate()
+
+    def day(self, offset):
+        return self.today + timedelta(days=offset)
+
+    def _stay(self, listing, start, end, name):
+        renter = User.objects.create_user(name)
+        booking, _ = request_booking(renter, listing, start=self.day(start), end=self.day(end))
+        accept_booking(booking)
+
+    def test_peak_counts_back_to_back_stays_once(self):
+        stays = [(self.day(0), self.day(10)), (self.day(10), self.day(20)), (self.day(5), self.day(15))]
+        self.assertEqual(peak_occupancy(stays, self.day(0), self.day(20)), 2)
+        self.assertEqual(peak_occupancy(stays, self.day(15), self.day(20)), 1)
+
+    def test_available_between_matches_the_calendar(self):
+        double = _listing(self.owner, occupancy=2)
+        single = _listing(self.owner, occupancy=1)
+        self._stay(double, 0, 10, 'a')
+        self._stay(double, 10, 20, 'b')
+        self._stay(double, 5, 15, 'c')
+        self._stay(single, 30, 40, 'd')
+
+        def free(start, end):
+            return set(available_between(Listing.objects.all(), self.day(start), self.day(end)))
+
+        self.assertEqual(free(0, 20), {single})  # two stays overlap on days 5-15
+        self.assertEqual(free(15, 35), {double})
+        self.assertEqual(free(20, 30), {double, single})
+
+    def test_accept_rejects_overbooked_dates(self):
+        listing = _listing(self.owner, occupancy=1)
+        self._stay(listing, 0, 10, 'a')
+        later, _ = request_booking(User.objects.create_user('b'), listing, start=self.day(10), end=self.day(12))
+        self.assertTrue(accept_booking(later))
+        with self.assertRaises(BookingError):
+            request_booking(User.objects.create_user('c'), listing, start=self.day(9), end=self.day(11))
+
+
+class OwnerStatsTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.owner = User.objects.create_user('owner')
+        self.listing = _listing(self.owner, occupancy=1)
+
+    def assertStatsFresh(self):
+        stats = owner_stats(self.owner)
+        self.assertEqual(stats, compute_owner_stats(self.owner.pk))
+        return stats
+
+    def test_cached_kpis_follow_accept_and_reject(self):
+        first, _ = request_booking(User.objects.create_user('a'), self.listing)
+        second, _ = request_booking(User.objects.create_user('b'), self.listing)
+        self.assertEqual(self.assertStatsFresh()['pending_requests'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            accept_booking(first)
+        stats = self.assertStatsFresh()
+        self.assertEqual((stats['occupied_listings'], stats['pending_requests']), (1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reject_booking(second)
+        self.assertEqual(self.assertStatsFresh()['pending_requests'], 0)
+
+    def test_sync_occupancy_command_refreshes_cached_kpis(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        booking, _ = request_booking(
+            User.objects.create_user('renter'), self.listing, start=tomorrow, end=tomorrow + timedelta(days=30)
+        )
+        accept_booking(booking)
+
+        with mock.patch('django.utils.timezone.localdate', return_value=tomorrow):
+            self.assertEqual(owner_stats(self.owner)['occupied_listings'], 0)
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('sync_occupancy', stdout=io.StringIO())
+            self.assertEqual(self.assertStatsFresh()['occupied_listings'], 1)
+
+
+class GeoSearchTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+
+    def _at(self, lat, lng):
+        listing = _listing(self.owner, occupancy=1)
+        # Saving geocodes from the location text, so place it directly.
+        Listing.objects.filter(pk=listing.pk).update(latitude=lat, longitude=lng, geohash=geohash_encode(lat, lng))
+        return listing
+
+    def test_radius_keeps_only_the_circle_nearest_first(self):
+        far = self._at(23.80, 90.42)        # ~2 km east
+        near = self._at(23.80, 90.41)       # ~1 km east
+        self._at(23.80, 90.44)              # ~4 km east
+        self._at(23.821, 90.421)            # in the bounding box's corner, ~3 km away
+
+        results = list(listings_within_radius(Listing.objects.all(), 23.80, 90.40, 3))
+
+        self.assertEqual(results, [near, far])
+        self.assertAlmostEqual(results[0].distance_km, haversine_km(23.80, 90.40, 23.80, 90.41), places=6)
+
+    def test_box_includes_its_edges_only(self):
+        inside = self._at(23.75, 90.35)
+        self._at(23.75, 90.55)
+        self._at(23.95, 90.35)
+
+        self.assertEqual(list(listings_in_box(Listing.objects.all(), 23.7, 90.3, 23.8, 90.4)), [inside])
+
+    def test_radius_across_the_antimeridian(self):
+        east = self._at(0.0, 179.95)
+        west = self._at(0.0, -179.95)
+        self._at(0.0, 178.0)
+
+        results = listings_within_radius(Listing.objects.all(), 0.0, 179.99, 20)
+
+        self.assertEqual(set(results), {east, west})
+
+    def test_radius_around_a_pole_spans_every_longitude(self):
+        listings = {self._at(89.9, 10.0), self._at(89.9, -170.0)}
+        self._at(89.0, 10.0)
+
+        self.assertEqual(set(listings_within_radius(Listing.objects.all(), 90.0, 0.0, 50)), listings)
+
+    def test_oversized_and_non_finite_areas_are_refused(self):
+        with self.assertRaises(BoxTooLarge):
+            listings_in_box(Listing.objects.all(), -90, -180, 90, 180)
+        with self.assertRaises(ValueError):
+            covering_cells(float('nan'), 0, 1, 1)
+
+    def test_nearby_view_rejects_bad_coordinates(self):
+        renter = User.objects.create_user('renter')
+        Profile.objects.create(user=renter, role='renter')
+        self.client.force_login(renter)
+        url = reverse('renter_nearby')
+
+        for params in [{'lat': 'nan'}, {'radius': 'nan'}, {'bbox': '0,0,inf,1'}, {'bbox': '-90,-180,90,180'}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(url, params).status_code, 400)
+        self.assertEqual(self.client.get(url, {'price': '5k-10k', 'occupancy': '1'}).status_code, 200)
+
+
+class AdminUserListTests(TestCase):
+
+    def setUp(self):
+        self.owners = [
+            Owner.objects.create(user=User.objects.create_user(f'user{i}', first_name='Ana', last_name=name))
+            for i, name in enumerate(['Smith', 'Smythe', 'Jones'])
+        ]
+
+    def test_prefix_search_is_case_insensitive(self):
+        def found(text):
+            return {user.username for user in user_page(User.objects.all(), text)[0]}
+
+        self.assertEqual(found('ANA SM'), {'user0', 'user1'})
+        self.assertEqual(found('jon'), {'user2'})
+        self.assertEqual(found('user'), {'user0', 'user1', 'user2'})
+
+    def test_postgresql_matches_with_like(self):
+        User.objects.create_user('user_%')
+        with mock.patch('roomify_uap_app.user_admin.connection', mock.Mock(vendor='postgresql')):
+            queryset = User.objects.filter(user_search_q('USER_'))
+            self.assertIn('LIKE', str(queryset.query))
+            # Wildcards in the search text are matched literally.
+            self.assertEqual(list(queryset.values_list('username', flat=True)), ['user_%'])
+
+    def test_bulk_verify_is_one_update(self):
+        ids = [owner.pk for owner in self.owners[:2]]
+        with self.assertNumQueries(1):
+            self.assertEqual(set_verified('owner', ids, True), 2)
+        self.assertEqual(set_verified('owner', ids, True), 0)
+        self.assertEqual(Owner.objects.filter(is_verified=False).get(), self.owners[2])
+
+
+class RecommendationTests(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        self.listings = [_listing(owner, occupancy=occupancy) for occupancy in (1, 2, 3)]
+        state_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, state_dir)
+        self.state_path = f'{state_dir}/similarity.npz'
+
+    def test_failed_full_rebuild_keeps_previous_neighbours(self):
+        self.assertEqual(rebuild_similar_listings(full=True, path=self.state_path), 3)
+        before = list(SimilarListing.objects.values_list('listing', 'similar', 'rank'))
+        self.assertEqual(len(before), 6)
+
+        with mock.patch.object(SimilarListing.objects, 'bulk_create', side_effect=DatabaseError('disk full')):
+            with self.assertRaises(DatabaseError):
+                rebuild_similar_listings(full=True, path=self.state_path)
+
+        self.assertEqual(list(SimilarListing.objects.values_list('listing', 'similar', 'rank')), before)
+
+
+class ListingImportTests(TestCase):
+
+    def test_valid_rows_are_imported_in_batches_and_bad_ones_reported(self):
+        owner = User.objects.create_user('owner')
+        csv_file = io.BytesIO(
+            'Room_Title,Location,Rent,Occupancy\n'
+            'Room A,"Farmgate, Dhaka",8000,2\n'
+            'Room B,Mirpur,not a number,1\n'
+            ',Mirpur,5000,1\n'
+            'Room C,Nowhere,6000,-1\n'
+            'Room D,Dhanmondi,7000,\n'
+            'Room E,Mirpur,4000,1\n'
+            'Room F,Mirpur,4000,0\n'.encode()
+        )
+        result = import_listings(owner, csv_file, batch_size=2)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual([line for line, _ in result['errors']], [3, 4, 5, 8])
+        room = Listing.objects.get(room_title='Room A')
+        self.assertEqual((room.occupancy, room.owner), (2, owner))
+        self.assertEqual(Listing.objects.get(room_title='Room D').occupancy, 1)
+        self.assertIsNotNone(room.latitude)
+
+
+class CatalogueCacheTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        catalogue._local.clear()
+        self.addCleanup(catalogue._local.clear)
+
+    def test_lru_evicts_the_least_recently_used_entry(self):
+        lru = catalogue.LRUCache(max_entries=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        self.assertEqual(len(lru), 2)
+
+    def test_version_bump_invalidates_both_levels(self):
+        compute = mock.Mock(side_effect=['old', 'new'])
+        self.assertEqual(catalogue.get_or_set('feed', compute), 'old')
+        self.assertEqual(catalogue.get_or_set('feed', compute), 'old')
+
+        catalogue.bump_catalogue_version()
+
+        self.assertEqual(catalogue.get_or_set('feed', compute), 'new')
+        self.assertEqual(compute.call_count, 2)
+
+    def test_listing_changes_bump_the_version(self):
+        version = catalogue.catalogue_version()
+        listing = _listing(User.objects.create_user('owner'), occupancy=1)
+        self.assertGreater(catalogue.catalogue_version(), version)
+
+        version = catalogue.catalogue_version()
+        listing.delete()
+        self.assertGreater(catalogue.catalogue_version(), version)
+
+    def test_lost_version_key_never_goes_back(self):
+        version = catalogue.catalogue_version()
+        catalogue.bump_catalogue_version()
+        caches['default'].delete(catalogue.VERSION_KEY)
+
+        self.assertGreater(catalogue.catalogue_version(), version + 1)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+        Profile.objects.create(user=self.owner, role='owner')
+        self.renter = User.objects.create_user('renter')
+        self.listing = _listing(self.owner, occupancy=3)
+        self.bookings = [request_booking(self.renter, self.listing)[0]]
+        self.bookings += [request_booking(User.objects.create_user(f'r{i}'), self.listing)[0] for i in range(2)]
+        request_booking(self.renter, _listing(User.objects.create_user('stranger'), occupancy=1))
+        self.client.force_login(self.owner)
+
+    def _csv(self, name):
+        response = self.client.get(reverse('owner_export', args=[name]))
+        self.assertTrue(response.streaming)
+        return list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+
+    def test_csv_export_has_only_the_owners_rows(self):
+        rows = self._csv('bookings')
+
+        self.assertEqual(rows[0][:2], ['booking_id', 'listing_id'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [booking.pk for booking in self.bookings])
+
+    def test_csv_cells_cannot_start_formulas(self):
+        Message.objects.create(sender=self.renter, receiver=self.owner, listing=self.listing, content='=1+1')
+        self.assertEqual(self._csv('messages')[1][5], "'=1+1")
+
+    def test_csv_is_written_chunk_by_chunk(self):
+        columns, rows = export_rows(self.owner, 'bookings')
+        with mock.patch('roomify_uap_app.exports.CHUNK_SIZE', 2):
+            chunks = list(stream_csv(columns, rows))
+        self.assertEqual(len(chunks), 3)  # header, then one chunk per two rows
+
+    @skipUnless(find_spec('pyarrow'), 'needs the pyarrow package')
+    def test_parquet_export_round_trips(self):
+        import pyarrow.parquet
+
+        response = self.client.get(reverse('owner_export', args=['bookings']), {'format': 'parquet'})
+        self.assertEqual(response['Content-Type'], 'application/vnd.apache.parquet')
+        table = pyarrow.parquet.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('booking_id').to_pylist(), [booking.pk for booking in self.bookings])
+
+    def test_unknown_export_is_404(self):
+        self.assertEqual(self.client.get(reverse('owner_export', args=['passwords'])).status_code, 404)
+
+
+class ListingFilterTests(TestCase):
+
+    def test_malformed_parameters_are_ignored(self):
+        filters = parse_listing_filters({
+            'price': 'free', 'min_rent': 'abc', 'max_rent': '1e', 'min_size': '12.5', 'max_size': 'x',
+            'occupancy': 'two', 'occupied': 'maybe', 'available_from': '2025-13-01', 'available_to': 'soon',
+        })
+        self.assertEqual(filters, parse_listing_filters({}))
+
+    def test_stay_dates_must_be_in_order(self):
+        filters = parse_listing_filters({'available_from': '2025-06-10', 'available_to': '2025-06-01'})
+        self.assertIsNone(filters['available_from'])
+        self.assertIsNone(filters['available_to'])
+
+    def test_facet_counts_match_a_count_without_their_own_filter(self):
+        owner = User.objects.create_user('owner')
+        for location, rent, occupancy, occupied in [
+            ('Dhaka', 4000, 1, False), ('Dhaka', 7000, 2, True), ('Dhaka', 12000, 1, False),
+            ('Dhaka', 6000, 1, False), ('Sylhet', 7500, 1, False), ('Sylhet', 25000, 2, False),
+            ('Khulna', 9000, 1, True), ('Khulna', 8000, 2, False),
+        ]:
+            Listing.objects.create(
+                owner=owner, room_title='Room', location=location, rent=rent, room_size=120,
+                occupancy=occupancy, occupied=occupied, description='',
+            )
+        listings = Listing.objects.all()
+        filters = parse_listing_filters({'price': '5k-10k', 'occupancy': '1', 'occupied': 'no'})
+
+        facets = listing_facets(listings, filters)
+        self.assertEqual(facets['total'], 2)
+
+        def count(skip, **lookup):
+            return apply_listing_filters(listings, {**filters, **skip}).filter(**lookup).count()
+
+        def nonzero(counts):
+            return {value: n for value, n in counts.items() if n}
+
+        self.assertEqual(facets['total'], apply_listing_filters(listings, filters).count())
+        for bucket, (_key, _label, low, high) in zip(facets['price'], PRICE_BUCKETS):
+            lookup = {'rent__gte': low or 0, **({'rent__lt': high} if high else {})}
+            self.assertEqual(bucket['count'], count({'price': ''}, **lookup), bucket['key'])
+        self.assertEqual(
+            {facet['value']: facet['count'] for facet in facets['locations']},
+            nonzero({location: count({'location': ''}, location=location) for location in ['Dhaka', 'Sylhet', 'Khulna']}),
+        )
+        self.assertEqual(
+            {facet['value']: facet['count'] for facet in facets['occupancy']},
+            nonzero({value: count({'occupancy': None}, occupancy=value) for value in [1, 2]}),
+        )
+        self.assertEqual(
+            facets['occupied'],
+            {value: count({'occupied': 'all'}, occupied=value == 'yes') for value in ['yes', 'no']},
+        )
+
+
+class ListingSearchTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user('owner')
+
+    def _create(self, title, location='Dhaka', description=''):
+        return Listing.objects.create(
+            owner=self.owner, room_title=title, location=location, rent=5000,
+            room_size=120, occupancy=1, description=description,
+        )
+
+    def test_index_follows_saves_and_deletes(self):
+        listing = self._create('Sunny room')
+        self.assertEqual(search_listings('sunny'), [listing])
+
+        listing.room_title = 'Quiet room'
+        listing.save()
+        self.assertEqual(search_listings('sunny'), [])
+        self.assertEqual(search_listings('quiet'), [listing])
+
+        listing.delete()
+        self.assertEqual(search_listings('quiet'), [])
+
+    def test_title_match_ranks_above_description_match(self):
+        in_description = self._create('Room', description='A balcony facing the lake')
+        in_title = self._create('Balcony room')
+
+        self.assertEqual(search_listings('balcony'), [in_title, in_description])
+
+    def test_last_term_matches_as_a_prefix(self):
+        listing = self._create('Furnished room', location='Mirpur')
+
+        self.assertEqual(search_listings('furnished mir'), [listing])
+
+    def test_fts_syntax_is_searched_as_text(self):
+        listing = self._create('Room near "NEAR" campus')
+
+        for text in ['"unbalanced', 'room AND OR', 'NEAR(campus', 'title:room', '*', '-()^']:
+            search_listings(text)
+        self.assertEqual(search_listings('NEAR(room) "campus'), [listing])
+
+
+class MediaTestCase(TestCase):
+    """Runs each test against an empty, throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.storage = listing_image_storage()
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+
+    def test_same_bytes_are_stored_once(self):
+        first = self.storage.save('listing_images/a.jpg', ContentFile(b'room photo'))
+        second = self.storage.save('listing_images/b.jpg', ContentFile(b'room photo'))
+
+        self.assertEqual(first, second)
+        self.assertEqual(StoredBlob.objects.get().refs, 2)
+
+    def test_file_is_removed_with_its_last_reference(self):
+        name = self.storage.save('listing_images/a.jpg', ContentFile(b'room photo'))
+        self.storage.save('listing_images/b.jpg', ContentFile(b'room photo'))
+
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(StoredBlob.objects.get(name=name).refs, 1)
+
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredBlob.objects.exists())
+
+
+class DedupeMediaTests(MediaTestCase):
+
+    def test_recount_includes_photos_sharing_a_cover_blob(self):
+        listing = _listing(User.objects.create_user('owner'), occupancy=1)
+        name = self.storage.save('listing_images/room.jpg', ContentFile(b'same bytes'))
+        listing.image = name
+        listing.save()
+        ListingPhoto.objects.create(listing=listing, image=self.storage.save('listing_images/copy.jpg', ContentFile(b'same bytes')))
+        StoredBlob.objects.filter(name=name).update(refs=1)
+
+        call_command('dedupe_media', '--prune', stdout=io.StringIO())
+
+        self.assertEqual(StoredBlob.objects.get(name=name).refs, 2)
+        listing.image.delete(save=True)
+        self.assertTrue(self.storage.exists(name))
+
+
+class MediaViewTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.name = self.storage.save('listing_images/room.jpg', ContentFile(b'0123456789'))
+        self.url = reverse('media', args=[self.name])
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+
+        again = self.client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], response['ETag'])
+
+    def test_single_range_is_partial_content(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=2-5'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+
+        suffix = self.client.get(self.url, headers={'Range': 'bytes=-3'})
+        self.assertEqual(b''.join(suffix.streaming_content), b'789')
+
+    def test_unsatisfiable_range_is_416(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=10-'})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=2-5', 'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_sendfile_hands_the_body_to_the_proxy(self):
+        with override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Sendfile'], self.storage.path(self.name))
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+
+
+@override_settings(IMAGE_DERIVATIVES_ASYNC=False)
+class ImageDerivativeTests(MediaTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listing = _listing(User.objects.create_user('owner'), occupancy=1)
+
+    def _photo(self, width):
+        buffer = io.BytesIO()
+        Image.new('RGB', (width, width // 2), 'teal').save(buffer, 'PNG')
+        name = self.storage.save('listing_images/room.png', ContentFile(buffer.getvalue()))
+        with self.captureOnCommitCallbacks(execute=True):
+            photo = ListingPhoto.objects.create(listing=self.listing, image=name)
+        photo.refresh_from_db()
+        return photo
+
+    def test_extra_photos_get_derivatives(self):
+        photo = self._photo(800)
+
+        variants = photo.image_variants
+        self.assertEqual(variants['source'], photo.image.name)
+        self.assertEqual([width for width, _ in variants['formats']['webp']], [320, 640, 800])
+        for _width, name in variants['formats']['webp']:
+            self.assertTrue(name.startswith(f'{PHOTO_DERIVATIVES_DIR}/{photo.pk}/'))
+            self.assertTrue(default_storage.exists(name))
+        self.assertFalse(needs_derivatives(photo))
+
+    def test_webp_is_used_when_avif_is_not_supported(self):
+        Image.init()
+        with mock.patch.dict(Image.SAVE):
+            Image.SAVE.pop('AVIF', None)
+            photo = self._photo(400)
+
+        self.assertEqual(list(photo.image_variants['formats']), ['webp'])
+        html = photo_picture(photo, alt='Room')
+        self.assertEqual(html['avif_srcset'], '')
+        self.assertIn('400w', html['webp_srcset'])
+
+
+class ViewRecorderTests(TestCase):
+
+    def setUp(self):
+        self.listing = _listing(User.objects.create_user('owner'), occupancy=1)
+        self.viewer = User.objects.create_user('viewer')
+        self.recorder = ViewRecorder(buffer_size=100, flush_interval=3600, dedupe_window=60)
+        self.enterContext(mock.patch.object(ViewRecorder, '_ensure_flusher'))
+
+    def test_repeat_views_inside_the_window_count_once(self):
+        clock = [1000]
+        with mock.patch('roomify_uap_app.tracking.time.monotonic', lambda: clock[0]):
+            self.assertTrue(self.recorder.record(self.listing.pk, self.viewer.pk))
+            clock[0] += 30
+            self.assertFalse(self.recorder.record(self.listing.pk, self.viewer.pk))
+            self.assertTrue(self.recorder.record(self.listing.pk, viewer_key='session'))
+            self.assertTrue(self.recorder.record(self.listing.pk))
+            clock[0] += 31
+            self.assertTrue(self.recorder.record(self.listing.pk, self.viewer.pk))
+
+        self.assertEqual(self.recorder.pending(), 4)
+
+    def test_flush_writes_buffered_views_with_their_own_timestamps(self):
+        viewed_at = timezone.now() - timedelta(minutes=5)
+        with mock.patch('roomify_uap_app.tracking.timezone.now', return_value=viewed_at):
+            self.recorder.record(self.listing.pk, self.viewer.pk)
+            self.recorder.record(self.listing.pk)
+        self.assertFalse(ListingView.objects.exists())
+
+        self.assertEqual(self.recorder.flush(), 2)
+
+        self.assertEqual(self.recorder.pending(), 0)
+        self.assertEqual(
+            list(ListingView.objects.order_by('id').values_list('viewer_id', 'timestamp')),
+            [(self.viewer.pk, viewed_at), (None, viewed_at)],
+        )
+
+
+class ViewRollupTests(TestCase):
+
+    def setUp(self):
+        owner = User.objects.create_user('owner')
+        self.listings = [_listing(owner, occupancy=1) for _ in range(2)]
+        self.viewers = [User.objects.create_user(f'viewer{i}') for i in range(2)]
+        self.now = timezone.now()
+
+    def _views(self, *specs):
+        ListingView.objects.bulk_create([
+            ListingView(listing=self.listings[listing], viewer=self.viewers[viewer] if viewer is not None else None,
+                        timestamp=self.now - timedelta(days=days_ago))
+            for listing, viewer, days_ago in specs
+        ])
+
+    def _recount(self):
+        return {
+            (row['listing_id'], row['day']): (row['count'], row['unique_viewers'])
+            for row in ListingView.objects.annotate(day=TruncDate('timestamp')).values('listing_id', 'day')
+            .annotate(count=Count('id'), unique_viewers=Count('viewer', distinct=True))
+        }
+
+    def test_incremental_rollup_matches_a_full_recount(self):
+        self._views((0, 0, 2), (0, 1, 2), (0, 0, 1), (1, None, 1), (1, 0, 0))
+        self.assertEqual(rollup_listing_views(batch_size=2, lag=0), (5, 4))
+
+        # Lands on days the first run already rolled up.
+        self._views((0, 0, 2), (0, 1, 1), (1, 1, 0), (1, None, 3))
+        rollup_listing_views(batch_size=2, lag=0)
+
+        rolled = {
+            (row.listing_id, row.day): (row.count, row.unique_viewers) for row in ListingViewDaily.objects.all()
+        }
+        self.assertEqual(rolled, self._recount())
+        self.assertEqual(rollup_listing_views(lag=0), (0, 0))
+
+    def test_totals_include_views_above_the_checkpoint(self):
+        self._views((0, 0, 1), (0, 1, 1), (1, 0, 0))
+        rollup_listing_views(lag=0)
+        self._views((0, 0, 0), (1, None, 0))
+
+        self.assertEqual(total_view_count(self.listings[:1]), 3)
+        self.assertEqual(total_view_count(self.listings), ListingView.objects.count())
+
+    def test_views_committed_below_the_mark_are_not_lost(self):
+        view = ListingView.objects.create(id=10, listing=self.listings[0], timestamp=self.now)
+        self.assertEqual(rollup_listing_views(lag=60), (0, 0))  # id 10 only just observed
+
+        # A slower batch commits id 5 after id 10 was visible; id 11 arrives later.
+        ListingView.objects.create(id=5, listing=self.listings[1], timestamp=self.now)
+        ListingView.objects.create(id=11, listing=self.listings[1], timestamp=self.now)
+        self.assertEqual(total_view_count(self.listings), 3)
+        RollupCheckpoint.objects.filter(name='listing_views_daily:observed').update(
+            updated_at=timezone.now() - timedelta(seconds=61)
+        )
+
+        rollup_listing_views(lag=60)
+
+        self.assertEqual(high_water_mark(), view.pk)
+        self.assertEqual(sorted(ListingViewDaily.objects.values_list('listing_id', 'count')),
+                         sorted([(self.listings[0].pk, 1), (self.listings[1].pk, 1)]))
+        self.assertEqual(total_view_count(self.listings), 3)
+
+
+class FunnelTests(TestCase):
+
+    def _events(self, **stages):
+        empty = ([], [], [])
+        return {
+            stage: tuple(np.array(column, dtype=np.int64) for column in stages.get(stage, empty))
+            for stage in STAGES
+        }
+
+    def test_stages_count_distinct_actors_per_listing_week(self):
+        monday = 4 * 24 * 3600  # 1970-01-05
+        events = self._events(
+            # Renter 1 views listing 10 twice, renter 2 once; two anonymous views.
+            views=([10, 10, 10, 10, 10, 20], [monday, monday + 60, monday, monday, monday, monday + WEEK],
+                   [1, 1, 2, -1, -2, 1]),
+            messages=([10], [monday + 3600], [1]),
+            requests=([10, 20], [monday + 7200, monday + WEEK], [1, 1]),
+            accepted=([10], [monday + 7200], [1]),
+        )
+
+        groups, weeks, counts = funnel_table(events)
+
+        first = int(week_index(monday))
+        self.assertEqual(groups.tolist(), [10, 20])
+        self.assertEqual(weeks.tolist(), [first, first + 1])
+        self.assertEqual(counts.tolist(), [[4, 1, 1, 1], [1, 0, 1, 0]])
+        self.assertEqual(week_start(first), date(1970, 1, 5))
+
+    def test_listings_roll_up_to_groups(self):
+        events = self._events(views=([10, 20, 30], [0, 0, 0], [1, 1, 2]))
+
+        groups, _weeks, counts = funnel_table(events, np.array([10, 20, 30]), np.array([7, 7, 8]))
+
+        self.assertEqual(groups.tolist(), [7, 8])
+        self.assertEqual(counts[:, 0].tolist(), [1, 1])  # one person viewing two of owner 7's rooms
+
+    def test_conversion_rates_are_zero_after_an_empty_stage(self):
+        rates = conversion_rates([[10, 5, 0, 0], [0, 0, 0, 0], [4, 2, 1, 1]])
+
+        np.testing.assert_allclose(rates, [[0.5, 0, 0], [0, 0, 0], [0.5, 0.5, 1]])
+
+    @override_settings(TIME_ZONE='Asia/Dhaka')
+    def test_owner_funnel_uses_local_calendar_weeks(self):
+        owner = User.objects.create_user('owner')
+        listing = _listing(owner, occupancy=1)
+        today = timezone.localdate()
+        this_monday = today - timedelta(days=today.weekday())
+        local_midnight = timezone.make_aware(datetime.combine(this_monday, datetime.min.time()))
+        # Sunday evening in UTC, but already Monday in Dhaka.
+        ListingView.objects.create(listing=listing, timestamp=local_midnight + timedelta(minutes=30))
+        ListingView.objects.create(listing=listing, timestamp=local_midnight - timedelta(minutes=30))
+        # Long before the window, which is only loaded from its first Monday.
+        ListingView.objects.create(listing=listing, timestamp=local_midnight - timedelta(weeks=30))
+
+        with mock.patch('roomify_uap_app.funnels.load_events', wraps=load_events) as load:
+            rows = owner_weekly_funnel(owner, weeks=3)
+
+        self.assertEqual(load.call_args.args[1], local_midnight - timedelta(weeks=2))
+
+        self.assertEqual([row['week'] for row in rows], [this_monday - timedelta(weeks=n) for n in range(3)])
+        self.assertEqual([row['views'] for row in rows], [1, 1, 0])
+        self.assertEqual(rows[0]['rates'], [0.0, 0.0, 0.0])
+
+
+class AttachUploadsTests(TestCase):
+
+    def test_malformed_upload_ids_are_ignored(self):
+        owner = User.objects.create_user('owner')
+        listing = _listing(owner, occupancy=1)
+        self.assertEqual(attach_uploads(listing, ['not-a-uuid', '', '12'], owner), 0)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+
+    def test_no_duplicates_or_lost_updates_under_load(self):
+        owner = User.objects.create_user('owner')
+        renters = [User.objects.create_user(f'renter{i}') for i in range(24)]
+        listing = _listing(owner, occupancy=10)
+
+        # Every renter double-submits with the same key and once more without one.
+        calls = []
+        for renter in renters:
+            key = f'form-{renter.pk}'
+            calls += [
+                lambda r=renter, k=key: request_booking(r, listing, k),
+                lambda r=renter, k=key: request_booking(r, listing, k),
+                lambda r=renter: request_booking(r, listing),
+            ]
+        results = _run_concurrently(calls)
+        self.assertFalse([r for r in results if isinstance(r, Exception)])
+        self.assertEqual(BookingRequest.objects.filter(listing=listing).count(), len(renters))
+
+        # Two clicks on Accept for every request, all at once.
+        bookings = list(BookingRequest.objects.filter(listing=listing))
+        results = _run_concurrently([lambda b=b: accept_booking(b) for b in bookings for _ in range(2)])
+        unexpected = [r for r in results if isinstance(r, Exception) and not isinstance(r, BookingError)]
+        self.assertFalse(unexpected)
+
+        listing.refresh_from_db()
+        accepted = BookingRequest.objects.filter(listing=listing, status='accepted').count()
+        self.assertEqual(accepted, 10)
+        self.assertEqual(listing.occupants, 10)
+        self.assertTrue(listing.occupied)
+        self.assertEqual(results.count(True), 10)
@@ -0,0 +1,147 @@
+"""
+Buffered recording of listing page views.
+
+``record_view`` only appends to an in-memory buffer, so the details page
+never waits on a database write. The buffer is written with one
+``bulk_create`` when it reaches ``LISTING_VIEW_BUFFER_SIZE`` events, every
+``LISTING_VIEW_FLUSH_INTERVAL`` seconds from a background thread, and once
+more when the worker exits. Repeat views of the same listing by the same
+viewer within ``LISTING_VIEW_DEDUPE_WINDOW`` seconds count once.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+
+from .models import Listing, ListingView
+
+logger = logging.getLogger(__name__)
+
+# Events kept for a retry after a failed flush before the oldest are dropped.
+MAX_PENDING = 10000
+
+
+class ViewRecorder:
+    """Thread-safe per-process buffer of ``ListingView`` events."""
+
+    def __init__(self, buffer_size=100, flush_interval=10.0, dedupe_window=1800, max_seen=50000):
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.dedupe_window = dedupe_window
+        self.max_seen = max_seen
+        self._buffer = []
+        self._seen = OrderedDict()  # (listing_id, viewer_key) -> monotonic time of last counted view
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread_pid = None
+
+    def record(self, listing_id, viewer_id=None, viewer_key=None):
+        """Buffer one view; returns False if it was a repeat inside the dedupe window."""
+        now = time.monotonic()
+        key = (listing_id, viewer_key or viewer_id)
+        with self._lock:
+            if key[1] is not None:
+                last = self._seen.get(key)
+                if last is not None and now - last < self.dedupe_window:
+                    return False
+                self._seen[key] = now
+                self._seen.move_to_end(key)
+                while len(self._seen) > self.max_seen:
+                    self._seen.popitem(last=False)
+            self._buffer.append((listing_id, viewer_id, timezone.now()))
+            due = len(self._buffer) >= self.buffer_size or now - self._last_flush >= self.flush_interval
+
+        self._ensure_flusher()
+        if due:
+            self.flush()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self):
+        """Write buffered events to the database; returns how many rows were inserted."""
+        with self._flush_lock:
+            with self._lock:
+                events, self._buffer = self._buffer, []
+                self._last_flush = time.monotonic()
+            if not events:
+                return 0
+            try:
+                # Listings deleted since the view was recorded would fail the FK check.
+                live = set(Listing.objects.filter(pk__in={e[0] for e in events}).values_list('pk', flat=True))
+                rows = [
+                    ListingView(listing_id=listing_id, viewer_id=viewer_id, timestamp=timestamp)
+                    for listing_id, viewer_id, timestamp in events
+                    if listing_id in live
+                ]
+                ListingView.objects.bulk_create(rows, batch_size=500)
+                return len(rows)
+            except DatabaseError:
+                logger.exception('Flushing %d listing views failed; keeping them for the next flush', len(events))
+                with self._lock:
+                    self._buffer[:0] = events
+                    del self._buffer[:-MAX_PENDING]
+                return 0
+
+    def _ensure_flusher(self):
+        # Started lazily (and again after a fork) so only serving processes run it.
+        if self._thread_pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run_flusher, name='listing-view-flusher', daemon=True).start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Periodic listing view flush failed')
+            finally:
+                close_old_connections()
+
+
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def view_recorder():
+    global _recorder
+    if _recorder is None:
+        with _recorder_lock:
+            if _recorder is None:
+                _recorder = ViewRecorder(
+                    buffer_size=getattr(settings, 'LISTING_VIEW_BUFFER_SIZE', 100),
+                    flush_interval=getattr(settings, 'LISTING_VIEW_FLUSH_INTERVAL', 10.0),
+                    dedupe_window=getattr(settings, 'LISTING_VIEW_DEDUPE_WINDOW', 1800),
+                )
+    return _recorder
+
+
+def record_view(listing_id, viewer_id=None, viewer_key=None):
+    return view_recorder().record(listing_id, viewer_id, viewer_key)
+
+
+def flush_views():
+    return view_recorder().flush() if _recorder is not None else 0
+
+
+@atexit.register
+def _flush_on_exit():
+    # Graceful worker shutdown (gunicorn/uwsgi SIGTERM -> sys.exit) runs atexit hooks.
+    try:
+        flush_views()
+    except Exception:
+        logger.exception('Flushing listing views at shutdown failed')
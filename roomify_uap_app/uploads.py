@@ -0,0 +1,199 @@
+"""
+Resumable, chunked uploads for listing photos.
+
+1. ``start_upload`` registers the file (name, size, optional whole-file
+   SHA-256) and tells the client the chunk size.
+2. The client sends chunks in order, each with its SHA-256. A chunk is
+   streamed to a ``.part`` file in small blocks, so memory stays bounded
+   whatever the photo size. A chunk that fails its checksum is rolled back
+   and can simply be resent.
+3. After a dropped connection the client asks for the status and carries on
+   from ``next_chunk``.
+4. Completed uploads are attached to a listing by id when the listing form
+   is submitted, going through the same content-addressed storage as a
+   regular upload.
+"""
+import hashlib
+import os
+import posixpath
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image
+
+from .models import ChunkedUpload, ListingPhoto
+from .storage import listing_image_storage
+
+READ_BLOCK_SIZE = 64 * 1024
+ALLOWED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif'}
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _chunk_size():
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', 1024 * 1024)
+
+
+def _max_size():
+    return getattr(settings, 'MAX_LISTING_PHOTO_SIZE', 25 * 1024 * 1024)
+
+
+def part_path(upload):
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f'{upload.id}.part'
+
+
+def upload_status(upload):
+    return {
+        'upload_id': str(upload.id),
+        'status': upload.status,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'next_chunk': upload.received_chunks,
+    }
+
+
+def start_upload(owner, filename, size, sha256=''):
+    filename = posixpath.basename((filename or '').replace('\\', '/')).strip()
+    if posixpath.splitext(filename)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise UploadError('Unsupported image type.')
+    if not 0 < size <= _max_size():
+        raise UploadError(f'Images must be between 1 byte and {_max_size() // (1024 * 1024)} MB.')
+    sha256 = (sha256 or '').lower()
+    if sha256 and len(sha256) != 64:
+        raise UploadError('Invalid SHA-256.')
+
+    upload = ChunkedUpload.objects.create(
+        owner=owner, filename=filename, size=size, chunk_size=_chunk_size(), sha256=sha256
+    )
+    path = part_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+    return upload
+
+
+def _expected_length(upload, index):
+    start = index * upload.chunk_size
+    return min(upload.chunk_size, upload.size - start)
+
+
+def write_chunk(upload, index, stream, length, checksum):
+    """Stream chunk ``index`` from ``stream`` to disk, verifying it against ``checksum``."""
+    if upload.status != 'uploading':
+        raise UploadError('Upload is already complete.', status=409)
+    if not 0 <= index < upload.total_chunks:
+        raise UploadError('Chunk index out of range.')
+    if index > upload.received_chunks:
+        raise UploadError(f'Expected chunk {upload.received_chunks}.', status=409)
+    if length != _expected_length(upload, index):
+        raise UploadError(f'Chunk {index} must be {_expected_length(upload, index)} bytes.')
+    checksum = (checksum or '').lower()
+    if len(checksum) != 64:
+        raise UploadError('X-Chunk-SHA256 header is required.')
+
+    already_stored = index < upload.received_chunks
+    offset = index * upload.chunk_size
+    digest = hashlib.sha256()
+    with open(part_path(upload), 'r+b') as handle:
+        handle.seek(offset)
+        remaining = length
+        while remaining:
+            block = stream.read(min(READ_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            digest.update(block)
+            if not already_stored:
+                handle.write(block)
+        if remaining or digest.hexdigest() != checksum:
+            if not already_stored:
+                handle.truncate(offset)
+            raise UploadError(f'Chunk {index} failed verification; resend it.', status=422)
+
+    if already_stored:
+        return upload  # a retried chunk we already have
+
+    updated = ChunkedUpload.objects.filter(pk=upload.pk, received_chunks=index).update(received_chunks=index + 1)
+    if not updated:
+        raise UploadError('Chunk was received concurrently.', status=409)
+    upload.received_chunks = index + 1
+    if upload.received_chunks == upload.total_chunks:
+        _finish(upload)
+    return upload
+
+
+def _finish(upload):
+    path = part_path(upload)
+    if upload.sha256:
+        with open(path, 'rb') as handle:
+            if hashlib.file_digest(handle, 'sha256').hexdigest() != upload.sha256:
+                _fail(upload)
+                raise UploadError('File checksum does not match; upload it again.', status=422)
+    try:
+        with Image.open(path) as image:
+            image.verify()
+    except Exception:
+        _fail(upload)
+        raise UploadError('The uploaded file is not a valid image.')
+    upload.status = 'complete'
+    upload.save(update_fields=['status', 'updated_at'])
+
+
+def _fail(upload):
+    discard(upload)
+    upload.delete()
+
+
+def discard(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+
+
+def _parse_ids(values):
+    """The values that are valid upload ids, as UUIDs, in order; anything else is dropped."""
+    ids = []
+    for value in values:
+        try:
+            ids.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return ids
+
+
+def attach_uploads(listing, upload_ids, owner):
+    """
+    Move the owner's completed uploads into storage and attach them to ``listing``.
+
+    The first image becomes the cover if the listing has none; the rest are
+    added as extra photos. Ids that aren't valid UUIDs are ignored.
+    Returns the number attached.
+    """
+    upload_ids = _parse_ids(upload_ids)
+    uploads = ChunkedUpload.objects.filter(pk__in=upload_ids, owner=owner, status='complete')
+    order = {upload_id: position for position, upload_id in enumerate(upload_ids)}
+    uploads = sorted(uploads, key=lambda upload: order.get(upload.pk, 0))
+    storage = listing_image_storage()
+    position = listing.photos.count()
+    attached = 0
+    for upload in uploads:
+        with open(part_path(upload), 'rb') as handle:
+            name = storage.save(f'listing_images/{upload.filename}', File(handle))
+        if not listing.image:
+            listing.image = name
+            # Only the cover: a full save could overwrite occupancy updated by a concurrent accept.
+            listing.save(update_fields=['image'])
+        else:
+            ListingPhoto.objects.create(listing=listing, image=name, position=position)
+            position += 1
+        upload.status = 'attached'
+        upload.save(update_fields=['status', 'updated_at'])
+        discard(upload)
+        attached += 1
+    return attached
@@ -9,6 +9,9 @@ urlpatterns = [
 
 
     path('dashboard/renter/', views.renter_dashboard, name='renter_dashboard'),
+    path('dashboard/renter/listings/', views.renter_listings_feed, name='renter_listings_feed'),
+    path('dashboard/renter/search/', views.renter_search, name='renter_search'),
+    path('dashboard/renter/nearby/', views.renter_nearby, name='renter_nearby'),
     path('dashboard/renter/profile/', views.renter_profile, name='renter_profile'),
     path('dashboard/renter/bookings/', views.renter_my_bookings, name='renter_bookings'),
     path('dashboard/renter/messages/', views.renter_messages, name='renter_messages'),
@@ -18,10 +21,17 @@ urlpatterns = [
     path('dashboard/owner/listings/', views.owner_listings, name='owner_listings'),
     path('dashboard/owner/analytics/', views.owner_analytics, name='owner_analytics'),
     path('dashboard/owner/messages/', views.owner_messages, name='owner_messages'),
+    path('dashboard/owner/export/<str:name>/', views.owner_export, name='owner_export'),
     path('send-message/<int:listing_id>/', views.send_message, name='send_message'),
+    path('messages/search/', views.message_search, name='message_search'),
+    path('messages/<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
     path('dashboard/owner/profile/', views.owner_profile, name='owner_profile'),
     path('dashboard/owner/post-new-listing/', views.post_new_listing, name='post_new_listing'),
+    path('dashboard/owner/import-listings/', views.import_listings_csv, name='import_listings_csv'),
     path('dashboard/owner/listing/edit/<int:listing_id>/', views.edit_listing, name='edit_listing'),
+    path('dashboard/owner/uploads/', views.photo_upload_start, name='photo_upload_start'),
+    path('dashboard/owner/uploads/<uuid:upload_id>/', views.photo_upload_status, name='photo_upload_status'),
+    path('dashboard/owner/uploads/<uuid:upload_id>/chunks/<int:index>/', views.photo_upload_chunk, name='photo_upload_chunk'),
     path('dashboard/owner/listing/view/<int:listing_id>/', views.view_listing, name='view_listing'),
     path('dashboard/owner/listing/delete/<int:listing_id>/', views.delete_listing, name='delete_listing'),
 
@@ -31,6 +41,8 @@ urlpatterns = [
     path('dashboard/admin/users/', views.view_users, name='view_users'),
     path('dashboard/admin/users/edit/<int:user_id>/', views.edit_user, name='edit_user'),
     path('dashboard/admin/users/delete/<int:user_id>/', views.delete_user, name='delete_user'),
+    path('dashboard/admin/verification/', views.verification_queue, name='verification_queue'),
+    path('dashboard/admin/verification/bulk/', views.verify_bulk, name='verify_bulk'),
     path('verify/<int:user_id>/<str:user_type>/', views.verify_user, name='verify_user'),
     path('reject/<int:user_id>/<str:user_type>/', views.reject_user, name='reject_user'),
     path('dashboard/admin/logout/', views.admin_logout, name='admin_logout'),
@@ -46,4 +58,6 @@ urlpatterns = [
 
     path('booking/accept/<int:req_id>/', views.booking_accept, name='booking_accept'),
     path('booking/reject/<int:req_id>/', views.booking_reject, name='booking_reject'),
+    path('booking/bulk/', views.booking_bulk_respond, name='booking_bulk_respond'),
+    path('events/', views.event_stream, name='event_stream'),
 ]
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+User lists for the admin dashboard.
+
+Lists are keyset-paginated newest first, so a page costs the same however
+many users there are. Search is a case-insensitive prefix match on
+username, email, first or last name ("ana sm" matches first and last
+name). Each column has an expression index on ``lower(column)`` (created by
+migration 0017). On SQLite, which compares bytes, the match is the range
+``lower(column) >= prefix AND lower(column) < prefix + U+10FFFF``: its
+``LIKE`` only runs off an index for NOCASE columns. PostgreSQL collations
+needn't sort U+10FFFF last, so there it is ``lower(column) LIKE 'prefix%'``,
+served by a ``text_pattern_ops`` index (migration 0020).
+
+Verification is moderated in batches: ``set_verified`` changes any number
+of owner or renter accounts with one ``UPDATE ... WHERE id IN (...)``.
+"""
+from django.db import connection
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.db.models.lookups import GreaterThanOrEqual, LessThan, StartsWith
+
+from .models import Owner, Renter
+from .pagination import keyset_page
+
+USERS_PER_PAGE = 25
+ACCOUNT_MODELS = {'owner': Owner, 'renter': Renter}
+SEARCH_FIELDS = ('username', 'email', 'first_name', 'last_name')
+
+# Sorts after every character byte-wise, so on SQLite [prefix, prefix +
+# PREFIX_END) is exactly the strings starting with prefix.
+PREFIX_END = '\U0010ffff'
+
+INDEX_DDL = [
+    f'CREATE INDEX IF NOT EXISTS auth_user_{field}_lower_idx ON auth_user (lower({field}))'
+    for field in SEARCH_FIELDS
+]
+
+PG_PATTERN_INDEX_DDL = [
+    f'CREATE INDEX IF NOT EXISTS auth_user_{field}_lower_pattern_idx ON auth_user (lower({field}) text_pattern_ops)'
+    for field in SEARCH_FIELDS
+]
+
+
+def install_user_indexes(conn):
+    with conn.cursor() as cursor:
+        for statement in INDEX_DDL:
+            cursor.execute(statement)
+
+
+def drop_user_indexes(conn):
+    with conn.cursor() as cursor:
+        for field in SEARCH_FIELDS:
+            cursor.execute(f'DROP INDEX IF EXISTS auth_user_{field}_lower_idx')
+
+
+def install_user_pattern_indexes(conn):
+    """PostgreSQL: index ``lower(column)`` for ``LIKE 'prefix%'`` whatever the database collation."""
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        for statement in PG_PATTERN_INDEX_DDL:
+            cursor.execute(statement)
+
+
+def drop_user_pattern_indexes(conn):
+    if conn.vendor != 'postgresql':
+        return
+    with conn.cursor() as cursor:
+        for field in SEARCH_FIELDS:
+            cursor.execute(f'DROP INDEX IF EXISTS auth_user_{field}_lower_pattern_idx')
+
+
+def _starts_with(field, prefix):
+    column = Lower(field)
+    if connection.vendor == 'postgresql':
+        return Q(StartsWith(column, prefix))
+    return Q(GreaterThanOrEqual(column, Value(prefix))) & Q(LessThan(column, Value(prefix + PREFIX_END)))
+
+
+def user_search_q(text, path=''):
+    """Q matching users (reached through ``path``, e.g. ``'user__'``) whose name, username or email starts with ``text``."""
+    words = (text or '').lower().split()
+    if not words:
+        return Q()
+    if len(words) > 1:
+        return _starts_with(f'{path}first_name', words[0]) & _starts_with(f'{path}last_name', ' '.join(words[1:]))
+    return Q.create(
+        [_starts_with(f'{path}{field}', words[0]) for field in SEARCH_FIELDS], connector=Q.OR
+    )
+
+
+def verified_q(value, path=''):
+    """Q for the ``verified`` filter (``'yes'``/``'no'``; anything else matches all)."""
+    if value in ('yes', 'no'):
+        return Q(**{f'{path}is_verified': value == 'yes'})
+    return Q()
+
+
+def user_page(queryset, text='', cursor=None, per_page=USERS_PER_PAGE, path=''):
+    """One page of ``queryset`` matching the search ``text``, newest first: ``(rows, next_cursor)``."""
+    return keyset_page(queryset.filter(user_search_q(text, path)), cursor, per_page, keys=('-id',))
+
+
+def set_verified(kind, ids, verified):
+    """Mark the ``kind`` (``'owner'``/``'renter'``) accounts in ``ids`` verified or not; returns how many changed."""
+    return ACCOUNT_MODELS[kind].objects.filter(pk__in=ids).exclude(is_verified=verified).update(is_verified=verified)
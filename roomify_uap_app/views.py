@@ -5,12 +5,48 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from .models import Profile, Listing, ListingView, Message, BookingRequest
+from .models import Profile, Listing, Message, BookingRequest, SimilarListing, ListingPhoto, ChunkedUpload, Conversation
 from .models import Owner, Renter
-from datetime import datetime
-from django.db.models import Count, Sum
+import asyncio
+import math
+import uuid
+from datetime import date
+from django.db.models import Q
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse, Http404
+from django.urls import reverse
+from .pagination import keyset_page, InvalidCursor
+from .search import search_listings
+from .filters import parse_listing_filters, apply_listing_filters, listing_facets
+from .geo import BoxTooLarge, listings_within_radius, listings_in_box
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from . import catalogue
+from .uploads import UploadError, start_upload, write_chunk, upload_status, attach_uploads
+from .media import media_response
+from .tracking import record_view
+from .rollups import daily_view_counts
+from .owner_stats import owner_stats
+from .funnels import owner_weekly_funnel
+from .notifications import mark_answers_seen
+from .conversations import inbox, history, mark_read
+from .message_search import search_messages
+from .availability import availability_calendar
+from .bookings import BookingError, request_booking, accept_booking, reject_booking, respond_in_bulk, save_listing_details
+from .push import format_sse, get_broker, user_channel
+from .listing_import import ListingImportError, import_listings
+from .user_admin import ACCOUNT_MODELS, set_verified, user_page, verified_q
+from .exports import EXPORTS, export_rows, parquet_available, stream_csv, stream_parquet
+
+
+LISTINGS_PER_PAGE = 12
+NEARBY_RESULTS_LIMIT = 60
+SIMILAR_LISTINGS_SHOWN = 4
+PENDING_REQUESTS_SHOWN = 50
+DEFAULT_NEARBY_RADIUS_KM = 2.0
+MAX_NEARBY_RADIUS_KM = 50.0
 
 
 def home(request):
@@ -30,6 +66,7 @@ def role_required(role):
             if not profile or profile.role != role:
                 messages.error(request, "Access denied.")
                 return redirect('home')
+            request.profile = profile
             return view_func(request, *args, **kwargs)
         return _wrapped
     return decorator
@@ -42,16 +79,116 @@ def renter_dashboard(request):
         messages.error(request, 'Access denied.')
         return redirect('home')
 
-    listings = Listing.objects.all().order_by('-created_at')
+    filters = parse_listing_filters(request.GET)
+    cards_html, next_cursor = _feed_page(filters)
+    facets = catalogue.get_or_set(
+        catalogue.make_key('facets', filters),
+        lambda: listing_facets(Listing.objects.all(), filters),
+    )
 
-    notifications = BookingRequest.objects.filter(
-        renter=request.user
-    ).exclude(status='pending')
+    return render(request, 'renter_dashboard.html', {
+        'cards_html': cards_html,
+        'next_cursor': next_cursor,
+        'filters': filters,
+        'facets': facets,
+    })
+
+
+def _feed_page(filters, cursor=None):
+    """Rendered listing cards and next cursor for one feed page, via the catalogue cache."""
+    def compute():
+        listings, next_cursor = keyset_page(
+            apply_listing_filters(Listing.objects.all(), filters),
+            cursor=cursor,
+            per_page=LISTINGS_PER_PAGE,
+        )
+        return render_to_string('renter_listing_cards.html', {'listings': listings}), next_cursor
+
+    return catalogue.get_or_set(catalogue.make_key('feed', filters, cursor), compute)
+
+
+@login_required
+@role_required('renter')
+def renter_listings_feed(request):
+    """Return the next page of listing cards as an HTML fragment for "load more"."""
+    filters = parse_listing_filters(request.GET)
+    try:
+        cards_html, next_cursor = _feed_page(filters, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
+    response = HttpResponse(cards_html)
+    response['X-Next-Cursor'] = next_cursor or ''
+    return response
+
+
+@login_required
+@role_required('renter')
+def renter_nearby(request):
+    """
+    Listings near a point (the campus by default), nearest first.
+
+    Accepts ``lat``/``lng``/``radius`` (km), or ``bbox=south,west,north,east``.
+    """
+    campus_lat, campus_lng = settings.CAMPUS_LOCATION
+    try:
+        lat = float(request.GET.get('lat', campus_lat))
+        lng = float(request.GET.get('lng', campus_lng))
+        radius = min(max(float(request.GET.get('radius', DEFAULT_NEARBY_RADIUS_KM)), 0.1), MAX_NEARBY_RADIUS_KM)
+        bbox = [float(value) for value in request.GET['bbox'].split(',')] if request.GET.get('bbox') else None
+        if not all(math.isfinite(value) for value in [lat, lng, radius, *(bbox or [])]):
+            raise ValueError
+    except ValueError:
+        return HttpResponseBadRequest('Invalid coordinates.')
+    if bbox is not None and len(bbox) != 4:
+        return HttpResponseBadRequest('bbox must be south,west,north,east.')
+
+    def nearby(queryset):
+        if bbox:
+            return listings_in_box(queryset, *bbox, origin=(lat, lng) if 'lat' in request.GET else None)
+        return listings_within_radius(queryset, lat, lng, radius)
+
+    filters = parse_listing_filters(request.GET)
+    try:
+        listings = nearby(apply_listing_filters(Listing.objects.all(), filters))[:NEARBY_RESULTS_LIMIT]
+        facets = listing_facets(nearby(Listing.objects.all()), filters)
+    except BoxTooLarge as e:
+        return HttpResponseBadRequest(str(e))
+
+    return render(request, 'renter_dashboard.html', {
+        'listings': listings,
+        'nearby': True,
+        'radius': radius,
+        'filters': filters,
+        'facets': facets,
+    })
+
+
+@login_required
+@role_required('renter')
+def renter_search(request):
+    """Full-text search over listing titles, locations and descriptions, ranked by relevance."""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        params = request.GET.copy()
+        params.pop('q', None)
+        url = reverse('renter_dashboard')
+        return redirect(f'{url}?{params.urlencode()}' if params else url)
+
+    filters = parse_listing_filters(request.GET)
+    match_ids = catalogue.get_or_set(
+        catalogue.make_key('search', query.lower()),
+        lambda: [listing.pk for listing in search_listings(query)],
+    )
+    matched = Listing.objects.filter(pk__in=match_ids)
+    kept = apply_listing_filters(matched, filters).in_bulk()
+    listings = [kept[pk] for pk in match_ids if pk in kept]
 
     return render(request, 'renter_dashboard.html', {
         'listings': listings,
-        'notifications': notifications,
-        'notification_count': notifications.count()
+        'query': query,
+        'filters': filters,
+        'facets': listing_facets(matched, filters),
     })
 
 
@@ -66,15 +203,8 @@ def renter_my_bookings(request):
         renter=request.user
     ).select_related("listing", "owner").order_by("-created_at")
 
-    notifications = BookingRequest.objects.filter(
-        renter=request.user,
-        status__in=["accepted", "rejected"]
-    ).order_by("-created_at")
-
     context = {
         "bookings": bookings,
-        "notifications": notifications,
-        "notification_count": notifications.count(),
     }
 
     return render(request, "renter_my_bookings.html", context)
@@ -85,34 +215,23 @@ def renter_my_bookings(request):
 def owner_dashboard(request):
     owner = request.user
     listings = Listing.objects.filter(owner=owner)
-
-    total_listings = listings.count()
-
-    occupied_rooms = listings.filter(occupied=True).count()
-    occupancy_rate = round((occupied_rooms / total_listings) * 100, 2) if total_listings > 0 else 0
-
-    now = timezone.now()
-    accepted_bookings = BookingRequest.objects.filter(
-        owner=owner,
-        status='accepted',
-        created_at__year=now.year,
-        created_at__month=now.month
-    )
-    monthly_revenue = accepted_bookings.aggregate(total=Sum('listing__rent'))['total'] or 0
-
-    total_views = ListingView.objects.filter(listing__in=listings).count()
-
-    notifications = BookingRequest.objects.filter(owner=owner, status='pending')
-    notification_count = notifications.count()
+    stats = owner_stats(owner)
+
+    pending_requests = []
+    if stats['pending_requests']:
+        pending_requests = (
+            BookingRequest.objects.filter(owner=owner, status='pending')
+            .select_related('renter', 'listing')
+            .order_by('created_at', 'id')[:PENDING_REQUESTS_SHOWN]
+        )
 
     context = {
         'listings': listings,
-        'total_listings': total_listings,
-        'occupancy_rate': occupancy_rate,
-        'monthly_revenue': monthly_revenue,
-        'total_views': total_views,
-        'notifications': notifications,
-        'notification_count': notification_count,
+        'pending_requests': pending_requests,
+        'total_listings': stats['total_listings'],
+        'occupancy_rate': stats['occupancy_rate'],
+        'monthly_revenue': stats['monthly_revenue'],
+        'total_views': stats['total_views'],
     }
 
     return render(request, 'owner_dashboard.html', context)
@@ -225,9 +344,9 @@ def send_message(request, listing_id):
         content = request.POST.get("content", "").strip()
         if not content:
             messages.error(request, "Message cannot be empty.")
-            return redirect("listing_detail", listing_id=listing_id)
+            return redirect("view_details", room_id=listing_id)
 
-        Message.objects.create(
+        message = Message.objects.create(
             sender=request.user,
             receiver=receiver,
             listing=listing,
@@ -235,9 +354,78 @@ def send_message(request, listing_id):
         )
 
         messages.success(request, "Message sent successfully!")
-        return redirect("listing_detail", listing_id=listing_id)
+        return redirect("conversation_detail", conversation_id=message.conversation_id)
+
+    return redirect("view_details", room_id=listing_id)
 
-    return redirect("listing_detail", listing_id=listing_id)
+
+def _inbox_context(request):
+    try:
+        conversations, next_cursor = inbox(request.user, request.GET.get('cursor'))
+    except InvalidCursor:
+        conversations, next_cursor = inbox(request.user)
+    for conversation in conversations:
+        conversation.other = conversation.other_party(request.user)
+        conversation.unread = conversation.unread_for(request.user)
+    return {'conversations': conversations, 'next_cursor': next_cursor}
+
+
+@login_required
+def message_search(request):
+    """Full-text search over the current user's sent and received messages."""
+    query = request.GET.get('q', '').strip()
+    try:
+        results, next_cursor = search_messages(request.user, query, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
+    is_owner = Profile.objects.filter(user=request.user, role='owner').exists()
+    return render(request, 'message_search.html', {
+        'query': query,
+        'results': results,
+        'next_cursor': next_cursor,
+        'inbox_url': reverse('owner_messages' if is_owner else 'renter_messages'),
+    })
+
+
+@login_required
+def conversation_detail(request, conversation_id):
+    """A single thread: newest messages first page, ``?before=`` for older ones, and a reply box."""
+    conversation = get_object_or_404(
+        Conversation.objects.select_related('listing', 'owner', 'renter'),
+        Q(owner=request.user) | Q(renter=request.user),
+        id=conversation_id,
+    )
+    other = conversation.other_party(request.user)
+
+    if request.method == 'POST':
+        content = request.POST.get('content', '').strip()
+        if content:
+            Message.objects.create(
+                conversation=conversation,
+                sender=request.user,
+                receiver=other,
+                listing=conversation.listing,
+                content=content,
+            )
+        else:
+            messages.error(request, "Message cannot be empty.")
+        return redirect('conversation_detail', conversation_id=conversation.id)
+
+    try:
+        thread, older_cursor = history(conversation, request.GET.get('before'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+    mark_read(conversation, request.user, thread)
+
+    is_owner = request.user.pk == conversation.owner_id
+    return render(request, 'conversation.html', {
+        'conversation': conversation,
+        'other': other,
+        'thread': thread,
+        'older_cursor': older_cursor,
+        'inbox_url': reverse('owner_messages' if is_owner else 'renter_messages'),
+    })
 
 
 
@@ -252,13 +440,8 @@ def owner_listings(request):
 
     listings = Listing.objects.filter(owner=request.user).order_by('-created_at')
 
-    notifications = BookingRequest.objects.filter(owner=request.user, status='pending')
-    notification_count = notifications.count()
-
     context = {
         'listings': listings,
-        'notifications': notifications,
-        'notification_count': notification_count,
     }
 
     return render(request, 'owner_listings.html', context)
@@ -270,46 +453,31 @@ def owner_analytics(request):
     """Display analytics for owner with notifications included."""
     owner = request.user
     listings = Listing.objects.filter(owner=owner)
+    stats = owner_stats(owner)
 
-    total_views = ListingView.objects.filter(listing__in=listings).count()
-    total_revenue = BookingRequest.objects.filter(
-        listing__in=listings, status='accepted'
-    ).count() * 1000
+    month_start = timezone.localdate().replace(day=1)
+    monthly_views = daily_view_counts(listings, month_start)
 
-    total_rooms = listings.count()
-    occupied_rooms = listings.filter(occupied=True).count()
-    occupancy_rate = round((occupied_rooms / total_rooms) * 100, 2) if total_rooms > 0 else 0
+    labels = [day.strftime("%b %d") for day in monthly_views]
+    daily_views = list(monthly_views.values())
 
-    total_messages = Message.objects.filter(listing__in=listings).count()
-
-    today = datetime.now()
-    this_month = today.month
-    this_year = today.year
-
-    monthly_views = (
-        ListingView.objects
-        .filter(listing__in=listings, timestamp__year=this_year, timestamp__month=this_month)
-        .extra({'day': "date(timestamp)"})
-        .values('day')
-        .annotate(count=Count('id'))
-        .order_by('day')
+    funnel = cache.get_or_set(
+        f'owner_funnel:{owner.id}',
+        lambda: owner_weekly_funnel(owner),
+        getattr(settings, 'OWNER_STATS_CACHE_TIMEOUT', 300),
     )
 
-    labels = [v['day'].strftime("%b %d") for v in monthly_views]
-    daily_views = [v['count'] for v in monthly_views]
-
-    notifications = BookingRequest.objects.filter(owner=request.user, status='pending')
-    notification_count = notifications.count()
-
     context = {
-        'total_views': total_views,
-        'total_revenue': total_revenue,
-        'occupancy_rate': occupancy_rate,
-        'total_messages': total_messages,
+        'total_views': stats['total_views'],
+        'month_views': sum(daily_views),
+        'total_revenue': stats['monthly_revenue'],
+        'occupancy_rate': stats['occupancy_rate'],
+        'total_messages': stats['total_messages'],
         'labels': labels,
         'daily_views': daily_views,
-        'notifications': notifications,
-        'notification_count': notification_count,
+        'funnel': funnel,
+        'exports': list(EXPORTS),
+        'parquet_available': parquet_available(),
     }
 
     return render(request, 'owner_analytics.html', context)
@@ -325,19 +493,19 @@ def owner_messages(request):
         messages.error(request, "Access denied.")
         return redirect('home')
 
-    messages_received = Message.objects.filter(receiver=request.user).select_related('sender', 'listing').order_by('-timestamp')
-    messages_received.update(is_read=True)
-    
-    notifications = BookingRequest.objects.filter(owner=request.user, status='pending')
-    notification_count = notifications.count()
+    return render(request, 'owner_messages.html', _inbox_context(request))
 
-    context = {
-        'messages_list': messages_received,
-        'notifications': notifications,
-        'notification_count': notification_count,
-    }
+OCCUPANCY_ERROR = 'Occupancy must be a whole number of at least 1.'
+
+
+def _occupancy(value):
+    """``value`` as a bed count, or ``None`` unless it is a whole number of at least 1."""
+    try:
+        occupancy = int(value)
+    except (TypeError, ValueError):
+        return None
+    return occupancy if occupancy >= 1 else None
 
-    return render(request, 'owner_messages.html', context)
 
 @login_required
 @role_required('owner')
@@ -347,9 +515,6 @@ def post_new_listing(request):
         messages.error(request, "Access denied.")
         return redirect('home')
 
-    notifications = BookingRequest.objects.filter(owner=request.user, status='pending')
-    notification_count = notifications.count()
-
     if request.method == 'POST':
         room_title = request.POST.get('room_title')
         location = request.POST.get('location')
@@ -357,34 +522,124 @@ def post_new_listing(request):
         room_size = request.POST.get('room_size')
         occupancy = request.POST.get('occupancy')
         description = request.POST.get('description')
-        image = request.FILES.get('images')
+        images = request.FILES.getlist('images')
 
         if not room_title or not location or not rent:
             messages.error(request, 'Please fill required fields.')
             return redirect('post_new_listing')
+        occupancy = _occupancy(occupancy)
+        if occupancy is None:
+            messages.error(request, OCCUPANCY_ERROR)
+            return redirect('post_new_listing')
 
-        Listing.objects.create(
+        listing = Listing.objects.create(
             owner=request.user,
             room_title=room_title,
             location=location,
             rent=rent,
             room_size=room_size or 0,
-            occupancy=occupancy or 0,
+            occupancy=occupancy,
             description=description or '',
-            image=image
+            image=images[0] if images else None
         )
+        _add_photos(listing, images[1:])
+        attach_uploads(listing, request.POST.getlist('upload_ids'), request.user)
 
         messages.success(request, 'Listing posted successfully.')
         return redirect('owner_dashboard')
 
-    context = {
-        'notifications': notifications,
-        'notification_count': notification_count
-    }
+    return render(request, 'post_new_listing.html')
+
+
+@login_required
+@role_required('owner')
+def import_listings_csv(request):
+    """Create many listings at once from a CSV file, with photos from an optional ZIP."""
+    result = None
+    if request.method == 'POST':
+        csv_file = request.FILES.get('csv_file')
+        if not csv_file:
+            messages.error(request, 'Please choose a CSV file to import.')
+            return redirect('import_listings_csv')
+        try:
+            result = import_listings(request.user, csv_file, request.FILES.get('images_zip'))
+        except ListingImportError as e:
+            messages.error(request, str(e))
+            return redirect('import_listings_csv')
+        if result['created']:
+            messages.success(request, f"Imported {result['created']} listing(s).")
+
+    return render(request, 'import_listings.html', {'result': result})
 
-    return render(request, 'post_new_listing.html', context)
 
 
+def _add_photos(listing, files):
+    position = listing.photos.count()
+    for offset, upload in enumerate(files):
+        ListingPhoto.objects.create(listing=listing, image=upload, position=position + offset)
+
+
+@require_POST
+@login_required
+@role_required('owner')
+def photo_upload_start(request):
+    """Begin a resumable photo upload; returns the upload id and chunk size as JSON."""
+    try:
+        upload = start_upload(
+            request.user,
+            request.POST.get('filename', ''),
+            int(request.POST.get('size', 0)),
+            request.POST.get('sha256', ''),
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Invalid size.'}, status=400)
+    except UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    return JsonResponse(upload_status(upload), status=201)
+
+
+@require_http_methods(['GET'])
+@login_required
+@role_required('owner')
+def photo_upload_status(request, upload_id):
+    """Where to resume: the next chunk the server expects."""
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, owner=request.user)
+    return JsonResponse(upload_status(upload))
+
+
+@require_http_methods(['PUT', 'POST'])
+@login_required
+@role_required('owner')
+def photo_upload_chunk(request, upload_id, index):
+    """Receive one raw chunk in the request body, checked against the X-Chunk-SHA256 header."""
+    upload = get_object_or_404(ChunkedUpload, id=upload_id, owner=request.user)
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        write_chunk(upload, index, request, length, request.headers.get('X-Chunk-SHA256'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid Content-Length.'}, status=400)
+    except UploadError as exc:
+        return JsonResponse({'error': str(exc), **upload_status(upload)}, status=exc.status)
+    return JsonResponse(upload_status(upload))
+
+
+@login_required
+@role_required('owner')
+def owner_export(request, name):
+    """Stream one of the owner's exports as CSV, or Parquet when ?format=parquet and pyarrow is installed."""
+    if name not in EXPORTS:
+        raise Http404('Unknown export.')
+    columns, rows = export_rows(request.user, name)
+    stamp = timezone.localdate().isoformat()
+
+    if request.GET.get('format') == 'parquet' and parquet_available():
+        response = StreamingHttpResponse(stream_parquet(columns, rows), content_type='application/vnd.apache.parquet')
+        response['Content-Disposition'] = f'attachment; filename="roomify-{name}-{stamp}.parquet"'
+    else:
+        response = StreamingHttpResponse(stream_csv(columns, rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="roomify-{name}-{stamp}.csv"'
+    return response
+
 
 @login_required
 @role_required('owner')
@@ -397,13 +652,19 @@ def edit_listing(request, listing_id):
         listing.location = request.POST.get('location', listing.location)
         listing.rent = request.POST.get('rent', listing.rent)
         listing.room_size = request.POST.get('room_size', listing.room_size)
-        listing.occupancy = request.POST.get('occupancy', listing.occupancy)
+        occupancy = _occupancy(request.POST.get('occupancy', listing.occupancy))
+        if occupancy is None:
+            messages.error(request, OCCUPANCY_ERROR)
+            return redirect('edit_listing', listing_id=listing.id)
+        listing.occupancy = occupancy
         listing.description = request.POST.get('description', listing.description)
         image = request.FILES.get('image')
         if image:
             listing.image = image
 
-        listing.save()
+        save_listing_details(listing)
+        _add_photos(listing, request.FILES.getlist('images'))
+        attach_uploads(listing, request.POST.getlist('upload_ids'), request.user)
         messages.success(request, 'Listing updated successfully.')
         return redirect('owner_listings')
 
@@ -454,26 +715,42 @@ def admin_login(request):
 
 @staff_member_required(login_url='admin_login')
 def admin_dashboard(request):
-    owners = Owner.objects.all()
-    renters = Renter.objects.all()
-    admin_user = request.user
-    print("Owners in DB:", owners)
-    print("Renters in DB:", renters)
+    query = request.GET.get('q', '').strip()
+    verified = request.GET.get('verified', 'all')
+    try:
+        owners, owners_next = user_page(
+            Owner.objects.select_related('user').filter(verified_q(verified)),
+            query, request.GET.get('owners'), path='user__',
+        )
+        renters, renters_next = user_page(
+            Renter.objects.select_related('user').filter(verified_q(verified)),
+            query, request.GET.get('renters'), path='user__',
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
     return render(request, 'admin_dashboard.html', {
         'owners': owners,
         'renters': renters,
-        'admin_user': admin_user
+        'owners_next': owners_next,
+        'renters_next': renters_next,
+        'query': query,
+        'verified_filter': verified,
+        'admin_user': request.user,
     })
 
-    
+
 @staff_member_required(login_url='admin_login')
 def view_users(request):
-    """Display all users with filters and actions."""
-    users = User.objects.all().order_by('id')
+    """Display users a page at a time with search, filters and actions."""
+    users = User.objects.select_related('profile', 'owner', 'renter')
 
+    query = request.GET.get('q', '').strip()
     staff_filter = request.GET.get('staff', 'all')
     super_filter = request.GET.get('superuser', 'all')
     active_filter = request.GET.get('active', 'all')
+    role_filter = request.GET.get('role', 'all')
+    verified_filter = request.GET.get('verified', 'all')
 
     if staff_filter == 'yes':
         users = users.filter(is_staff=True)
@@ -490,11 +767,25 @@ def view_users(request):
     elif active_filter == 'no':
         users = users.filter(is_active=False)
 
+    if role_filter in ('owner', 'renter'):
+        users = users.filter(verified_q(verified_filter, f'{role_filter}__'), **{f'{role_filter}__isnull': False})
+    elif verified_filter in ('yes', 'no'):
+        users = users.filter(verified_q(verified_filter, 'owner__') | verified_q(verified_filter, 'renter__'))
+
+    try:
+        users, next_cursor = user_page(users, query, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
     return render(request, 'view_users.html', {
         'users': users,
+        'next_cursor': next_cursor,
+        'query': query,
         'staff_filter': staff_filter,
         'super_filter': super_filter,
-        'active_filter': active_filter
+        'active_filter': active_filter,
+        'role_filter': role_filter,
+        'verified_filter': verified_filter,
     })
 
 
@@ -546,42 +837,97 @@ def admin_logout(request):
     logout(request)
     return redirect('admin_login')
 
+@staff_member_required(login_url='admin_login')
+def verification_queue(request):
+    """Unverified owners or renters, a page at a time, to verify or reject in batches."""
+    kind = request.GET.get('type', 'owner')
+    if kind not in ACCOUNT_MODELS:
+        kind = 'owner'
+    query = request.GET.get('q', '').strip()
+    pending = ACCOUNT_MODELS[kind].objects.select_related('user').filter(is_verified=False)
+    try:
+        accounts, next_cursor = user_page(pending, query, request.GET.get('cursor'), path='user__')
+    except InvalidCursor:
+        return HttpResponseBadRequest('Invalid cursor.')
+
+    return render(request, 'verification_queue.html', {
+        'accounts': accounts,
+        'next_cursor': next_cursor,
+        'kind': kind,
+        'query': query,
+    })
+
+
+@staff_member_required(login_url='admin_login')
+@require_POST
+def verify_bulk(request):
+    """Verify or reject a batch of owner or renter accounts; answers with JSON."""
+    kind = request.POST.get('type')
+    action = request.POST.get('action')
+    if kind not in ACCOUNT_MODELS or action not in ('verify', 'reject'):
+        return JsonResponse({'error': 'Unknown account type or action.'}, status=400)
+    ids = [int(value) for value in request.POST.getlist('ids') if value.isdigit()]
+
+    updated = set_verified(kind, ids, action == 'verify')
+    return JsonResponse({'type': kind, 'action': action, 'ids': ids, 'updated': updated})
+
+
+@staff_member_required(login_url='admin_login')
+@require_POST
 def verify_user(request, user_id, user_type):
-    if request.method == 'POST':
-        if user_type == 'owner':
-            user = get_object_or_404(Owner, id=user_id)
-        else:
-            user = get_object_or_404(Renter, id=user_id)
-        user.is_verified = True
-        user.save()
+    if user_type in ACCOUNT_MODELS:
+        set_verified(user_type, [user_id], True)
     return redirect('admin_dashboard')
 
+
+@staff_member_required(login_url='admin_login')
+@require_POST
 def reject_user(request, user_id, user_type):
-    if request.method == 'POST':
-        if user_type == 'owner':
-            user = get_object_or_404(Owner, id=user_id)
-        else:
-            user = get_object_or_404(Renter, id=user_id)
-        user.is_verified = False
-        user.save()
+    if user_type in ACCOUNT_MODELS:
+        set_verified(user_type, [user_id], False)
     return redirect('admin_dashboard')
 
 
-
 @login_required
 def view_details(request, room_id):
     room = get_object_or_404(Listing, id=room_id)
 
     if request.method == 'POST':
-        BookingRequest.objects.create(
-            renter=request.user,
-            owner=room.owner,
-            listing=room
-        )
-        messages.success(request, 'Booking request sent to the owner!')
+        key = request.POST.get('idempotency_key') or request.headers.get('Idempotency-Key')
+        try:
+            start = date.fromisoformat(request.POST.get('start_date') or timezone.localdate().isoformat())
+            end = date.fromisoformat(request.POST['end_date']) if request.POST.get('end_date') else None
+        except ValueError:
+            messages.error(request, 'Please enter valid stay dates.')
+            return redirect('view_details', room_id=room.id)
+        try:
+            _booking, created = request_booking(request.user, room, key, start, end)
+        except BookingError as e:
+            messages.error(request, str(e))
+            return redirect('view_details', room_id=room.id)
+        if created:
+            messages.success(request, 'Booking request sent to the owner!')
+        else:
+            messages.info(request, 'You have already requested this room for those dates.')
         return redirect('renter_dashboard')
 
-    return render(request, 'view_details.html', {'room': room})
+    if room.owner_id != request.user.id:
+        record_view(room.id, request.user.id)
+
+    similar = (
+        SimilarListing.objects.filter(listing=room)
+        .select_related('similar')
+        .order_by('rank')[:SIMILAR_LISTINGS_SHOWN]
+    )
+
+    return render(request, 'view_details.html', {
+        'room': room,
+        'idempotency_key': uuid.uuid4().hex,
+        'calendar': availability_calendar(room),
+        'today': timezone.localdate(),
+        'photos': room.photos.all(),
+        'similar_rooms': [entry.similar for entry in similar],
+    })
 
 
 @login_required
@@ -592,20 +938,8 @@ def renter_messages(request):
         messages.error(request, "Access denied.")
         return redirect('home')
 
-    messages_received = Message.objects.filter(receiver=request.user).select_related('sender', 'listing').order_by('-timestamp')
-    messages_received.update(is_read=True)
-
-    notifications = BookingRequest.objects.filter(
-        renter=request.user
-    ).exclude(status='pending')
-
-    context = {
-        'messages_list': messages_received,
-        'notifications': notifications,
-        'notification_count': notifications.count(),
-        'current_page': 'messages',
-    }
-
+    context = _inbox_context(request)
+    context['current_page'] = 'messages'
     return render(request, 'renter_messages.html', context)
 
 
@@ -627,15 +961,9 @@ def renter_profile(request):
         messages.success(request, 'Profile updated successfully.')
         return redirect('renter_profile')
 
-    notifications = BookingRequest.objects.filter(
-        renter=request.user
-    ).exclude(status='pending')
-
     context = {
         'profile': profile,
         'renter': renter,
-        'notifications': notifications,
-        'notification_count': notifications.count(),
         'current_page': 'profile',
     }
 
@@ -660,19 +988,14 @@ def owner_profile(request):
         messages.success(request, 'Profile updated successfully.')
         return redirect('owner_profile')
 
-    listings = Listing.objects.filter(owner=request.user)
-    total_properties = listings.count()
-    occupied_rooms = listings.filter(occupied=True).count()
-    occupancy_rate = round((occupied_rooms / total_properties) * 100, 2) if total_properties > 0 else 0
+    stats = owner_stats(request.user)
 
     context = {
         'profile': profile,
         'owner': owner,
-        'total_properties': total_properties,
-        'total_rooms': total_properties,
-        'occupancy_rate': occupancy_rate,
-        'notifications': BookingRequest.objects.filter(owner=request.user, status='pending'),
-        'notification_count': BookingRequest.objects.filter(owner=request.user, status='pending').count(),
+        'total_properties': stats['total_listings'],
+        'total_rooms': stats['total_listings'],
+        'occupancy_rate': stats['occupancy_rate'],
     }
 
     return render(request, 'owner_profile.html', context)
@@ -700,11 +1023,7 @@ def notifications(request):
 
 @login_required
 def clear_notifications(request):
-    BookingRequest.objects.filter(
-        renter=request.user,
-        status__in=["accepted", "rejected"]
-    ).update(status="pending")
-
+    mark_answers_seen(request.user)
     messages.success(request, "Notifications cleared.")
     return redirect('renter_dashboard')
 
@@ -718,13 +1037,15 @@ def respond_request(request, request_id, action):
         messages.error(request, "Unauthorized action.")
         return redirect('notifications')
 
-    if action == 'accept':
-        booking.status = 'accepted'
+    try:
+        changed = accept_booking(booking) if action == 'accept' else reject_booking(booking)
+    except BookingError as e:
+        messages.error(request, str(e))
+        return redirect('notifications')
+    if changed:
+        messages.success(request, f'Booking request {action}ed.')
     else:
-        booking.status = 'rejected'
-
-    booking.save()
-    messages.success(request, f'Booking request {action}ed.')
+        messages.info(request, 'This request has already been answered.')
 
     return redirect('notifications')
 
@@ -733,8 +1054,10 @@ def respond_request(request, request_id, action):
 @login_required
 def booking_accept(request, req_id):
     booking = get_object_or_404(BookingRequest, id=req_id, owner=request.user)
-    booking.status = 'accepted'
-    booking.save()
+    try:
+        accept_booking(booking)
+    except BookingError as e:
+        messages.error(request, str(e))
     return redirect('owner_dashboard')
 
 
@@ -742,6 +1065,58 @@ def booking_accept(request, req_id):
 @login_required
 def booking_reject(request, req_id):
     booking = get_object_or_404(BookingRequest, id=req_id, owner=request.user)
-    booking.status = 'rejected'
-    booking.save()
+    reject_booking(booking)
+    return redirect('owner_dashboard')
+
+
+@require_POST
+@login_required
+@role_required('owner')
+def booking_bulk_respond(request):
+    """Accept or reject several of the owner's pending requests at once."""
+    action = request.POST.get('action')
+    if action not in ('accept', 'reject'):
+        return HttpResponseBadRequest('Unknown action.')
+    ids = [int(value) for value in request.POST.getlist('ids') if value.isdigit()]
+
+    result = respond_in_bulk(request.user, ids, action, reject_competing=bool(request.POST.get('reject_competing')))
+    if result['accepted'] or result['rejected']:
+        messages.success(request, f"{result['accepted']} accepted, {result['rejected']} rejected.")
+    if result['skipped']:
+        messages.info(request, f"{result['skipped']} left pending: those rooms are fully occupied.")
+    if not any(result.values()):
+        messages.info(request, 'No pending requests were selected.')
     return redirect('owner_dashboard')
+
+
+@require_http_methods(['GET', 'HEAD'])
+def serve_media(request, path):
+    """Uploaded media with conditional GET, Range and optional X-Sendfile offload."""
+    return media_response(request, path)
+
+
+@login_required
+async def event_stream(request):
+    """
+    Server-sent events for the signed-in user: booking updates and new messages.
+
+    Serve under ASGI; each open stream is a coroutine, not a worker thread.
+    """
+    user = await request.auser()
+    heartbeat = getattr(settings, 'PUSH_HEARTBEAT_SECONDS', 15)
+
+    async def stream():
+        async with get_broker().subscribe(user_channel(user.pk)) as subscription:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'  # stops proxies timing out an idle stream
+                    continue
+                yield format_sse(message)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response